@@ -3,16 +3,21 @@
 # Creado para manejar login, logout y validación de sesiones
 # ==================== EMPIEZAN CAMBIOS ====================
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Union
 from datetime import datetime, timedelta
-import hashlib
-import secrets
+import math
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.limitador import limitador_ip, limitador_usuario
+from app.core.seguridad import verificar_password
+from app.core.tokens import Acceso, emitir_acceso, es_jwt, verificar_acceso
+from app.db.database import get_async_db
+from app.db.sesiones import REQUIERE_BD, Sesion, almacen_sesiones
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -31,20 +36,63 @@ class LoginResponse(BaseModel):
     message: str
     usuario: Optional[dict] = None
     token: Optional[str] = None
+    expira: Optional[datetime] = None
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+    access_expira: Optional[int] = None
 
 
-# ==================== EMPIEZAN CAMBIOS ====================
-# Función auxiliar para hashear contraseñas (SHA256)
-# ==================== EMPIEZAN CAMBIOS ====================
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+def token_de_peticion(request: Request) -> Optional[str]:
+    """Token del encabezado Authorization: Bearer (o del parámetro ?token=)"""
+    autorizacion = request.headers.get("Authorization", "")
+    if autorizacion[:7].lower() == "bearer ":
+        return autorizacion[7:].strip() or None
+    return request.query_params.get("token") or None
+
 
-def hash_password(password: str) -> str:
-    """Hashea la contraseña usando SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+# ==================== Dependencia de sesión ====================
+# Se aplica a todos los routers (main.py). Un access token (JWT) se verifica
+# solo con su firma; un token de sesión, contra el LRU y si no está, la BD.
+# Con AUTH_REQUERIDA=False solo identifica al usuario (request.state.sesion)
+# y deja pasar peticiones sin token o con token vencido.
+# Es async: el JWT y los aciertos del LRU se resuelven en el event loop sin
+# ocupar un hilo; solo la lectura/extensión en la BD va al threadpool.
+
+async def verificar_sesion(request: Request) -> Optional[Union[Acceso, Sesion]]:
+    token = token_de_peticion(request)
+    if not token:
+        sesion = None
+    elif es_jwt(token):
+        sesion = verificar_acceso(token)
+    else:
+        sesion = almacen_sesiones.validar_en_memoria(token)
+        if sesion is REQUIERE_BD:
+            sesion = await to_thread.run_sync(almacen_sesiones.validar, token)
+    request.state.sesion = sesion
+    if sesion is None and settings.AUTH_REQUERIDA:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sesión no válida o vencida",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return sesion
 
 
-def generar_token() -> str:
-    """Genera un token de sesión aleatorio"""
-    return secrets.token_urlsafe(32)
+async def sesion_obligatoria(
+    sesion: Optional[Union[Acceso, Sesion]] = Depends(verificar_sesion),
+) -> Union[Acceso, Sesion]:
+    """Para endpoints de diagnóstico: exige sesión aunque AUTH_REQUERIDA=False"""
+    if sesion is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sesión no válida o vencida",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return sesion
 
 
 # ==================== EMPIEZAN CAMBIOS ====================
@@ -52,10 +100,12 @@ def generar_token() -> str:
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.post("/login", response_model=LoginResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
+async def login(payload: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint de autenticación de usuarios
-    - Valida usuario y contraseña
+    - Límite de intentos por usuario e IP antes de tocar la BD (429 + Retry-After)
+    - Valida usuario y contraseña (bcrypt en el pool de app/core/seguridad.py)
+    - Los hashes SHA-256 anteriores se reemplazan por bcrypt al entrar
     - Retorna datos del usuario y token de sesión
     """
     try:
@@ -68,10 +118,20 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
                 detail="Usuario y contraseña son requeridos"
             )
 
-        # Hash de la contraseña ingresada
-        password_hash = hash_password(password)
+        # Un intento rechazado por el limitador no consulta la BD ni calcula hashes
+        clave_usuario = usuario.lower()
+        ip = request.client.host if request.client else ""
+        espera = limitador_ip.intentar(ip)
+        if espera is None:
+            espera = limitador_usuario.intentar(clave_usuario)
+        if espera is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiados intentos de inicio de sesión, intente más tarde",
+                headers={"Retry-After": str(math.ceil(espera))},
+            )
 
-        # Buscar usuario en la base de datos con JOIN a cat_rol
+        # Buscar usuario en la base de datos con JOIN a cat_rol; el hash se compara en Python
         sql = text("""
             SELECT
                 u.id_usuario,
@@ -79,26 +139,29 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
                 u.nombre,
                 u.id_rol,
                 u.activo,
+                u.password_hash,
                 r.nombre as rol_nombre,
                 r.descripcion as rol_descripcion
             FROM usuarios u
             INNER JOIN cat_rol r ON r.id_rol = u.id_rol
             WHERE u.usuario = :usuario
-            AND u.password_hash = :password_hash
             LIMIT 1
         """)
 
-        result = db.execute(sql, {
-            "usuario": usuario,
-            "password_hash": password_hash
-        }).mappings().first()
+        result = (await db.execute(sql, {"usuario": usuario})).mappings().first()
+
+        # Con usuario inexistente también se calcula un hash: misma latencia que un fallo
+        valida, hash_nuevo = await verificar_password(password, result["password_hash"] if result else None)
 
-        if not result:
+        if not valida:
+            limitador_usuario.fallo(clave_usuario)
+            limitador_ip.fallo(ip)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Usuario o contraseña incorrectos"
             )
 
+        limitador_usuario.exito(clave_usuario)
         usuario_data = dict(result)
 
         # Validar que el usuario esté activo
@@ -108,12 +171,22 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
                 detail="El usuario está inactivo"
             )
 
-        # Generar token de sesión
-        token = generar_token()
+        if hash_nuevo:
+            await db.execute(
+                text("UPDATE usuarios SET password_hash = :password_hash WHERE id_usuario = :id_usuario"),
+                {"password_hash": hash_nuevo, "id_usuario": usuario_data["id_usuario"]},
+            )
+
+        # Sesión nueva: el token solo se guarda como hash
+        token, sesion = await almacen_sesiones.crear_async(db, usuario_data["id_usuario"], usuario_data["id_rol"])
+        await db.commit()
 
         # Obtener rol del usuario
         rol = usuario_data.get("rol_nombre", "")
 
+        # Access token con el rol incluido; el token de sesión sirve de refresh token
+        access_token, access_expira = emitir_acceso(usuario_data["id_usuario"], usuario_data["id_rol"], rol)
+
         # Preparar respuesta
         usuario_response = {
             "id_usuario": usuario_data["id_usuario"],
@@ -129,28 +202,60 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
             success=True,
             message="Login exitoso",
             usuario=usuario_response,
-            token=token
+            token=token,
+            expira=sesion.expira,
+            access_token=access_token,
+            refresh_token=token,
+            access_expira=access_expira
         )
 
     except HTTPException:
         raise
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error en el servidor: {str(e)}"
         )
 
 
+# ==================== Renovación del access token ====================
+
+@router.post("/refresh")
+def refresh(payload: RefreshRequest):
+    """
+    Emite un access token nuevo a partir del refresh token (token de sesión)
+    Falla con 401 si la sesión fue revocada o venció
+    """
+    sesion = almacen_sesiones.validar(payload.refresh_token) if payload.refresh_token else None
+    if sesion is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sesión no válida o vencida"
+        )
+
+    access_token, access_expira = emitir_acceso(sesion.id_usuario, sesion.id_rol, sesion.rol)
+    return {
+        "success": True,
+        "access_token": access_token,
+        "access_expira": access_expira,
+        "token_type": "bearer"
+    }
+
+
 # ==================== EMPIEZAN CAMBIOS ====================
 # Endpoint de logout
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.post("/logout")
-def logout():
+def logout(request: Request):
     """
     Endpoint de cierre de sesión
-    En una implementación con tokens, aquí se invalidaría el token
+    Revoca el token en la BD y en la memoria de este proceso
     """
+    token = token_de_peticion(request)
+    if token:
+        almacen_sesiones.revocar(token)
     return {
         "success": True,
         "message": "Sesión cerrada exitosamente"
@@ -162,20 +267,32 @@ def logout():
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.get("/validate")
-def validate_session(token: str):
+def validate_session(request: Request):
     """
     Endpoint para validar si un token de sesión es válido
-    Placeholder para implementación futura con base de datos de sesiones
+    Acepta Authorization: Bearer o ?token=; extiende la expiración de la sesión
     """
+    token = token_de_peticion(request)
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token no proporcionado"
         )
 
+    sesion = almacen_sesiones.validar(token)
+    if sesion is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sesión no válida o vencida"
+        )
+
     return {
         "valid": True,
-        "message": "Token válido"
+        "message": "Token válido",
+        "id_usuario": sesion.id_usuario,
+        "id_rol": sesion.id_rol,
+        "rol": sesion.rol,
+        "expira": sesion.expira
     }
 
 # ==================== TERMINAN CAMBIOS ====================
@@ -0,0 +1,150 @@
+# ==================== Búsqueda de texto ====================
+# Búsqueda por relevancia sobre los índices FULLTEXT (ngram) de
+# migrations/006_busqueda_fulltext.sql. Sustituye los LIKE '%texto%' del
+# cuadro de búsqueda, que recorrían las tablas completas en cada tecla.
+# ==================== Búsqueda de texto ====================
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.texto import consulta_booleana
+from app.db.database import get_async_db
+
+router = APIRouter(prefix="/api/search", tags=["busqueda"])
+
+BUSQUEDA_PROPIETARIOS = text("""
+        SELECT
+          p.id_propietario,
+          p.nombre,
+          p.curp,
+          p.rfc,
+          p.telefono,
+          p.email,
+          p.estatus,
+          MATCH (p.nombre, p.curp, p.rfc) AGAINST (:q IN BOOLEAN MODE) AS relevancia
+        FROM propietarios p
+        WHERE MATCH (p.nombre, p.curp, p.rfc) AGAINST (:q IN BOOLEAN MODE)
+          AND (:solo_activos = 0 OR p.estatus = 'ACTIVO')
+        ORDER BY relevancia DESC, p.id_propietario DESC
+        LIMIT :limit
+    """)
+
+# La UPP coincide por sus propios campos o por los de su propietario; cada
+# rama usa su índice y se queda la mejor relevancia por UPP
+BUSQUEDA_UPP = text("""
+        SELECT
+          u.id_upp,
+          u.clave_upp,
+          u.id_propietario,
+          u.id_municipio,
+          u.localidad,
+          u.direccion,
+          u.telefono_contacto,
+          u.estatus,
+          u.fecha_registro,
+          p.nombre AS propietario,
+          m.nombre AS municipio_nombre,
+          e.nombre AS estado_nombre,
+          r.relevancia
+        FROM (
+          SELECT c.id_upp, MAX(c.relevancia) AS relevancia
+          FROM (
+            SELECT u.id_upp, MATCH (u.clave_upp, u.localidad, u.direccion) AGAINST (:q IN BOOLEAN MODE) AS relevancia
+            FROM upp u
+            WHERE MATCH (u.clave_upp, u.localidad, u.direccion) AGAINST (:q IN BOOLEAN MODE)
+            UNION ALL
+            SELECT u.id_upp, MATCH (p.nombre, p.curp, p.rfc) AGAINST (:q IN BOOLEAN MODE) AS relevancia
+            FROM propietarios p
+            INNER JOIN upp u ON u.id_propietario = p.id_propietario
+            WHERE MATCH (p.nombre, p.curp, p.rfc) AGAINST (:q IN BOOLEAN MODE)
+          ) c
+          GROUP BY c.id_upp
+        ) r
+        INNER JOIN upp u ON u.id_upp = r.id_upp
+        INNER JOIN propietarios p ON p.id_propietario = u.id_propietario
+        LEFT JOIN cat_municipio m ON m.id_municipio = u.id_municipio
+        LEFT JOIN cat_estado e ON e.id_estado = m.id_estado
+        WHERE (:solo_activas = 0 OR u.estatus = 1)
+        ORDER BY r.relevancia DESC, u.clave_upp ASC
+        LIMIT :limit
+    """)
+
+
+@router.get("/propietarios")
+async def buscar_propietarios(
+    q: str = Query("", max_length=120),
+    limit: int = Query(20, ge=1, le=100),
+    solo_activos: bool = Query(False),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Propietarios por nombre, CURP o RFC ordenados por relevancia
+    """
+    consulta = consulta_booleana(q)
+    if not consulta:
+        return []
+
+    rows = (await db.execute(BUSQUEDA_PROPIETARIOS, {
+        "q": consulta,
+        "limit": int(limit),
+        "solo_activos": 1 if solo_activos else 0,
+    })).mappings().all()
+
+    return [
+        {
+            "id_propietario": row["id_propietario"],
+            "nombre": row["nombre"],
+            "nombre_completo": row["nombre"],
+            "curp": row["curp"],
+            "rfc": row["rfc"],
+            "telefono": row["telefono"],
+            "email": row["email"],
+            "estatus": row["estatus"],
+            "activo": row["estatus"] == "ACTIVO",
+            "relevancia": float(row["relevancia"]),
+        }
+        for row in rows
+    ]
+
+
+@router.get("/upp")
+async def buscar_upp(
+    q: str = Query("", max_length=120),
+    limit: int = Query(15, ge=1, le=50),
+    solo_activas: bool = Query(True),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    UPP por clave, localidad, dirección o datos del propietario ordenadas por relevancia
+    """
+    consulta = consulta_booleana(q)
+    if not consulta:
+        return []
+
+    rows = (await db.execute(BUSQUEDA_UPP, {
+        "q": consulta,
+        "limit": int(limit),
+        "solo_activas": 1 if solo_activas else 0,
+    })).mappings().all()
+
+    # Mismos campos que GET /api/upp
+    return [
+        {
+            "id_upp": row["id_upp"],
+            "clave_upp": row["clave_upp"],
+            "id_propietario": row["id_propietario"],
+            "propietario": row["propietario"],
+            "id_municipio": row["id_municipio"],
+            "municipio": row["municipio_nombre"],
+            "localidad": row["localidad"],
+            "direccion": row["direccion"],
+            "nombre_predio": row["direccion"] or row["clave_upp"],
+            "telefono_contacto": row["telefono_contacto"],
+            "estatus": bool(row["estatus"]),
+            "fecha_registro": row["fecha_registro"],
+            "estado": row["estado_nombre"],
+            "relevancia": float(row["relevancia"]),
+        }
+        for row in rows
+    ]
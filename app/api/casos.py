@@ -1,12 +1,20 @@
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel, Field
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from typing import Optional
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.identificadores import PATRON_CLAVE_UPP, PATRON_NUMERO_CASO
+from app.core.paginacion import codificar_cursor, decodificar_cursor
+from app.db.catalogos import cache_catalogos
+from app.db.consultas_dinamicas import PATRON_MODO, ConsultaDinamica, filtro_identificador
+from app.db.database import engine, get_async_db, get_db
+from app.db.inserciones import insertar_fila
+from app.db.secuencias import AsignadorSecuencias
 
 router = APIRouter(prefix="/api/casos", tags=["casos"])
 
@@ -24,16 +32,29 @@ class CasoCreate(BaseModel):
     id_usuario_crea: int = Field(..., gt=0)  # Se mapea a id_usuario_recepciona si no viene  
 
 
+# Números de caso reservados por bloques (CASOS_NUMERACION=secuencia)
+asignador_casos = AsignadorSecuencias(engine, settings.CASOS_BLOQUE_SECUENCIA)
+
+
+def generar_numero_caso(db: Session) -> str:
+    if settings.CASOS_NUMERACION == "secuencia":
+        anio = date.today().year
+        n = asignador_casos.siguiente(f"numero_caso_{anio}")
+        return settings.CASOS_NUMERO_FORMATO.format(anio=anio, n=n)
+
+    db.execute(text("SET @p_numero_caso = ''"))
+    db.execute(text("CALL sp_generar_numero_caso(@p_numero_caso)"))
+    return db.execute(text("SELECT @p_numero_caso AS numero")).mappings().first()["numero"]
+
+
 @router.post("")
 def crear_caso(payload: CasoCreate, db: Session = Depends(get_db)):
     """
     BD: id_caso, numero_caso, id_upp, id_mvz, id_usuario_recepciona, id_estatus_caso, fecha_recepcion, semana_epidemiologica, anio_epidemiologico, observaciones, created_at, updated_at
     """
     try:
-        # 1) Generar numero de caso via SP (OUT param)
-        db.execute(text("SET @p_numero_caso = ''"))
-        db.execute(text("CALL sp_generar_numero_caso(@p_numero_caso)"))
-        numero_caso = db.execute(text("SELECT @p_numero_caso AS numero")).mappings().first()["numero"]
+        # 1) Generar numero de caso (SP o secuencia por bloques, según CASOS_NUMERACION)
+        numero_caso = generar_numero_caso(db)
 
         if not numero_caso:
             raise HTTPException(status_code=500, detail="No se pudo generar el número de caso.")
@@ -41,10 +62,7 @@ def crear_caso(payload: CasoCreate, db: Session = Depends(get_db)):
         # Determinar id_estatus_caso (buscar ABIERTO por defecto)
         id_estatus_caso = payload.id_estatus_caso
         if not id_estatus_caso:
-            estatus_sql = text("SELECT id_estatus_caso FROM cat_estatus_caso WHERE nombre = 'ABIERTO' LIMIT 1")
-            estatus_row = db.execute(estatus_sql).first()
-            if estatus_row:
-                id_estatus_caso = estatus_row[0]
+            id_estatus_caso = cache_catalogos.buscar_id("cat_estatus_caso", "ABIERTO")
 
         # Determinar id_usuario_recepciona
         id_usuario_recepciona = payload.id_usuario_recepciona or payload.id_usuario_crea
@@ -86,7 +104,7 @@ def crear_caso(payload: CasoCreate, db: Session = Depends(get_db)):
                 NOW()
             )
         """)
-        db.execute(insert_sql, {
+        new_id = insertar_fila(db, insert_sql, {
             "numero_caso": numero_caso,
             "id_upp": payload.id_upp,
             "id_mvz": payload.id_mvz,
@@ -96,11 +114,11 @@ def crear_caso(payload: CasoCreate, db: Session = Depends(get_db)):
             "semana_epidemiologica": semana_epi,
             "anio_epidemiologico": anio_epi,
             "observaciones": payload.observaciones,
+        }, errores={
+            "id_upp": (404, "La UPP especificada no existe"),
+            "numero_caso": (409, "El número de caso ya fue asignado, intente de nuevo"),
         })
 
-        # 3) Obtener id del caso insertado
-        new_id = db.execute(text("SELECT LAST_INSERT_ID() AS id")).mappings().first()["id"]
-
         db.commit()
 
         return {
@@ -119,26 +137,8 @@ def crear_caso(payload: CasoCreate, db: Session = Depends(get_db)):
 
 
 
-@router.get("")
-def consultar_casos(
-    numero_caso: Optional[str] = None,
-    id_upp: Optional[int] = None,
-    clave_upp: Optional[str] = None,
-    propietario: Optional[str] = None,
-    id_estatus_caso: Optional[int] = None,
-    estatus: Optional[str] = None,  # Para compatibilidad con frontend
-    fecha_recepcion: Optional[date] = None,
-    id_mvz: Optional[int] = None,
-    mvz: Optional[str] = None,
-    semana_epidemiologica: Optional[int] = None,
-    anio_epidemiologico: Optional[int] = None,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-):
-    """
-    BD: id_caso, numero_caso, id_upp, id_mvz, id_usuario_recepciona, id_estatus_caso, fecha_recepcion, semana_epidemiologica, anio_epidemiologico, observaciones, created_at, updated_at
-    """
-    sql = """
+CONSULTA_CASOS = ConsultaDinamica(
+    base="""
         SELECT
           c.id_caso,
           c.numero_caso,
@@ -167,56 +167,118 @@ def consultar_casos(
         LEFT JOIN mvz ON mvz.id_mvz = c.id_mvz
         LEFT JOIN usuarios mvz_user ON mvz_user.id_usuario = c.id_mvz
         LEFT JOIN usuarios rec_user ON rec_user.id_usuario = c.id_usuario_recepciona
-        WHERE 1=1
+        WHERE 1=1""",
+    filtros={
+        "numero_caso": "c.numero_caso LIKE :numero_caso",
+        "numero_caso_exacto": "c.numero_caso = :numero_caso",
+        "id_upp": "c.id_upp = :id_upp",
+        "clave_upp": "u.clave_upp LIKE :clave_upp",
+        "clave_upp_exacto": "u.clave_upp = :clave_upp",
+        "propietario": "p.nombre LIKE :propietario",
+        "id_estatus_caso": "c.id_estatus_caso = :id_estatus_caso",
+        "estatus": "ec.nombre = :estatus",
+        "fecha_recepcion": "c.fecha_recepcion = :fecha_recepcion",
+        "id_mvz": "c.id_mvz = :id_mvz",
+        "mvz": "(mvz.nombre LIKE :mvz OR mvz_user.nombre LIKE :mvz)",
+        "semana_epidemiologica": "c.semana_epidemiologica = :semana_epidemiologica",
+        "anio_epidemiologico": "c.anio_epidemiologico = :anio_epidemiologico",
+        # Keyset: la siguiente página continúa por la PK, sin OFFSET
+        "after_id": "c.id_caso < :after_id",
+    },
+    final="ORDER BY c.id_caso DESC LIMIT :limit",
+)
+
+
+@router.get("")
+async def consultar_casos(
+    response: Response,
+    numero_caso: Optional[str] = None,
+    id_upp: Optional[int] = None,
+    clave_upp: Optional[str] = None,
+    propietario: Optional[str] = None,
+    id_estatus_caso: Optional[int] = None,
+    estatus: Optional[str] = None,  # Para compatibilidad con frontend
+    fecha_recepcion: Optional[date] = None,
+    id_mvz: Optional[int] = None,
+    mvz: Optional[str] = None,
+    semana_epidemiologica: Optional[int] = None,
+    anio_epidemiologico: Optional[int] = None,
+    match_mode: Optional[str] = Query(None, pattern=PATRON_MODO),  # exact|prefix|contains; sin valor se detecta
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,  # Valor de X-Next-Cursor de la página anterior
+    after_id: Optional[int] = None,  # Alternativa explícita al cursor
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    BD: id_caso, numero_caso, id_upp, id_mvz, id_usuario_recepciona, id_estatus_caso, fecha_recepcion, semana_epidemiologica, anio_epidemiologico, observaciones, created_at, updated_at
+    Paginación: si hay más resultados se devuelve el encabezado X-Next-Cursor
     """
-    params = {"limit": int(limit)}
+    activos = []
+    # Se pide una fila de más para saber si existe página siguiente
+    params = {"limit": int(limit) + 1}
+
+    if cursor:
+        try:
+            after_id = decodificar_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    if after_id:
+        activos.append("after_id")
+        params["after_id"] = int(after_id)
 
     if numero_caso:
-        sql += " AND c.numero_caso LIKE :numero_caso"
-        params["numero_caso"] = f"%{numero_caso.strip()}%"
+        filtro, params["numero_caso"] = filtro_identificador(
+            "numero_caso", numero_caso.strip(), match_mode, PATRON_NUMERO_CASO
+        )
+        activos.append(filtro)
 
     if id_upp:
-        sql += " AND c.id_upp = :id_upp"
+        activos.append("id_upp")
         params["id_upp"] = int(id_upp)
 
     if clave_upp:
-        sql += " AND u.clave_upp LIKE :clave_upp"
-        params["clave_upp"] = f"%{clave_upp.strip()}%"
+        filtro, params["clave_upp"] = filtro_identificador(
+            "clave_upp", clave_upp.strip().upper(), match_mode, PATRON_CLAVE_UPP
+        )
+        activos.append(filtro)
 
     if propietario:
-        sql += " AND p.nombre LIKE :propietario"
+        activos.append("propietario")
         params["propietario"] = f"%{propietario.strip()}%"
 
     if id_estatus_caso:
-        sql += " AND c.id_estatus_caso = :id_estatus_caso"
+        activos.append("id_estatus_caso")
         params["id_estatus_caso"] = id_estatus_caso
     elif estatus:
         # Buscar por nombre de estatus para compatibilidad
-        sql += " AND ec.nombre = :estatus"
+        activos.append("estatus")
         params["estatus"] = estatus.strip().upper()
 
     if fecha_recepcion:
-        sql += " AND c.fecha_recepcion = :fecha_recepcion"
+        activos.append("fecha_recepcion")
         params["fecha_recepcion"] = fecha_recepcion
 
     if id_mvz:
-        sql += " AND c.id_mvz = :id_mvz"
+        activos.append("id_mvz")
         params["id_mvz"] = id_mvz
     elif mvz:
-        sql += " AND (mvz.nombre LIKE :mvz OR mvz_user.nombre LIKE :mvz)"
+        activos.append("mvz")
         params["mvz"] = f"%{mvz.strip()}%"
 
     if semana_epidemiologica:
-        sql += " AND c.semana_epidemiologica = :semana_epidemiologica"
+        activos.append("semana_epidemiologica")
         params["semana_epidemiologica"] = semana_epidemiologica
 
     if anio_epidemiologico:
-        sql += " AND c.anio_epidemiologico = :anio_epidemiologico"
+        activos.append("anio_epidemiologico")
         params["anio_epidemiologico"] = anio_epidemiologico
 
-    sql += " ORDER BY c.id_caso DESC LIMIT :limit"
+    rows = (await db.execute(CONSULTA_CASOS.sentencia(activos), params)).mappings().all()
 
-    rows = db.execute(text(sql), params).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = codificar_cursor(rows[-1]["id_caso"])
 
     # Mapear a formato esperado por frontend
     casos = []
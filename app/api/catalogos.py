@@ -0,0 +1,92 @@
+# ==================== Catálogos ====================
+# Sirve los catálogos completos desde cache_catalogos. El JSON de cada
+# catálogo se serializa una sola vez y se guarda junto con su ETag; las
+# recargas del caché descartan el buffer para que se vuelva a generar.
+# ==================== Catálogos ====================
+
+import json
+import threading
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response
+
+from app.core.etag import coincide, etag_fuerte
+from app.db.catalogos import cache_catalogos
+
+router = APIRouter(prefix="/api/catalogos", tags=["catalogos"])
+
+# Nombre público -> tabla
+CATALOGOS_PUBLICOS = {
+    "roles": "cat_rol",
+    "estatus_caso": "cat_estatus_caso",
+    "estatus_muestra": "cat_estatus_muestra",
+    "tipos_muestra": "cat_tipo_muestra",
+    "pruebas": "cat_prueba",
+    "resultados": "cat_resultado",
+    "especies": "cat_especie",
+    "razas": "cat_raza",
+    "municipios": "cat_municipio",
+    "estados": "cat_estado",
+}
+
+# El navegador reutiliza la copia este tiempo y después revalida con If-None-Match.
+# private: la respuesta requiere sesión, no debe quedar en proxies/CDN compartidos
+CACHE_CONTROL = "private, max-age=60, must-revalidate"
+
+_TODOS = "*"
+_buffers: dict[str, tuple[bytes, str]] = {}
+_lock = threading.Lock()
+
+
+def _descartar(tabla: str):
+    with _lock:
+        for nombre, tabla_publica in CATALOGOS_PUBLICOS.items():
+            if tabla_publica == tabla:
+                _buffers.pop(nombre, None)
+        _buffers.pop(_TODOS, None)
+
+
+cache_catalogos.al_invalidar(_descartar)
+
+
+def _serializar(datos) -> tuple[bytes, str]:
+    contenido = json.dumps(datos, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return contenido, etag_fuerte(contenido)
+
+
+def _buffer(nombre: str) -> tuple[bytes, str]:
+    buffer = _buffers.get(nombre)
+    if buffer is None:
+        version = cache_catalogos.version
+        if nombre == _TODOS:
+            datos = {publico: cache_catalogos.filas(tabla) for publico, tabla in CATALOGOS_PUBLICOS.items()}
+        else:
+            datos = cache_catalogos.filas(CATALOGOS_PUBLICOS[nombre])
+        buffer = _serializar(datos)
+        with _lock:
+            # Si hubo una recarga mientras se serializaba, no guardar datos viejos
+            if cache_catalogos.version == version:
+                _buffers[nombre] = buffer
+    return buffer
+
+
+def _responder(nombre: str, if_none_match: Optional[str]) -> Response:
+    contenido, etag = _buffer(nombre)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if coincide(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=contenido, media_type="application/json", headers=headers)
+
+
+@router.get("")
+def listar_catalogos(if_none_match: Optional[str] = Header(None)):
+    """Todos los catálogos en un solo objeto: {nombre: [filas]}"""
+    return _responder(_TODOS, if_none_match)
+
+
+@router.get("/{nombre}")
+def obtener_catalogo(nombre: str, if_none_match: Optional[str] = Header(None)):
+    """Filas de un catálogo (roles, estatus_caso, tipos_muestra, municipios, ...)"""
+    if nombre not in CATALOGOS_PUBLICOS:
+        raise HTTPException(status_code=404, detail="Catálogo no encontrado")
+    return _responder(nombre, if_none_match)
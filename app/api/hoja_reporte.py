@@ -3,7 +3,7 @@
 # BD: id_reporte, folio, periodo_inicio, periodo_fin, contenido, archivo, fecha, id_usuario
 # ==================== ARCHIVO CORREGIDO ====================
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel
@@ -11,7 +11,11 @@ from typing import Optional
 from datetime import date, datetime
 import json
 
+from app.core.etag import etag_version, version_de_if_match
+from app.db.actualizaciones import actualizar_con_version
+from app.db.consultas_dinamicas import ConsultaDinamica
 from app.db.database import get_db
+from app.db.inserciones import insertar_fila
 
 router = APIRouter(prefix="/api/hoja-reporte", tags=["hoja-reporte"])
 
@@ -38,6 +42,36 @@ class HojaReporteUpdate(BaseModel):
 
 # ==================== Endpoints ====================
 
+CONSULTA_HOJAS_REPORTE = ConsultaDinamica(
+    base="""
+        SELECT
+            hr.id_reporte,
+            hr.folio,
+            hr.periodo_inicio,
+            hr.periodo_fin,
+            hr.contenido,
+            hr.archivo,
+            hr.fecha,
+            hr.id_usuario,
+            u.nombre AS usuario_nombre,
+            u.usuario AS usuario_login
+        FROM hoja_reporte hr
+        LEFT JOIN usuarios u ON u.id_usuario = hr.id_usuario
+        WHERE 1=1""",
+    filtros={
+        "folio": "hr.folio LIKE :folio",
+        "periodo_inicio": "hr.periodo_inicio >= :periodo_inicio",
+        "periodo_fin": "hr.periodo_fin <= :periodo_fin",
+        "id_usuario": "hr.id_usuario = :id_usuario",
+        "mvz": "u.nombre LIKE :mvz",
+        "fecha": "DATE(hr.fecha) = :fecha",
+        "fecha_desde": "hr.fecha >= :fecha_desde",
+        "fecha_hasta": "hr.fecha <= :fecha_hasta",
+    },
+    final="ORDER BY hr.id_reporte DESC LIMIT :limit",
+)
+
+
 @router.get("")
 def consultar_hojas_reporte(
     folio: Optional[str] = None,
@@ -55,59 +89,42 @@ def consultar_hojas_reporte(
     Consulta hojas de reporte con filtros opcionales
     BD: id_reporte, folio, periodo_inicio, periodo_fin, contenido, archivo, fecha, id_usuario
     """
-    sql = """
-        SELECT
-            hr.id_reporte,
-            hr.folio,
-            hr.periodo_inicio,
-            hr.periodo_fin,
-            hr.contenido,
-            hr.archivo,
-            hr.fecha,
-            hr.id_usuario,
-            u.nombre AS usuario_nombre,
-            u.usuario AS usuario_login
-        FROM hoja_reporte hr
-        LEFT JOIN usuarios u ON u.id_usuario = hr.id_usuario
-        WHERE 1=1
-    """
+    activos = []
     params = {"limit": int(limit)}
 
     if folio:
-        sql += " AND hr.folio LIKE :folio"
+        activos.append("folio")
         params["folio"] = f"%{folio.strip()}%"
 
     if periodo_inicio:
-        sql += " AND hr.periodo_inicio >= :periodo_inicio"
+        activos.append("periodo_inicio")
         params["periodo_inicio"] = periodo_inicio
 
     if periodo_fin:
-        sql += " AND hr.periodo_fin <= :periodo_fin"
+        activos.append("periodo_fin")
         params["periodo_fin"] = periodo_fin
 
     if id_usuario:
-        sql += " AND hr.id_usuario = :id_usuario"
+        activos.append("id_usuario")
         params["id_usuario"] = id_usuario
 
     if mvz:
-        sql += " AND u.nombre LIKE :mvz"
+        activos.append("mvz")
         params["mvz"] = f"%{mvz.strip()}%"
 
     if fecha:
-        sql += " AND DATE(hr.fecha) = :fecha"
+        activos.append("fecha")
         params["fecha"] = fecha
 
     if fecha_desde:
-        sql += " AND hr.fecha >= :fecha_desde"
+        activos.append("fecha_desde")
         params["fecha_desde"] = fecha_desde
 
     if fecha_hasta:
-        sql += " AND hr.fecha <= :fecha_hasta"
+        activos.append("fecha_hasta")
         params["fecha_hasta"] = fecha_hasta
 
-    sql += " ORDER BY hr.id_reporte DESC LIMIT :limit"
-
-    rows = db.execute(text(sql), params).mappings().all()
+    rows = db.execute(CONSULTA_HOJAS_REPORTE.sentencia(activos), params).mappings().all()
 
     # Mapear a formato esperado por frontend
     hojas = []
@@ -144,13 +161,14 @@ def consultar_hojas_reporte(
 
 
 @router.get("/{id_reporte}")
-def obtener_hoja_reporte(id_reporte: int, db: Session = Depends(get_db)):
+def obtener_hoja_reporte(id_reporte: int, response: Response, db: Session = Depends(get_db)):
     """
     Obtiene una hoja de reporte específica por ID
     BD: id_reporte, folio, periodo_inicio, periodo_fin, contenido, archivo, fecha, id_usuario
     """
     sql = text("""
         SELECT
+            hr.version,
             hr.id_reporte,
             hr.folio,
             hr.periodo_inicio,
@@ -197,6 +215,7 @@ def obtener_hoja_reporte(id_reporte: int, db: Session = Depends(get_db)):
         "obs": ""
     }
 
+    response.headers["ETag"] = etag_version(row["version"])
     return hoja_data
 
 
@@ -232,16 +251,14 @@ def crear_hoja_reporte(payload: HojaReporteCreate, db: Session = Depends(get_db)
             )
         """)
 
-        db.execute(insert_sql, {
+        new_id = insertar_fila(db, insert_sql, {
             "folio": payload.folio,
             "periodo_inicio": payload.periodo_inicio,
             "periodo_fin": payload.periodo_fin,
             "contenido": contenido_json,
             "archivo": payload.archivo,
             "id_usuario": payload.id_usuario
-        })
-
-        new_id = db.execute(text("SELECT LAST_INSERT_ID() AS id")).mappings().first()["id"]
+        }, errores={"id_usuario": (404, "El usuario especificado no existe")})
         db.commit()
 
         return {
@@ -260,18 +277,18 @@ def crear_hoja_reporte(payload: HojaReporteCreate, db: Session = Depends(get_db)
 
 
 @router.put("/{id_reporte}")
-def actualizar_hoja_reporte(id_reporte: int, payload: HojaReporteUpdate, db: Session = Depends(get_db)):
+def actualizar_hoja_reporte(
+    id_reporte: int,
+    payload: HojaReporteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Actualiza una hoja de reporte existente
     BD: id_reporte, folio, periodo_inicio, periodo_fin, contenido, archivo, fecha, id_usuario
     """
     try:
-        check_sql = text("SELECT id_reporte FROM hoja_reporte WHERE id_reporte = :id_reporte")
-        existe = db.execute(check_sql, {"id_reporte": id_reporte}).first()
-
-        if not existe:
-            raise HTTPException(status_code=404, detail="Hoja de reporte no encontrada")
-
         campos = []
         params = {"id_reporte": id_reporte}
 
@@ -298,14 +315,14 @@ def actualizar_hoja_reporte(id_reporte: int, payload: HojaReporteUpdate, db: Ses
         if not campos:
             raise HTTPException(status_code=400, detail="No hay campos para actualizar")
 
-        update_sql = f"""
-            UPDATE hoja_reporte
-            SET {', '.join(campos)}
-            WHERE id_reporte = :id_reporte
-        """
-
-        db.execute(text(update_sql), params)
+        # Un solo UPDATE: 404/412 según exista o no la fila con esa versión (If-Match)
+        version = actualizar_con_version(
+            db, "hoja_reporte", "id_reporte", campos, params,
+            version_esperada=version_de_if_match(if_match),
+            no_encontrado="Hoja de reporte no encontrada",
+        )
         db.commit()
+        response.headers["ETag"] = etag_version(version)
 
         return {
             "success": True,
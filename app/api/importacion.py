@@ -0,0 +1,47 @@
+# ==================== Importación masiva ====================
+# Carga de UPP y propietarios desde CSV; la lógica vive en app/db/importacion.py
+# (también disponible como: python -m app.db.importacion archivo.csv)
+# ==================== Importación masiva ====================
+
+import io
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+from app.db.importacion import importar_upp
+from app.db.indice_upp import indice_upp
+
+router = APIRouter(prefix="/api/importacion", tags=["importacion"])
+
+
+@router.post("/upp")
+def importar_upp_csv(
+    tareas: BackgroundTasks,
+    archivo: UploadFile = File(...),
+    dry_run: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """
+    Importa UPP y propietarios desde un CSV (UTF-8, con encabezados)
+    dry_run=true solo reporta cuántas UPP/propietarios se crearían o actualizarían
+    """
+    # El archivo se lee en streaming desde el temporal del upload, no se carga completo
+    lineas = io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+    try:
+        resumen = importar_upp(db, lineas, dry_run=dry_run)
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="El archivo debe estar en UTF-8")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al importar: {str(e)}")
+    finally:
+        lineas.detach()
+
+    if not dry_run:
+        # Altas y cambios masivos: más barato recargar el autocompletado completo.
+        # Después de responder: la importación ya está confirmada y un error al
+        # recargar no debe convertirla en un 500 (el cliente la repetiría)
+        tareas.add_task(indice_upp.recargar_tras_escritura)
+    return resumen
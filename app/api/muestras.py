@@ -3,14 +3,22 @@
 # Creado para manejar todas las operaciones de muestras
 # ==================== EMPIEZAN CAMBIOS ====================
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import date
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.etag import etag_version, version_de_if_match
+from app.core.identificadores import PATRON_ARETE, PATRON_CODIGO_MUESTRA
+from app.db.actualizaciones import actualizar_con_version
+from app.db.catalogos import cache_catalogos
+from app.db.consultas_dinamicas import PATRON_MODO, ConsultaDinamica, filtro_identificador
+from app.db.database import get_async_db, get_db
+from app.db.inserciones import insertar_fila, insertar_lote
 
 router = APIRouter(prefix="/api/muestras", tags=["muestras"])
 
@@ -38,6 +46,27 @@ class MuestraCreate(BaseModel):
     tipo_muestra: Optional[str] = None  # Se puede usar para buscar id_tipo_muestra
 
 
+class MuestraLoteItem(BaseModel):
+    # Igual que MuestraCreate; el id_caso viene una sola vez en MuestrasLote
+    codigo_muestra: str
+    numero_arete: Optional[str] = None
+    id_tipo_muestra: Optional[int] = None
+    id_estatus_muestra: Optional[int] = None
+    id_especie: Optional[int] = None
+    id_raza: Optional[int] = None
+    especie: Optional[str] = None
+    sexo: Optional[str] = None
+    edad: Optional[str] = None
+    fecha_toma: Optional[date] = None
+    observaciones: Optional[str] = None
+    tipo_muestra: Optional[str] = None
+
+
+class MuestrasLote(BaseModel):
+    id_caso: int
+    muestras: list[MuestraLoteItem] = Field(..., min_length=1, max_length=500)
+
+
 class MuestraUpdate(BaseModel):
     # BD: id_muestra, id_caso, id_tipo_muestra, id_estatus_muestra, codigo_muestra, numero_arete, id_especie, id_raza, especie, sexo, edad, fecha_toma, observaciones, created_at, updated_at
     codigo_muestra: Optional[str] = None
@@ -60,25 +89,8 @@ class MuestraUpdate(BaseModel):
 # Endpoint: Consultar muestras con filtros
 # ==================== EMPIEZAN CAMBIOS ====================
 
-@router.get("")
-def consultar_muestras(
-    id_caso: Optional[int] = None,
-    codigo_muestra: Optional[str] = None,
-    numero_arete: Optional[str] = None,
-    id_especie: Optional[int] = None,
-    id_tipo_muestra: Optional[int] = None,
-    id_estatus_muestra: Optional[int] = None,
-    estatus: Optional[str] = None,  # Filtro por nombre de estatus (para compatibilidad con frontend)
-    fecha_desde: Optional[date] = None,
-    fecha_hasta: Optional[date] = None,
-    limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
-):
-    """
-    Consulta muestras con filtros opcionales
-    BD: id_muestra, id_caso, id_tipo_muestra, id_estatus_muestra, codigo_muestra, numero_arete, id_especie, id_raza, especie, sexo, edad, fecha_toma, observaciones, created_at, updated_at
-    """
-    sql = """
+CONSULTA_MUESTRAS = ConsultaDinamica(
+    base="""
         SELECT
             m.id_muestra,
             m.id_caso,
@@ -110,49 +122,146 @@ def consultar_muestras(
         LEFT JOIN cat_raza r ON r.id_raza = m.id_raza
         LEFT JOIN cat_tipo_muestra tm ON tm.id_tipo_muestra = m.id_tipo_muestra
         LEFT JOIN cat_estatus_muestra em ON em.id_estatus_muestra = m.id_estatus_muestra
-        WHERE 1=1
+        WHERE 1=1""",
+    filtros={
+        "id_caso": "m.id_caso = :id_caso",
+        "codigo_muestra": "m.codigo_muestra LIKE :codigo_muestra",
+        "codigo_muestra_exacto": "m.codigo_muestra = :codigo_muestra",
+        "numero_arete": "m.numero_arete LIKE :numero_arete",
+        "numero_arete_exacto": "m.numero_arete = :numero_arete",
+        "id_especie": "m.id_especie = :id_especie",
+        "id_tipo_muestra": "m.id_tipo_muestra = :id_tipo_muestra",
+        "id_estatus_muestra": "m.id_estatus_muestra = :id_estatus_muestra",
+        "estatus": "em.nombre LIKE :estatus",
+        "fecha_desde": "m.fecha_toma >= :fecha_desde",
+        "fecha_hasta": "m.fecha_toma <= :fecha_hasta",
+    },
+    final="ORDER BY m.id_muestra DESC LIMIT :limit",
+)
+
+# Misma consulta sin los LEFT JOIN a catálogos (CATALOGOS_SIN_JOIN):
+# los nombres se completan desde cache_catalogos al mapear las filas
+CONSULTA_MUESTRAS_SIN_CATALOGOS = ConsultaDinamica(
+    base="""
+        SELECT
+            m.id_muestra,
+            m.id_caso,
+            m.codigo_muestra,
+            m.numero_arete,
+            m.id_tipo_muestra,
+            m.id_estatus_muestra,
+            m.id_especie,
+            m.id_raza,
+            m.especie AS especie_texto,
+            m.sexo,
+            m.edad,
+            m.fecha_toma,
+            m.observaciones,
+            m.created_at,
+            m.updated_at,
+            c.numero_caso,
+            u.clave_upp,
+            p.nombre AS nombre_propietario
+        FROM muestras m
+        INNER JOIN casos c ON c.id_caso = m.id_caso
+        INNER JOIN upp u ON u.id_upp = c.id_upp
+        INNER JOIN propietarios p ON p.id_propietario = u.id_propietario
+        WHERE 1=1""",
+    filtros={
+        **CONSULTA_MUESTRAS.filtros,
+        "estatus": "m.id_estatus_muestra IN :estatus",
+    },
+    final=CONSULTA_MUESTRAS.final,
+    expandibles=("estatus",),
+)
+
+
+# Catálogos que lee consultar_muestras con CATALOGOS_SIN_JOIN
+_CATALOGOS_MUESTRA = ["cat_especie", "cat_raza", "cat_tipo_muestra", "cat_estatus_muestra"]
+
+
+def _nombres_catalogo_muestra(row) -> dict:
+    return {
+        **row,
+        "especie_cat": cache_catalogos.nombre("cat_especie", row["id_especie"]),
+        "raza": cache_catalogos.nombre("cat_raza", row["id_raza"]),
+        "tipo_muestra": cache_catalogos.nombre("cat_tipo_muestra", row["id_tipo_muestra"], "descripcion"),
+        "estatus_muestra": cache_catalogos.nombre("cat_estatus_muestra", row["id_estatus_muestra"]),
+    }
+
+
+@router.get("")
+async def consultar_muestras(
+    id_caso: Optional[int] = None,
+    codigo_muestra: Optional[str] = None,
+    numero_arete: Optional[str] = None,
+    id_especie: Optional[int] = None,
+    id_tipo_muestra: Optional[int] = None,
+    id_estatus_muestra: Optional[int] = None,
+    estatus: Optional[str] = None,  # Filtro por nombre de estatus (para compatibilidad con frontend)
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    match_mode: Optional[str] = Query(None, pattern=PATRON_MODO),  # exact|prefix|contains; sin valor se detecta
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
+    Consulta muestras con filtros opcionales
+    BD: id_muestra, id_caso, id_tipo_muestra, id_estatus_muestra, codigo_muestra, numero_arete, id_especie, id_raza, especie, sexo, edad, fecha_toma, observaciones, created_at, updated_at
+    """
+    sin_join = settings.CATALOGOS_SIN_JOIN
+    if sin_join:
+        await cache_catalogos.asegurar(_CATALOGOS_MUESTRA)
+    activos = []
     params = {"limit": int(limit)}
 
     if id_caso:
-        sql += " AND m.id_caso = :id_caso"
+        activos.append("id_caso")
         params["id_caso"] = id_caso
 
     if codigo_muestra:
-        sql += " AND m.codigo_muestra LIKE :codigo_muestra"
-        params["codigo_muestra"] = f"%{codigo_muestra.strip()}%"
+        filtro, params["codigo_muestra"] = filtro_identificador(
+            "codigo_muestra", codigo_muestra.strip(), match_mode, PATRON_CODIGO_MUESTRA
+        )
+        activos.append(filtro)
 
     if numero_arete:
-        sql += " AND m.numero_arete LIKE :numero_arete"
-        params["numero_arete"] = f"%{numero_arete.strip()}%"
+        filtro, params["numero_arete"] = filtro_identificador(
+            "numero_arete", numero_arete.strip(), match_mode, PATRON_ARETE
+        )
+        activos.append(filtro)
 
     if id_especie:
-        sql += " AND m.id_especie = :id_especie"
+        activos.append("id_especie")
         params["id_especie"] = id_especie
 
     if id_tipo_muestra:
-        sql += " AND m.id_tipo_muestra = :id_tipo_muestra"
+        activos.append("id_tipo_muestra")
         params["id_tipo_muestra"] = id_tipo_muestra
 
     if id_estatus_muestra:
-        sql += " AND m.id_estatus_muestra = :id_estatus_muestra"
+        activos.append("id_estatus_muestra")
         params["id_estatus_muestra"] = id_estatus_muestra
     elif estatus:
         # Filtrar por nombre de estatus para compatibilidad con frontend
-        sql += " AND em.nombre LIKE :estatus"
-        params["estatus"] = f"%{estatus.strip()}%"
+        activos.append("estatus")
+        if sin_join:
+            params["estatus"] = cache_catalogos.ids_coinciden("cat_estatus_muestra", estatus.strip(), contiene=True)
+        else:
+            params["estatus"] = f"%{estatus.strip()}%"
 
     if fecha_desde:
-        sql += " AND m.fecha_toma >= :fecha_desde"
+        activos.append("fecha_desde")
         params["fecha_desde"] = fecha_desde
 
     if fecha_hasta:
-        sql += " AND m.fecha_toma <= :fecha_hasta"
+        activos.append("fecha_hasta")
         params["fecha_hasta"] = fecha_hasta
 
-    sql += " ORDER BY m.id_muestra DESC LIMIT :limit"
-
-    rows = db.execute(text(sql), params).mappings().all()
+    consulta = CONSULTA_MUESTRAS_SIN_CATALOGOS if sin_join else CONSULTA_MUESTRAS
+    rows = (await db.execute(consulta.sentencia(activos), params)).mappings().all()
+    if sin_join:
+        rows = [_nombres_catalogo_muestra(row) for row in rows]
 
     # Mapear campos de BD real a nombres esperados por frontend
     muestras = []
@@ -194,13 +303,14 @@ def consultar_muestras(
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.get("/{id_muestra}")
-def obtener_muestra(id_muestra: int, db: Session = Depends(get_db)):
+def obtener_muestra(id_muestra: int, response: Response, db: Session = Depends(get_db)):
     """
     Obtiene una muestra específica por ID
     BD: id_muestra, id_caso, id_tipo_muestra, id_estatus_muestra, codigo_muestra, numero_arete, id_especie, id_raza, especie, sexo, edad, fecha_toma, observaciones, created_at, updated_at
     """
     sql = text("""
         SELECT
+            m.version,
             m.id_muestra,
             m.id_caso,
             m.codigo_muestra,
@@ -268,6 +378,7 @@ def obtener_muestra(id_muestra: int, db: Session = Depends(get_db)):
         "updated_at": row["updated_at"]
     }
 
+    response.headers["ETag"] = etag_version(row["version"])
     return muestra_data
 
 
@@ -282,30 +393,17 @@ def crear_muestra(payload: MuestraCreate, db: Session = Depends(get_db)):
     BD: id_muestra, id_caso, id_tipo_muestra, id_estatus_muestra, codigo_muestra, numero_arete, id_especie, id_raza, especie, sexo, edad, fecha_toma, observaciones, created_at, updated_at
     """
     try:
-        # Validar que el caso existe
-        check_caso = text("""
-            SELECT id_caso FROM casos WHERE id_caso = :id_caso
-        """)
-        caso = db.execute(check_caso, {"id_caso": payload.id_caso}).first()
-
-        if not caso:
-            raise HTTPException(status_code=404, detail="El caso especificado no existe")
-
         # Determinar id_tipo_muestra (puede venir directo o buscarse por nombre)
         id_tipo_muestra = payload.id_tipo_muestra
         if not id_tipo_muestra and payload.tipo_muestra:
-            tipo_sql = text("SELECT id_tipo_muestra FROM cat_tipo_muestra WHERE descripcion LIKE :desc LIMIT 1")
-            tipo_row = db.execute(tipo_sql, {"desc": f"%{payload.tipo_muestra}%"}).first()
-            if tipo_row:
-                id_tipo_muestra = tipo_row[0]
+            id_tipo_muestra = cache_catalogos.buscar_id(
+                "cat_tipo_muestra", payload.tipo_muestra, campo="descripcion", contiene=True
+            )
 
         # Si no se proporciona id_estatus_muestra, buscar el estatus por defecto (ej: PENDIENTE)
         id_estatus_muestra = payload.id_estatus_muestra
         if not id_estatus_muestra:
-            estatus_sql = text("SELECT id_estatus_muestra FROM cat_estatus_muestra WHERE nombre = 'PENDIENTE' LIMIT 1")
-            estatus_row = db.execute(estatus_sql).first()
-            if estatus_row:
-                id_estatus_muestra = estatus_row[0]
+            id_estatus_muestra = cache_catalogos.buscar_id("cat_estatus_muestra", "PENDIENTE")
 
         # Insertar muestra con campos reales de BD
         insert_sql = text("""
@@ -340,7 +438,8 @@ def crear_muestra(payload: MuestraCreate, db: Session = Depends(get_db)):
             )
         """)
 
-        db.execute(insert_sql, {
+        # La FK a casos valida que el caso exista en el mismo INSERT
+        new_id = insertar_fila(db, insert_sql, {
             "id_caso": payload.id_caso,
             "id_tipo_muestra": id_tipo_muestra,
             "id_estatus_muestra": id_estatus_muestra,
@@ -353,9 +452,7 @@ def crear_muestra(payload: MuestraCreate, db: Session = Depends(get_db)):
             "edad": payload.edad,
             "fecha_toma": payload.fecha_toma,
             "observaciones": payload.observaciones
-        })
-
-        new_id = db.execute(text("SELECT LAST_INSERT_ID() AS id")).mappings().first()["id"]
+        }, errores={"id_caso": (404, "El caso especificado no existe")})
         db.commit()
 
         return {
@@ -372,23 +469,95 @@ def crear_muestra(payload: MuestraCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error al crear muestra: {str(e)}")
 
 
+# ==================== Endpoint: Registrar muestras por lote ====================
+
+COLUMNAS_MUESTRA = (
+    "id_caso",
+    "id_tipo_muestra",
+    "id_estatus_muestra",
+    "codigo_muestra",
+    "numero_arete",
+    "id_especie",
+    "id_raza",
+    "especie",
+    "sexo",
+    "edad",
+    "fecha_toma",
+    "observaciones",
+)
+
+
+@router.post("/bulk")
+def crear_muestras_lote(payload: MuestrasLote, db: Session = Depends(get_db)):
+    """
+    Registra todas las muestras de una visita en una sola transacción
+    Devuelve los ids en el mismo orden en que llegaron las muestras
+    """
+    try:
+        caso = db.execute(
+            text("SELECT id_caso FROM casos WHERE id_caso = :id_caso"),
+            {"id_caso": payload.id_caso},
+        ).first()
+
+        if not caso:
+            raise HTTPException(status_code=404, detail="El caso especificado no existe")
+
+        # Catálogos resueltos una vez por lote
+        id_pendiente = cache_catalogos.buscar_id("cat_estatus_muestra", "PENDIENTE")
+        tipos: dict[str, Optional[int]] = {}
+
+        filas = []
+        for muestra in payload.muestras:
+            id_tipo_muestra = muestra.id_tipo_muestra
+            if not id_tipo_muestra and muestra.tipo_muestra:
+                if muestra.tipo_muestra not in tipos:
+                    tipos[muestra.tipo_muestra] = cache_catalogos.buscar_id(
+                        "cat_tipo_muestra", muestra.tipo_muestra, campo="descripcion", contiene=True
+                    )
+                id_tipo_muestra = tipos[muestra.tipo_muestra]
+
+            filas.append({
+                **muestra.model_dump(exclude={"tipo_muestra"}),
+                "id_caso": payload.id_caso,
+                "id_tipo_muestra": id_tipo_muestra,
+                "id_estatus_muestra": muestra.id_estatus_muestra or id_pendiente,
+            })
+
+        ids = insertar_lote(db, "muestras", COLUMNAS_MUESTRA, filas, expresiones={"created_at": "NOW()"})
+        db.commit()
+
+        return {
+            "success": True,
+            "message": f"{len(ids)} muestras creadas exitosamente",
+            "id_caso": payload.id_caso,
+            "ids_muestra": ids,
+        }
+
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al crear muestras: {str(e)}")
+
+
 # ==================== EMPIEZAN CAMBIOS ====================
 # Endpoint: Actualizar muestra
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.put("/{id_muestra}")
-def actualizar_muestra(id_muestra: int, payload: MuestraUpdate, db: Session = Depends(get_db)):
+def actualizar_muestra(
+    id_muestra: int,
+    payload: MuestraUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Actualiza los datos de una muestra existente
     BD: id_muestra, id_caso, id_tipo_muestra, id_estatus_muestra, codigo_muestra, numero_arete, id_especie, id_raza, especie, sexo, edad, fecha_toma, observaciones, created_at, updated_at
     """
     try:
-        check_sql = text("SELECT id_muestra FROM muestras WHERE id_muestra = :id_muestra")
-        existe = db.execute(check_sql, {"id_muestra": id_muestra}).first()
-
-        if not existe:
-            raise HTTPException(status_code=404, detail="Muestra no encontrada")
-
         campos = []
         params = {"id_muestra": id_muestra}
 
@@ -405,11 +574,12 @@ def actualizar_muestra(id_muestra: int, payload: MuestraUpdate, db: Session = De
             campos.append("id_tipo_muestra = :id_tipo_muestra")
             params["id_tipo_muestra"] = payload.id_tipo_muestra
         elif payload.tipo_muestra is not None:
-            tipo_sql = text("SELECT id_tipo_muestra FROM cat_tipo_muestra WHERE descripcion LIKE :desc LIMIT 1")
-            tipo_row = db.execute(tipo_sql, {"desc": f"%{payload.tipo_muestra}%"}).first()
-            if tipo_row:
+            id_tipo_muestra = cache_catalogos.buscar_id(
+                "cat_tipo_muestra", payload.tipo_muestra, campo="descripcion", contiene=True
+            )
+            if id_tipo_muestra:
                 campos.append("id_tipo_muestra = :id_tipo_muestra")
-                params["id_tipo_muestra"] = tipo_row[0]
+                params["id_tipo_muestra"] = id_tipo_muestra
 
         if payload.id_estatus_muestra is not None:
             campos.append("id_estatus_muestra = :id_estatus_muestra")
@@ -449,14 +619,14 @@ def actualizar_muestra(id_muestra: int, payload: MuestraUpdate, db: Session = De
         # Agregar updated_at
         campos.append("updated_at = NOW()")
 
-        update_sql = f"""
-            UPDATE muestras
-            SET {', '.join(campos)}
-            WHERE id_muestra = :id_muestra
-        """
-
-        db.execute(text(update_sql), params)
+        # Un solo UPDATE: 404/412 según exista o no la fila con esa versión (If-Match)
+        version = actualizar_con_version(
+            db, "muestras", "id_muestra", campos, params,
+            version_esperada=version_de_if_match(if_match),
+            no_encontrado="Muestra no encontrada",
+        )
         db.commit()
+        response.headers["ETag"] = etag_version(version)
 
         return {
             "success": True,
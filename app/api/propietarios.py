@@ -1,12 +1,21 @@
 # ==================== EMPIEZAN CAMBIOS ====================
 # Se agregaron imports para Query y modelos Pydantic
 # ==================== EMPIEZAN CAMBIOS ====================
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from app.core.config import settings
+from app.core.etag import etag_version, version_de_if_match
+from app.core.identificadores import PATRON_CLAVE_UPP, PATRON_CURP
+from app.core.texto import consulta_booleana, nombre_canonico
+from app.db.actualizaciones import actualizar_con_version
+from app.db.consultas_dinamicas import PATRON_MODO, ConsultaDinamica, filtro_identificador
 from app.db.database import get_db
+from app.db.indice_upp import indice_upp
+from app.db.inserciones import insertar_fila
+from app.db.nombres import buscar_similares, hay_sin_normalizar
 
 router = APIRouter(prefix="/api/propietarios", tags=["propietarios"])
 
@@ -30,6 +39,11 @@ class PropietarioCreate(BaseModel):
     correo: Optional[EmailStr] = None  # Alias para email
     activo: Optional[bool] = None  # Mapea a estatus
 
+    # Sin CURP y a pedido del cliente: buscar nombres muy parecidos antes del INSERT.
+    # verificar_duplicados los devuelve como aviso; bloquear_duplicados responde 409
+    verificar_duplicados: bool = False
+    bloquear_duplicados: bool = False
+
 
 class PropietarioUpdate(BaseModel):
     # BD: id_propietario, nombre, curp, rfc, telefono, email, estatus (ENUM: ACTIVO/FINADO), fecha_registro, fecha_actualizacion
@@ -96,28 +110,31 @@ def propietario_por_curp(curp: str, db: Session = Depends(get_db)):
     return propietario_data
 
 
-# ==================== EMPIEZAN CAMBIOS ====================
-# Endpoint: Consultar propietarios con múltiples filtros
-# ==================== EMPIEZAN CAMBIOS ====================
+# ==================== Nombres similares ====================
+# Debe declararse antes de /{id_propietario}. Ver app/db/nombres.py.
 
-@router.get("")
-def consultar_propietarios(
-    curp: Optional[str] = None,
-    nombre: Optional[str] = None,
-    upp: Optional[str] = None,
-    estatus: Optional[str] = None,
-    # Parámetros del frontend que no existen en BD (se ignoran)
-    municipio: Optional[str] = None,
-    localidad: Optional[str] = None,
-    activo: Optional[bool] = None,
-    limit: int = Query(100, ge=1, le=500),
+@router.get("/similares")
+def propietarios_similares(
+    nombre: str = Query(..., min_length=1, max_length=255),
+    limit: int = Query(10, ge=1, le=50),
+    umbral: Optional[float] = Query(None, ge=0, le=1),
     db: Session = Depends(get_db)
 ):
     """
-    Consulta propietarios con filtros opcionales
-    BD: id_propietario, nombre, curp, rfc, telefono, email, estatus (ENUM: ACTIVO/FINADO), fecha_registro, fecha_actualizacion
+    Propietarios con nombre parecido (sin importar acentos, mayúsculas ni
+    orden de apellidos), ordenados por puntaje de 0 a 1
     """
-    sql = """
+    if umbral is None:
+        umbral = settings.PROPIETARIOS_UMBRAL_SIMILAR
+    return buscar_similares(db, nombre, limit, umbral)
+
+
+# ==================== EMPIEZAN CAMBIOS ====================
+# Endpoint: Consultar propietarios con múltiples filtros
+# ==================== EMPIEZAN CAMBIOS ====================
+
+CONSULTA_PROPIETARIOS = ConsultaDinamica(
+    base="""
         SELECT DISTINCT
             p.id_propietario,
             p.nombre,
@@ -133,44 +150,89 @@ def consultar_propietarios(
         FROM propietarios p
         LEFT JOIN upp u ON u.id_propietario = p.id_propietario
         LEFT JOIN cat_municipio m ON m.id_municipio = u.id_municipio
-        WHERE 1=1
+        WHERE 1=1""",
+    filtros={
+        "curp": "p.curp LIKE :curp",
+        "curp_exacto": "p.curp = :curp",
+        "nombre": "p.nombre LIKE :nombre",
+        "nombre_ft": "MATCH (p.nombre_normalizado) AGAINST (:nombre_ft IN BOOLEAN MODE)",
+        # Mientras falte el llenado de nombre_normalizado: esas filas se buscan como antes
+        "nombre_ft_o_pendiente": """(MATCH (p.nombre_normalizado) AGAINST (:nombre_ft IN BOOLEAN MODE)
+            OR (p.nombre_normalizado IS NULL AND p.nombre LIKE :nombre))""",
+        "upp": "u.clave_upp LIKE :upp",
+        "upp_exacto": "u.clave_upp = :upp",
+        "estatus": "p.estatus = :estatus",
+        "municipio": "m.nombre LIKE :municipio",
+        "localidad": "u.localidad LIKE :localidad",
+    },
+    final="ORDER BY p.id_propietario DESC LIMIT :limit",
+)
+
+
+@router.get("")
+def consultar_propietarios(
+    curp: Optional[str] = None,
+    nombre: Optional[str] = None,
+    upp: Optional[str] = None,
+    estatus: Optional[str] = None,
+    # Parámetros del frontend que no existen en BD (se ignoran)
+    municipio: Optional[str] = None,
+    localidad: Optional[str] = None,
+    activo: Optional[bool] = None,
+    match_mode: Optional[str] = Query(None, pattern=PATRON_MODO),  # exact|prefix|contains; sin valor se detecta
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Consulta propietarios con filtros opcionales
+    curp y upp: una CURP completa se busca con "=" salvo que match_mode diga otra cosa
+    BD: id_propietario, nombre, curp, rfc, telefono, email, estatus (ENUM: ACTIVO/FINADO), fecha_registro, fecha_actualizacion
     """
+    activos = []
     params = {"limit": int(limit)}
 
     if curp:
-        sql += " AND p.curp LIKE :curp"
-        params["curp"] = f"%{curp.strip().upper()}%"
+        filtro, params["curp"] = filtro_identificador("curp", curp.strip().upper(), match_mode, PATRON_CURP)
+        activos.append(filtro)
 
     if nombre:
-        sql += " AND p.nombre LIKE :nombre"
-        params["nombre"] = f"%{nombre.strip()}%"
+        # Índice FULLTEXT sobre el nombre normalizado; LIKE solo si el texto es de una letra
+        consulta = consulta_booleana(nombre_canonico(nombre))
+        if consulta and hay_sin_normalizar(db):
+            activos.append("nombre_ft_o_pendiente")
+            params["nombre_ft"] = consulta
+            params["nombre"] = f"%{nombre.strip()}%"
+        elif consulta:
+            activos.append("nombre_ft")
+            params["nombre_ft"] = consulta
+        else:
+            activos.append("nombre")
+            params["nombre"] = f"%{nombre.strip()}%"
 
     if upp:
-        sql += " AND u.clave_upp LIKE :upp"
-        params["upp"] = f"%{upp.strip()}%"
+        filtro, params["upp"] = filtro_identificador("upp", upp.strip().upper(), match_mode, PATRON_CLAVE_UPP)
+        activos.append(filtro)
 
     if estatus:
-        sql += " AND p.estatus = :estatus"
+        activos.append("estatus")
         params["estatus"] = estatus.strip().upper()
 
     # Mapear activo (del frontend) a estatus (de la BD)
     if activo is not None:
-        sql += " AND p.estatus = :estatus"
+        activos.append("estatus")
         params["estatus"] = "ACTIVO" if activo else "FINADO"
 
     # Filtrar por municipio (viene de la UPP)
     if municipio:
-        sql += " AND m.nombre LIKE :municipio"
+        activos.append("municipio")
         params["municipio"] = f"%{municipio.strip()}%"
 
     # Filtrar por localidad (viene de la UPP)
     if localidad:
-        sql += " AND u.localidad LIKE :localidad"
+        activos.append("localidad")
         params["localidad"] = f"%{localidad.strip()}%"
 
-    sql += " ORDER BY p.id_propietario DESC LIMIT :limit"
-
-    rows = db.execute(text(sql), params).mappings().all()
+    rows = db.execute(CONSULTA_PROPIETARIOS.sentencia(activos), params).mappings().all()
 
     # Mapear campos reales de BD a campos esperados por frontend
     propietarios = []
@@ -204,13 +266,14 @@ def consultar_propietarios(
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.get("/{id_propietario}")
-def obtener_propietario(id_propietario: int, db: Session = Depends(get_db)):
+def obtener_propietario(id_propietario: int, response: Response, db: Session = Depends(get_db)):
     """
     Obtiene un propietario específico por ID
     BD: id_propietario, nombre, curp, rfc, telefono, email, estatus (ENUM: ACTIVO/FINADO), fecha_registro, fecha_actualizacion
     """
     sql = text("""
         SELECT
+            version,
             id_propietario,
             nombre,
             curp,
@@ -244,6 +307,7 @@ def obtener_propietario(id_propietario: int, db: Session = Depends(get_db)):
         "fecha_registro": row["fecha_registro"]
     }
 
+    response.headers["ETag"] = etag_version(row["version"])
     return propietario_data
 
 
@@ -258,20 +322,6 @@ def crear_propietario(payload: PropietarioCreate, db: Session = Depends(get_db))
     BD: id_propietario, nombre, curp, rfc, telefono, email, estatus (ENUM: ACTIVO/FINADO), fecha_registro, fecha_actualizacion
     """
     try:
-        # Validar que el CURP no exista (si se proporciona)
-        if payload.curp:
-            check_sql = text("""
-                SELECT id_propietario FROM propietarios
-                WHERE curp = :curp
-            """)
-            existe = db.execute(check_sql, {"curp": payload.curp.upper()}).first()
-
-            if existe:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Ya existe un propietario con ese CURP"
-                )
-
         # Construir nombre completo si vienen apellidos del frontend
         nombre_completo = payload.nombre
         if payload.apellido_paterno:
@@ -287,10 +337,24 @@ def crear_propietario(payload: PropietarioCreate, db: Session = Depends(get_db))
         if payload.activo is not None:
             estatus_value = "ACTIVO" if payload.activo else "FINADO"
 
+        # Posibles duplicados con otra escritura del nombre, solo si el cliente lo
+        # pide: por defecto el alta es un solo INSERT (el frontend puede consultar
+        # /similares mientras se captura). Con CURP no aplica: la llave única ya
+        # identifica a la persona (y nombres comunes se repiten)
+        similares = []
+        if not payload.curp and (payload.verificar_duplicados or payload.bloquear_duplicados):
+            similares = buscar_similares(db, nombre_completo, umbral=settings.PROPIETARIOS_UMBRAL_DUPLICADO)
+            if similares and payload.bloquear_duplicados:
+                raise HTTPException(status_code=409, detail={
+                    "message": "Existen propietarios con un nombre muy parecido",
+                    "similares": similares,
+                })
+
         # Insertar propietario con campos reales de BD
         insert_sql = text("""
             INSERT INTO propietarios (
                 nombre,
+                nombre_normalizado,
                 curp,
                 rfc,
                 telefono,
@@ -299,6 +363,7 @@ def crear_propietario(payload: PropietarioCreate, db: Session = Depends(get_db))
                 fecha_registro
             ) VALUES (
                 :nombre,
+                :nombre_normalizado,
                 :curp,
                 :rfc,
                 :telefono,
@@ -308,24 +373,25 @@ def crear_propietario(payload: PropietarioCreate, db: Session = Depends(get_db))
             )
         """)
 
-        db.execute(insert_sql, {
+        # La llave única de curp valida duplicados en el mismo INSERT
+        new_id = insertar_fila(db, insert_sql, {
             "nombre": nombre_completo,
+            "nombre_normalizado": nombre_canonico(nombre_completo),
             "curp": payload.curp.upper() if payload.curp else None,
             "rfc": payload.rfc.upper() if payload.rfc else None,
             "telefono": payload.telefono,
             "email": email_value,
             "estatus": estatus_value.upper()
-        })
-
-        # Obtener ID del propietario creado
-        new_id = db.execute(text("SELECT LAST_INSERT_ID() AS id")).mappings().first()["id"]
+        }, errores={"curp": (400, "Ya existe un propietario con ese CURP")})
 
         db.commit()
 
         return {
             "success": True,
             "message": "Propietario creado exitosamente",
-            "id_propietario": int(new_id)
+            "id_propietario": int(new_id),
+            # Aviso no bloqueante para que el frontend ofrezca revisar
+            "posibles_duplicados": similares
         }
 
     except HTTPException:
@@ -341,19 +407,18 @@ def crear_propietario(payload: PropietarioCreate, db: Session = Depends(get_db))
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.put("/{id_propietario}")
-def actualizar_propietario(id_propietario: int, payload: PropietarioUpdate, db: Session = Depends(get_db)):
+def actualizar_propietario(
+    id_propietario: int,
+    payload: PropietarioUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Actualiza los datos de un propietario existente
     BD: id_propietario, nombre, curp, rfc, telefono, email, estatus (ENUM: ACTIVO/FINADO), fecha_registro, fecha_actualizacion
     """
     try:
-        # Verificar que el propietario existe
-        check_sql = text("SELECT id_propietario FROM propietarios WHERE id_propietario = :id_propietario")
-        existe = db.execute(check_sql, {"id_propietario": id_propietario}).first()
-
-        if not existe:
-            raise HTTPException(status_code=404, detail="Propietario no encontrado")
-
         # Construir UPDATE dinámicamente solo con campos reales de BD
         campos = []
         params = {"id_propietario": id_propietario}
@@ -368,21 +433,10 @@ def actualizar_propietario(id_propietario: int, payload: PropietarioUpdate, db:
             if nombre_completo:
                 campos.append("nombre = :nombre")
                 params["nombre"] = nombre_completo
+                campos.append("nombre_normalizado = :nombre_normalizado")
+                params["nombre_normalizado"] = nombre_canonico(nombre_completo)
 
         if payload.curp is not None:
-            # Verificar que no exista otro propietario con ese CURP
-            check_curp = text("""
-                SELECT id_propietario FROM propietarios
-                WHERE curp = :curp AND id_propietario != :id_propietario
-            """)
-            existe_curp = db.execute(check_curp, {
-                "curp": payload.curp.upper(),
-                "id_propietario": id_propietario
-            }).first()
-
-            if existe_curp:
-                raise HTTPException(status_code=400, detail="Ya existe otro propietario con ese CURP")
-
             campos.append("curp = :curp")
             params["curp"] = payload.curp.upper()
 
@@ -416,15 +470,20 @@ def actualizar_propietario(id_propietario: int, payload: PropietarioUpdate, db:
         # Agregar fecha_actualizacion
         campos.append("fecha_actualizacion = NOW()")
 
-        # Ejecutar UPDATE
-        update_sql = f"""
-            UPDATE propietarios
-            SET {', '.join(campos)}
-            WHERE id_propietario = :id_propietario
-        """
-
-        db.execute(text(update_sql), params)
+        # Un solo UPDATE: 404/412 según exista o no la fila con esa versión (If-Match)
+        version = actualizar_con_version(
+            db, "propietarios", "id_propietario", campos, params,
+            version_esperada=version_de_if_match(if_match),
+            no_encontrado="Propietario no encontrado",
+            errores={
+                "curp": (400, "Ya existe otro propietario con ese CURP"),
+            },
+        )
         db.commit()
+        response.headers["ETag"] = etag_version(version)
+        if "nombre" in params:
+            # El autocompletado de UPP muestra el nombre del propietario
+            indice_upp.actualizar_propietario(id_propietario)
 
         return {
             "success": True,
@@ -452,7 +511,7 @@ def desactivar_propietario(id_propietario: int, db: Session = Depends(get_db)):
     try:
         sql = text("""
             UPDATE propietarios
-            SET estatus = 'FINADO', fecha_actualizacion = NOW()
+            SET estatus = 'FINADO', fecha_actualizacion = NOW(), version = version + 1
             WHERE id_propietario = :id_propietario
         """)
 
@@ -488,7 +547,7 @@ def reactivar_propietario(id_propietario: int, db: Session = Depends(get_db)):
     try:
         sql = text("""
             UPDATE propietarios
-            SET estatus = 'ACTIVO', fecha_actualizacion = NOW()
+            SET estatus = 'ACTIVO', fecha_actualizacion = NOW(), version = version + 1
             WHERE id_propietario = :id_propietario
         """)
 
@@ -3,14 +3,29 @@
 # Creado para manejar todas las operaciones de resultados de laboratorio
 # ==================== EMPIEZAN CAMBIOS ====================
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from pydantic import BaseModel
+from sqlalchemy import bindparam, text
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional
+from collections import defaultdict
 from datetime import date
-
-from app.db.database import get_db
+import csv
+import io
+import json
+
+from app.core.config import settings
+from app.core.etag import etag_version, version_de_if_match
+from app.core.identificadores import PATRON_NUMERO_CASO
+from app.core.texto import normalizar
+from app.db.actualizaciones import actualizar_con_version
+from app.db.catalogos import cache_catalogos
+from app.db.consultas_dinamicas import PATRON_MODO, ConsultaDinamica, filtro_identificador
+from app.db.database import get_async_db, get_db, motor_para
+from app.db.inserciones import insertar_fila, insertar_lote
 
 router = APIRouter(prefix="/api/resultados", tags=["resultados"])
 
@@ -33,6 +48,25 @@ class ResultadoCreate(BaseModel):
     resultado: Optional[str] = None  # Se puede usar para buscar id_resultado
 
 
+class ResultadoIngesta(BaseModel):
+    # Una fila de la corrida de un analizador; la muestra se identifica por id o por código
+    id_muestra: Optional[int] = None
+    codigo_muestra: Optional[str] = None
+    id_prueba: Optional[int] = None
+    prueba: Optional[str] = None  # Nombre en cat_prueba si no viene id_prueba
+    id_resultado: Optional[int] = None
+    resultado: Optional[str] = None  # Nombre en cat_resultado si no viene id_resultado
+    valor: Optional[str] = None
+    observaciones: Optional[str] = None
+    fecha_resultado: Optional[date] = None
+    id_usuario_valida: Optional[int] = None
+
+
+class IngestaResultados(BaseModel):
+    id_usuario_valida: Optional[int] = None  # Se aplica a las filas que no traen uno
+    resultados: list[ResultadoIngesta] = Field(..., min_length=1, max_length=5000)
+
+
 class ResultadoUpdate(BaseModel):
     # BD: id_resultado_lab, id_muestra, id_prueba, id_resultado, valor, observaciones, fecha_resultado, id_usuario_valida, created_at
     id_prueba: Optional[int] = None
@@ -50,24 +84,8 @@ class ResultadoUpdate(BaseModel):
 # Endpoint: Consultar resultados con filtros
 # ==================== EMPIEZAN CAMBIOS ====================
 
-@router.get("")
-def consultar_resultados(
-    id_muestra: Optional[int] = None,
-    id_caso: Optional[int] = None,
-    numero_caso: Optional[str] = None,
-    id_prueba: Optional[int] = None,
-    id_resultado: Optional[int] = None,
-    resultado: Optional[str] = None,  # Para compatibilidad con frontend
-    fecha_desde: Optional[date] = None,
-    fecha_hasta: Optional[date] = None,
-    limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
-):
-    """
-    Consulta resultados con filtros opcionales
-    BD: id_resultado_lab, id_muestra, id_prueba, id_resultado, valor, observaciones, fecha_resultado, id_usuario_valida, created_at
-    """
-    sql = """
+CONSULTA_RESULTADOS = ConsultaDinamica(
+    base="""
         SELECT
             r.id_resultado_lab,
             r.id_muestra,
@@ -97,77 +115,301 @@ def consultar_resultados(
         LEFT JOIN cat_resultado cr ON cr.id_resultado = r.id_resultado
         LEFT JOIN usuarios usr_val ON usr_val.id_usuario = r.id_usuario_valida
         LEFT JOIN cat_tipo_muestra tm ON tm.id_tipo_muestra = m.id_tipo_muestra
-        WHERE 1=1
-    """
-    params = {"limit": int(limit)}
+        WHERE 1=1""",
+    filtros={
+        "id_muestra": "r.id_muestra = :id_muestra",
+        "id_caso": "m.id_caso = :id_caso",
+        "numero_caso": "c.numero_caso LIKE :numero_caso",
+        "numero_caso_exacto": "c.numero_caso = :numero_caso",
+        "id_prueba": "r.id_prueba = :id_prueba",
+        "id_resultado": "r.id_resultado = :id_resultado",
+        "resultado": "cr.nombre = :resultado",
+        "fecha_desde": "r.fecha_resultado >= :fecha_desde",
+        "fecha_hasta": "r.fecha_resultado <= :fecha_hasta",
+    },
+    final="ORDER BY r.id_resultado_lab DESC LIMIT :limit",
+)
+
+# Misma consulta sin los LEFT JOIN a catálogos (CATALOGOS_SIN_JOIN):
+# los nombres se completan desde cache_catalogos al mapear las filas
+CONSULTA_RESULTADOS_SIN_CATALOGOS = ConsultaDinamica(
+    base="""
+        SELECT
+            r.id_resultado_lab,
+            r.id_muestra,
+            r.id_prueba,
+            r.id_resultado,
+            r.valor,
+            r.observaciones,
+            r.fecha_resultado,
+            r.id_usuario_valida,
+            r.created_at,
+            m.codigo_muestra,
+            m.numero_arete,
+            m.id_caso,
+            m.id_tipo_muestra,
+            c.numero_caso,
+            u.clave_upp,
+            p.nombre AS propietario,
+            usr_val.nombre AS usuario_valida_nombre
+        FROM resultados r
+        INNER JOIN muestras m ON m.id_muestra = r.id_muestra
+        INNER JOIN casos c ON c.id_caso = m.id_caso
+        INNER JOIN upp u ON u.id_upp = c.id_upp
+        INNER JOIN propietarios p ON p.id_propietario = u.id_propietario
+        LEFT JOIN usuarios usr_val ON usr_val.id_usuario = r.id_usuario_valida
+        WHERE 1=1""",
+    filtros={
+        **CONSULTA_RESULTADOS.filtros,
+        "resultado": "r.id_resultado IN :resultado",
+    },
+    final=CONSULTA_RESULTADOS.final,
+    expandibles=("resultado",),
+)
+
+
+# Catálogos que leen el listado y la exportación con CATALOGOS_SIN_JOIN
+_CATALOGOS_RESULTADO = ["cat_prueba", "cat_resultado", "cat_tipo_muestra"]
+
+
+def _nombres_catalogo_resultado(row) -> dict:
+    return {
+        **row,
+        "prueba_nombre": cache_catalogos.nombre("cat_prueba", row["id_prueba"]),
+        "resultado_nombre": cache_catalogos.nombre("cat_resultado", row["id_resultado"]),
+        "tipo_muestra": cache_catalogos.nombre("cat_tipo_muestra", row["id_tipo_muestra"], "descripcion"),
+    }
+
+
+# Exportación: mismas consultas sin LIMIT
+EXPORTACION_RESULTADOS = ConsultaDinamica(
+    base=CONSULTA_RESULTADOS.base,
+    filtros=CONSULTA_RESULTADOS.filtros,
+    final="ORDER BY r.id_resultado_lab DESC",
+)
+EXPORTACION_RESULTADOS_SIN_CATALOGOS = ConsultaDinamica(
+    base=CONSULTA_RESULTADOS_SIN_CATALOGOS.base,
+    filtros=CONSULTA_RESULTADOS_SIN_CATALOGOS.filtros,
+    final="ORDER BY r.id_resultado_lab DESC",
+    expandibles=CONSULTA_RESULTADOS_SIN_CATALOGOS.expandibles,
+)
+
+
+def _filtros_resultados(
+    id_muestra, id_caso, numero_caso, id_prueba, id_resultado, resultado, fecha_desde, fecha_hasta, sin_join,
+    match_mode=None,
+) -> tuple[list, dict]:
+    """Filtros activos y parámetros comunes al listado y a la exportación"""
+    activos = []
+    params = {}
 
     if id_muestra:
-        sql += " AND r.id_muestra = :id_muestra"
+        activos.append("id_muestra")
         params["id_muestra"] = id_muestra
 
     if id_caso:
-        sql += " AND m.id_caso = :id_caso"
+        activos.append("id_caso")
         params["id_caso"] = id_caso
 
     if numero_caso:
-        sql += " AND c.numero_caso LIKE :numero_caso"
-        params["numero_caso"] = f"%{numero_caso.strip()}%"
+        filtro, params["numero_caso"] = filtro_identificador(
+            "numero_caso", numero_caso.strip(), match_mode, PATRON_NUMERO_CASO
+        )
+        activos.append(filtro)
 
     if id_prueba:
-        sql += " AND r.id_prueba = :id_prueba"
+        activos.append("id_prueba")
         params["id_prueba"] = id_prueba
 
     if id_resultado:
-        sql += " AND r.id_resultado = :id_resultado"
+        activos.append("id_resultado")
         params["id_resultado"] = id_resultado
     elif resultado:
         # Buscar por nombre de resultado para compatibilidad
-        sql += " AND cr.nombre = :resultado"
-        params["resultado"] = resultado.strip().upper()
+        activos.append("resultado")
+        if sin_join:
+            params["resultado"] = cache_catalogos.ids_coinciden("cat_resultado", resultado.strip())
+        else:
+            params["resultado"] = resultado.strip().upper()
 
     if fecha_desde:
-        sql += " AND r.fecha_resultado >= :fecha_desde"
+        activos.append("fecha_desde")
         params["fecha_desde"] = fecha_desde
 
     if fecha_hasta:
-        sql += " AND r.fecha_resultado <= :fecha_hasta"
+        activos.append("fecha_hasta")
         params["fecha_hasta"] = fecha_hasta
 
-    sql += " ORDER BY r.id_resultado_lab DESC LIMIT :limit"
+    return activos, params
 
-    rows = db.execute(text(sql), params).mappings().all()
 
+def _mapear_resultado(row) -> dict:
     # Mapear campos reales de BD a campos esperados por frontend
-    resultados_list = []
-    for row in rows:
-        resultado_data = {
-            "id_resultado_lab": row["id_resultado_lab"],
-            "id_resultado": row["id_resultado_lab"],  # Alias para frontend
-            "id_muestra": row["id_muestra"],
-            "codigo_muestra": row["codigo_muestra"],
-            "numero_arete": row["numero_arete"],
-            "id_prueba": row["id_prueba"],
-            "prueba_nombre": row["prueba_nombre"],
-            "prueba_realizada": row["prueba_nombre"],  # Alias para frontend
-            "id_resultado_cat": row["id_resultado"],  # FK a cat_resultado
-            "resultado": row["resultado_nombre"],  # Nombre del resultado (POSITIVO, NEGATIVO, etc.)
-            "resultado_nombre": row["resultado_nombre"],
-            "valor": row["valor"],
-            "observaciones": row["observaciones"],
-            "fecha_resultado": row["fecha_resultado"],
-            "fecha_analisis": row["fecha_resultado"],  # Alias para frontend
-            "id_usuario_valida": row["id_usuario_valida"],
-            "usuario_valida": row["usuario_valida_nombre"],
-            "created_at": row["created_at"],
-            "tipo_muestra": row["tipo_muestra"],
-            "id_caso": row["id_caso"],
-            "numero_caso": row["numero_caso"],
-            "clave_upp": row["clave_upp"],
-            "propietario": row["propietario"]
-        }
-        resultados_list.append(resultado_data)
+    return {
+        "id_resultado_lab": row["id_resultado_lab"],
+        "id_resultado": row["id_resultado_lab"],  # Alias para frontend
+        "id_muestra": row["id_muestra"],
+        "codigo_muestra": row["codigo_muestra"],
+        "numero_arete": row["numero_arete"],
+        "id_prueba": row["id_prueba"],
+        "prueba_nombre": row["prueba_nombre"],
+        "prueba_realizada": row["prueba_nombre"],  # Alias para frontend
+        "id_resultado_cat": row["id_resultado"],  # FK a cat_resultado
+        "resultado": row["resultado_nombre"],  # Nombre del resultado (POSITIVO, NEGATIVO, etc.)
+        "resultado_nombre": row["resultado_nombre"],
+        "valor": row["valor"],
+        "observaciones": row["observaciones"],
+        "fecha_resultado": row["fecha_resultado"],
+        "fecha_analisis": row["fecha_resultado"],  # Alias para frontend
+        "id_usuario_valida": row["id_usuario_valida"],
+        "usuario_valida": row["usuario_valida_nombre"],
+        "created_at": row["created_at"],
+        "tipo_muestra": row["tipo_muestra"],
+        "id_caso": row["id_caso"],
+        "numero_caso": row["numero_caso"],
+        "clave_upp": row["clave_upp"],
+        "propietario": row["propietario"]
+    }
 
-    return resultados_list
+
+@router.get("")
+async def consultar_resultados(
+    id_muestra: Optional[int] = None,
+    id_caso: Optional[int] = None,
+    numero_caso: Optional[str] = None,
+    id_prueba: Optional[int] = None,
+    id_resultado: Optional[int] = None,
+    resultado: Optional[str] = None,  # Para compatibilidad con frontend
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    match_mode: Optional[str] = Query(None, pattern=PATRON_MODO),  # exact|prefix|contains; sin valor se detecta
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Consulta resultados con filtros opcionales
+    BD: id_resultado_lab, id_muestra, id_prueba, id_resultado, valor, observaciones, fecha_resultado, id_usuario_valida, created_at
+    """
+    sin_join = settings.CATALOGOS_SIN_JOIN
+    if sin_join:
+        await cache_catalogos.asegurar(_CATALOGOS_RESULTADO)
+    activos, params = _filtros_resultados(
+        id_muestra, id_caso, numero_caso, id_prueba, id_resultado, resultado, fecha_desde, fecha_hasta, sin_join,
+        match_mode,
+    )
+    params["limit"] = int(limit)
+
+    consulta = CONSULTA_RESULTADOS_SIN_CATALOGOS if sin_join else CONSULTA_RESULTADOS
+    rows = (await db.execute(consulta.sentencia(activos), params)).mappings().all()
+    if sin_join:
+        rows = [_nombres_catalogo_resultado(row) for row in rows]
+
+    return [_mapear_resultado(row) for row in rows]
+
+
+# ==================== Exportación NDJSON/CSV ====================
+
+# Filas por lote leídas del cursor del servidor y por bloque enviado al cliente
+_FILAS_POR_LOTE = 1000
+_COLUMNAS_EXPORTACION = list(_mapear_resultado(defaultdict(lambda: None)))
+
+
+def _valor_exportable(valor):
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return valor
+
+
+def _bloques_exportacion(conn, resultado, sin_join, formato):
+    """Convierte el resultado en bloques de texto; cierra la conexión al terminar"""
+    try:
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer) if formato == "csv" else None
+        if escritor:
+            escritor.writerow(_COLUMNAS_EXPORTACION)
+
+        for lote in resultado.mappings().partitions():
+            for row in lote:
+                if sin_join:
+                    row = _nombres_catalogo_resultado(row)
+                data = _mapear_resultado(row)
+                if escritor:
+                    escritor.writerow([_valor_exportable(data[c]) for c in _COLUMNAS_EXPORTACION])
+                else:
+                    buffer.write(json.dumps(data, default=_valor_exportable, ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        resultado.close()
+        conn.close()
+
+
+def _cerrar_exportacion(bloques, resultado, conn):
+    """
+    Tarea de fondo de la respuesta: Starlette la corre también si el cliente
+    corta la descarga, cuando el generador quedó suspendido (o sin empezar)
+    y su finally no se ejecutaría hasta que lo recolecte el GC
+    """
+    bloques.close()
+    resultado.close()
+    conn.close()
+
+
+@router.get("/export")
+def exportar_resultados(
+    request: Request,
+    formato: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    id_muestra: Optional[int] = None,
+    id_caso: Optional[int] = None,
+    numero_caso: Optional[str] = None,
+    id_prueba: Optional[int] = None,
+    id_resultado: Optional[int] = None,
+    resultado: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    match_mode: Optional[str] = Query(None, pattern=PATRON_MODO),  # exact|prefix|contains; sin valor se detecta
+):
+    """
+    Exporta todos los resultados que cumplen los filtros, sin límite de filas
+    Usa un cursor del servidor (SSCursor): la memoria no crece con el número de filas
+    """
+    sin_join = settings.CATALOGOS_SIN_JOIN
+    activos, params = _filtros_resultados(
+        id_muestra, id_caso, numero_caso, id_prueba, id_resultado, resultado, fecha_desde, fecha_hasta, sin_join,
+        match_mode,
+    )
+    consulta = EXPORTACION_RESULTADOS_SIN_CATALOGOS if sin_join else EXPORTACION_RESULTADOS
+
+    # Conexión propia: vive mientras dura la descarga, no lo que dura el endpoint
+    conn = motor_para(request).connect()
+    try:
+        resultado_sql = conn.execution_options(
+            stream_results=True, yield_per=_FILAS_POR_LOTE
+        ).execute(consulta.sentencia(activos), params)
+    except Exception as e:
+        conn.close()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if formato == "csv":
+        media_type = "text/csv; charset=utf-8"
+        headers = {"Content-Disposition": 'attachment; filename="resultados.csv"'}
+    else:
+        media_type = "application/x-ndjson"
+        headers = {"Content-Disposition": 'attachment; filename="resultados.ndjson"'}
+
+    bloques = _bloques_exportacion(conn, resultado_sql, sin_join, formato)
+    return StreamingResponse(
+        bloques,
+        media_type=media_type,
+        headers=headers,
+        # El cursor del servidor y la conexión se liberan aunque el cliente se desconecte
+        background=BackgroundTask(_cerrar_exportacion, bloques, resultado_sql, conn),
+    )
 
 
 # ==================== EMPIEZAN CAMBIOS ====================
@@ -175,13 +417,14 @@ def consultar_resultados(
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.get("/{id_resultado_lab}")
-def obtener_resultado(id_resultado_lab: int, db: Session = Depends(get_db)):
+def obtener_resultado(id_resultado_lab: int, response: Response, db: Session = Depends(get_db)):
     """
     Obtiene un resultado específico por ID
     BD: id_resultado_lab, id_muestra, id_prueba, id_resultado, valor, observaciones, fecha_resultado, id_usuario_valida, created_at
     """
     sql = text("""
         SELECT
+            r.version,
             r.id_resultado_lab,
             r.id_muestra,
             r.id_prueba,
@@ -244,6 +487,7 @@ def obtener_resultado(id_resultado_lab: int, db: Session = Depends(get_db)):
         "propietario": row["propietario"]
     }
 
+    response.headers["ETag"] = etag_version(row["version"])
     return resultado_data
 
 
@@ -258,22 +502,10 @@ def crear_resultado(payload: ResultadoCreate, db: Session = Depends(get_db)):
     BD: id_resultado_lab, id_muestra, id_prueba, id_resultado, valor, observaciones, fecha_resultado, id_usuario_valida, created_at
     """
     try:
-        # Validar que la muestra existe
-        check_muestra = text("""
-            SELECT id_muestra FROM muestras WHERE id_muestra = :id_muestra
-        """)
-        muestra = db.execute(check_muestra, {"id_muestra": payload.id_muestra}).first()
-
-        if not muestra:
-            raise HTTPException(status_code=404, detail="La muestra especificada no existe")
-
         # Determinar id_resultado (puede venir directo o buscarse por nombre)
         id_resultado_cat = payload.id_resultado
         if not id_resultado_cat and payload.resultado:
-            res_sql = text("SELECT id_resultado FROM cat_resultado WHERE nombre = :nombre LIMIT 1")
-            res_row = db.execute(res_sql, {"nombre": payload.resultado.upper()}).first()
-            if res_row:
-                id_resultado_cat = res_row[0]
+            id_resultado_cat = cache_catalogos.buscar_id("cat_resultado", payload.resultado.upper())
 
         # Insertar resultado con campos reales de BD
         insert_sql = text("""
@@ -298,7 +530,8 @@ def crear_resultado(payload: ResultadoCreate, db: Session = Depends(get_db)):
             )
         """)
 
-        db.execute(insert_sql, {
+        # La FK a muestras valida que la muestra exista en el mismo INSERT
+        new_id = insertar_fila(db, insert_sql, {
             "id_muestra": payload.id_muestra,
             "id_prueba": payload.id_prueba,
             "id_resultado": id_resultado_cat,
@@ -306,9 +539,7 @@ def crear_resultado(payload: ResultadoCreate, db: Session = Depends(get_db)):
             "observaciones": payload.observaciones,
             "fecha_resultado": payload.fecha_resultado,
             "id_usuario_valida": payload.id_usuario_valida
-        })
-
-        new_id = db.execute(text("SELECT LAST_INSERT_ID() AS id")).mappings().first()["id"]
+        }, errores={"id_muestra": (404, "La muestra especificada no existe")})
         db.commit()
 
         return {
@@ -326,23 +557,212 @@ def crear_resultado(payload: ResultadoCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error al crear resultado: {str(e)}")
 
 
+# ==================== Endpoint: Ingesta de resultados de analizador ====================
+
+COLUMNAS_RESULTADO = (
+    "id_muestra",
+    "id_prueba",
+    "id_resultado",
+    "valor",
+    "observaciones",
+    "fecha_resultado",
+    "id_usuario_valida",
+)
+
+MUESTRAS_POR_ID_O_CODIGO = text("""
+    SELECT id_muestra, codigo_muestra
+    FROM muestras
+    WHERE id_muestra IN :ids OR codigo_muestra IN :codigos
+""").bindparams(bindparam("ids", expanding=True), bindparam("codigos", expanding=True))
+
+USUARIOS_EXISTENTES = text("""
+    SELECT id_usuario FROM usuarios WHERE id_usuario IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+
+def _id_catalogo(tabla: str, id_valor: Optional[int], nombre: Optional[str], memo: dict):
+    """Id validado contra el catálogo en memoria; None si no existe"""
+    if id_valor:
+        return id_valor if cache_catalogos.fila(tabla, id_valor) else None
+    clave = (tabla, nombre.strip().upper())
+    if clave not in memo:
+        memo[clave] = cache_catalogos.buscar_id(tabla, clave[1])
+    return memo[clave]
+
+
+def _ingestar(db: Session, filas: list, id_usuario_valida: Optional[int]) -> dict:
+    """
+    Valida e inserta un lote de resultados con un solo commit
+    filas: ResultadoIngesta, o el texto del error si la fila no pasó la validación
+    """
+    validas = [f for f in filas if isinstance(f, ResultadoIngesta)]
+    ids = {f.id_muestra for f in validas if f.id_muestra}
+    codigos = {f.codigo_muestra.strip() for f in validas if not f.id_muestra and f.codigo_muestra}
+    usuarios = {f.id_usuario_valida or id_usuario_valida for f in validas} - {None}
+
+    # Todas las muestras del lote en una consulta
+    por_id = {}
+    # Código normalizado -> ids: MySQL compara codigo_muestra sin distinguir
+    # mayúsculas ni acentos, así que "m-1" también trae la fila "M-1"
+    por_codigo = defaultdict(set)
+    if ids or codigos:
+        for row in db.execute(MUESTRAS_POR_ID_O_CODIGO, {"ids": list(ids), "codigos": list(codigos)}).mappings():
+            por_id[row["id_muestra"]] = row["id_muestra"]
+            if row["codigo_muestra"]:
+                por_codigo[normalizar(row["codigo_muestra"].strip())].add(row["id_muestra"])
+
+    # Un id_usuario_valida inexistente rechaza sus filas, no el lote completo por la FK
+    usuarios_existentes = set()
+    if usuarios:
+        usuarios_existentes = set(db.execute(USUARIOS_EXISTENTES, {"ids": list(usuarios)}).scalars())
+
+    memo: dict = {}
+    estados = []
+    aceptadas = []
+    for numero, fila in enumerate(filas, start=1):
+        if not isinstance(fila, ResultadoIngesta):
+            estados.append({"fila": numero, "estado": "rechazado", "motivo": fila})
+            continue
+
+        if fila.id_muestra:
+            id_muestra = por_id.get(fila.id_muestra)
+        elif fila.codigo_muestra:
+            coinciden = por_codigo.get(normalizar(fila.codigo_muestra.strip()), set())
+            if len(coinciden) > 1:
+                # No hay forma de saber a cuál muestra pertenece el resultado
+                estados.append({
+                    "fila": numero, "estado": "rechazado",
+                    "motivo": "codigo_muestra duplicado en muestras; usar id_muestra",
+                })
+                continue
+            id_muestra = next(iter(coinciden), None)
+        else:
+            estados.append({"fila": numero, "estado": "rechazado", "motivo": "Falta id_muestra o codigo_muestra"})
+            continue
+        if not id_muestra:
+            estados.append({"fila": numero, "estado": "rechazado", "motivo": "La muestra especificada no existe"})
+            continue
+
+        if not fila.id_prueba and not fila.prueba:
+            estados.append({"fila": numero, "estado": "rechazado", "motivo": "Falta id_prueba o prueba"})
+            continue
+        id_prueba = _id_catalogo("cat_prueba", fila.id_prueba, fila.prueba, memo)
+        if not id_prueba:
+            estados.append({"fila": numero, "estado": "rechazado", "motivo": "Prueba no encontrada en cat_prueba"})
+            continue
+
+        id_resultado = None
+        if fila.id_resultado or fila.resultado:
+            id_resultado = _id_catalogo("cat_resultado", fila.id_resultado, fila.resultado, memo)
+            if not id_resultado:
+                estados.append({"fila": numero, "estado": "rechazado", "motivo": "Resultado no encontrado en cat_resultado"})
+                continue
+
+        # Igual que ResultadoCreate: la fecha es obligatoria
+        if not fila.fecha_resultado:
+            estados.append({"fila": numero, "estado": "rechazado", "motivo": "Falta fecha_resultado"})
+            continue
+
+        id_usuario = fila.id_usuario_valida or id_usuario_valida
+        if id_usuario and id_usuario not in usuarios_existentes:
+            estados.append({"fila": numero, "estado": "rechazado", "motivo": "El usuario que valida no existe"})
+            continue
+
+        estado = {"fila": numero, "estado": "aceptado"}
+        estados.append(estado)
+        aceptadas.append((estado, {
+            "id_muestra": id_muestra,
+            "id_prueba": id_prueba,
+            "id_resultado": id_resultado,
+            "valor": fila.valor,
+            "observaciones": fila.observaciones,
+            "fecha_resultado": fila.fecha_resultado,
+            "id_usuario_valida": id_usuario,
+        }))
+
+    if aceptadas:
+        nuevos = insertar_lote(
+            db, "resultados", COLUMNAS_RESULTADO, [datos for _, datos in aceptadas],
+            expresiones={"created_at": "NOW()"},
+        )
+        for (estado, _), nuevo_id in zip(aceptadas, nuevos):
+            estado["id_resultado_lab"] = nuevo_id
+        db.commit()
+
+    return {
+        "success": True,
+        "total": len(filas),
+        "aceptados": len(aceptadas),
+        "rechazados": len(filas) - len(aceptadas),
+        "filas": estados,
+    }
+
+
+@router.post("/ingesta")
+def ingestar_resultados(payload: IngestaResultados, db: Session = Depends(get_db)):
+    """
+    Registra en bloque los resultados de una corrida de analizador
+    Cada fila se acepta o rechaza por separado; las aceptadas se guardan en una sola transacción
+    """
+    try:
+        return _ingestar(db, payload.resultados, payload.id_usuario_valida)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al ingresar resultados: {str(e)}")
+
+
+@router.post("/ingesta/csv")
+def ingestar_resultados_csv(
+    archivo: UploadFile = File(...),
+    id_usuario_valida: Optional[int] = Form(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Igual que /ingesta pero con el CSV exportado por el analizador
+    Encabezados: los campos de ResultadoIngesta (codigo_muestra, prueba, resultado, valor, ...)
+    """
+    try:
+        contenido = archivo.file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El archivo debe estar en UTF-8")
+
+    filas = []
+    for registro in csv.DictReader(io.StringIO(contenido)):
+        datos = {clave.strip(): (valor.strip() or None) for clave, valor in registro.items() if clave and valor is not None}
+        try:
+            filas.append(ResultadoIngesta.model_validate(datos))
+        except ValidationError as e:
+            filas.append("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+
+    if not filas:
+        raise HTTPException(status_code=400, detail="El archivo no contiene filas")
+    if len(filas) > 5000:
+        raise HTTPException(status_code=400, detail="Máximo 5000 filas por archivo")
+
+    try:
+        return _ingestar(db, filas, id_usuario_valida)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al ingresar resultados: {str(e)}")
+
+
 # ==================== EMPIEZAN CAMBIOS ====================
 # Endpoint: Actualizar resultado
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.put("/{id_resultado_lab}")
-def actualizar_resultado(id_resultado_lab: int, payload: ResultadoUpdate, db: Session = Depends(get_db)):
+def actualizar_resultado(
+    id_resultado_lab: int,
+    payload: ResultadoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Actualiza los datos de un resultado existente
     BD: id_resultado_lab, id_muestra, id_prueba, id_resultado, valor, observaciones, fecha_resultado, id_usuario_valida, created_at
     """
     try:
-        check_sql = text("SELECT id_resultado_lab FROM resultados WHERE id_resultado_lab = :id_resultado_lab")
-        existe = db.execute(check_sql, {"id_resultado_lab": id_resultado_lab}).first()
-
-        if not existe:
-            raise HTTPException(status_code=404, detail="Resultado no encontrado")
-
         campos = []
         params = {"id_resultado_lab": id_resultado_lab}
 
@@ -355,11 +775,10 @@ def actualizar_resultado(id_resultado_lab: int, payload: ResultadoUpdate, db: Se
             campos.append("id_resultado = :id_resultado")
             params["id_resultado"] = payload.id_resultado
         elif payload.resultado is not None:
-            res_sql = text("SELECT id_resultado FROM cat_resultado WHERE nombre = :nombre LIMIT 1")
-            res_row = db.execute(res_sql, {"nombre": payload.resultado.upper()}).first()
-            if res_row:
+            id_resultado_cat = cache_catalogos.buscar_id("cat_resultado", payload.resultado.upper())
+            if id_resultado_cat:
                 campos.append("id_resultado = :id_resultado")
-                params["id_resultado"] = res_row[0]
+                params["id_resultado"] = id_resultado_cat
 
         if payload.valor is not None:
             campos.append("valor = :valor")
@@ -380,14 +799,14 @@ def actualizar_resultado(id_resultado_lab: int, payload: ResultadoUpdate, db: Se
         if not campos:
             raise HTTPException(status_code=400, detail="No hay campos para actualizar")
 
-        update_sql = f"""
-            UPDATE resultados
-            SET {', '.join(campos)}
-            WHERE id_resultado_lab = :id_resultado_lab
-        """
-
-        db.execute(text(update_sql), params)
+        # Un solo UPDATE: 404/412 según exista o no la fila con esa versión (If-Match)
+        version = actualizar_con_version(
+            db, "resultados", "id_resultado_lab", campos, params,
+            version_esperada=version_de_if_match(if_match),
+            no_encontrado="Resultado no encontrado",
+        )
         db.commit()
+        response.headers["ETag"] = etag_version(version)
 
         return {
             "success": True,
@@ -2,13 +2,21 @@
 # ==================== EMPIEZAN CAMBIOS ====================
 # Se agregaron imports para modelos Pydantic y Optional
 # ==================== EMPIEZAN CAMBIOS ====================
-from fastapi import APIRouter, Depends, HTTPException, Query
+from anyio import to_thread
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.etag import etag_version, version_de_if_match
+from app.db.actualizaciones import actualizar_con_version
+from app.db.catalogos import cache_catalogos
+from app.db.database import get_async_db, get_db
+from app.db.indice_upp import indice_upp
+from app.db.inserciones import insertar_fila
 
 router = APIRouter(prefix="/api/upp", tags=["upp"])
 
@@ -104,20 +112,7 @@ def upp_por_clave(
     return upp_data
 
 
-@router.get("")
-def buscar_upp(
-    search: str = Query("", max_length=120),
-    limit: int = Query(15, ge=1, le=50),
-    solo_activas: bool = Query(True),
-    db: Session = Depends(get_db),
-):
-    """
-    BD: id_upp, clave_upp, id_propietario, id_municipio, localidad, direccion, telefono_contacto, estatus, fecha_registro
-    """
-    s = (search or "").strip()
-    like = f"%{s}%"
-
-    sql = text("""
+BUSQUEDA_UPP = text("""
         SELECT
           u.id_upp,
           u.clave_upp,
@@ -142,12 +137,68 @@ def buscar_upp(
         LIMIT :limit
     """)
 
-    rows = db.execute(sql, {
+
+# Sin LEFT JOIN a cat_municipio/cat_estado (CATALOGOS_SIN_JOIN): nombres desde cache_catalogos
+BUSQUEDA_UPP_SIN_CATALOGOS = text("""
+        SELECT
+          u.id_upp,
+          u.clave_upp,
+          u.id_propietario,
+          u.id_municipio,
+          u.localidad,
+          u.direccion,
+          u.telefono_contacto,
+          u.estatus,
+          u.fecha_registro,
+          p.nombre AS propietario
+        FROM upp u
+        INNER JOIN propietarios p ON p.id_propietario = u.id_propietario
+        WHERE
+          (:solo_activas = 0 OR u.estatus = 1)
+          AND (:s = '' OR u.clave_upp LIKE :like OR p.nombre LIKE :like)
+        ORDER BY u.clave_upp ASC
+        LIMIT :limit
+    """)
+
+
+# Catálogos que lee buscar_upp con CATALOGOS_SIN_JOIN
+_CATALOGOS_UPP = ["cat_municipio", "cat_estado"]
+
+
+def _nombres_catalogo_upp(row) -> dict:
+    municipio = cache_catalogos.fila("cat_municipio", row["id_municipio"]) if row["id_municipio"] else None
+    return {
+        **row,
+        "municipio_nombre": municipio.get("nombre") if municipio else None,
+        "estado_nombre": cache_catalogos.nombre("cat_estado", municipio.get("id_estado")) if municipio else None,
+    }
+
+
+@router.get("")
+async def buscar_upp(
+    search: str = Query("", max_length=120),
+    limit: int = Query(15, ge=1, le=50),
+    solo_activas: bool = Query(True),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    BD: id_upp, clave_upp, id_propietario, id_municipio, localidad, direccion, telefono_contacto, estatus, fecha_registro
+    """
+    s = (search or "").strip()
+    like = f"%{s}%"
+    sin_join = settings.CATALOGOS_SIN_JOIN
+    if sin_join:
+        await cache_catalogos.asegurar(_CATALOGOS_UPP)
+
+    sql = BUSQUEDA_UPP_SIN_CATALOGOS if sin_join else BUSQUEDA_UPP
+    rows = (await db.execute(sql, {
         "s": s,
         "like": like,
         "limit": int(limit),
         "solo_activas": 1 if solo_activas else 0
-    }).mappings().all()
+    })).mappings().all()
+    if sin_join:
+        rows = [_nombres_catalogo_upp(row) for row in rows]
 
     # Mapear campos reales de BD a campos esperados por frontend
     upps = []
@@ -172,18 +223,37 @@ def buscar_upp(
     return upps
 
 
+# ==================== Autocompletado de clave UPP ====================
+# Debe declararse antes de /{id_upp}. Responde desde app/db/indice_upp.py.
+
+@router.get("/autocompletar")
+async def autocompletar_upp(
+    q: str = Query("", max_length=40),
+    limit: int = Query(15, ge=1, le=50),
+    solo_activas: bool = Query(True),
+):
+    """
+    UPP cuya clave empieza con q, en orden de clave (sin consultar la BD)
+    """
+    if not indice_upp.cargado:
+        # Sin carga al arrancar (BD caída): la primera petición la hace
+        await to_thread.run_sync(indice_upp.cargar)
+    return indice_upp.buscar(q, limit, solo_activas)
+
+
 # ==================== EMPIEZAN CAMBIOS ====================
 # Endpoint: Obtener UPP por ID
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.get("/{id_upp}")
-def obtener_upp(id_upp: int, db: Session = Depends(get_db)):
+def obtener_upp(id_upp: int, response: Response, db: Session = Depends(get_db)):
     """
     Obtiene una UPP específica por ID
     BD: id_upp, clave_upp, id_propietario, id_municipio, localidad, direccion, telefono_contacto, estatus, fecha_registro
     """
     sql = text("""
         SELECT
+            u.version,
             u.id_upp,
             u.clave_upp,
             u.id_propietario,
@@ -224,6 +294,7 @@ def obtener_upp(id_upp: int, db: Session = Depends(get_db)):
         "estado": row["estado_nombre"]
     }
 
+    response.headers["ETag"] = etag_version(row["version"])
     return upp_data
 
 
@@ -238,40 +309,11 @@ def crear_upp(payload: UppCreate, db: Session = Depends(get_db)):
     BD: id_upp, clave_upp, id_propietario, id_municipio, localidad, direccion, telefono_contacto, estatus, fecha_registro
     """
     try:
-        # Validar que la clave UPP no exista
-        check_sql = text("""
-            SELECT id_upp FROM upp
-            WHERE clave_upp = :clave_upp
-        """)
-        existe = db.execute(check_sql, {"clave_upp": payload.clave_upp.upper()}).first()
-
-        if existe:
-            raise HTTPException(
-                status_code=400,
-                detail="Ya existe una UPP con esa clave"
-            )
-
-        # Validar que el propietario existe
-        check_propietario = text("""
-            SELECT id_propietario FROM propietarios
-            WHERE id_propietario = :id_propietario
-        """)
-        propietario = db.execute(check_propietario, {"id_propietario": payload.id_propietario}).first()
-
-        if not propietario:
-            raise HTTPException(
-                status_code=404,
-                detail="El propietario especificado no existe"
-            )
-
         # Determinar id_municipio (puede venir directo o buscarse por nombre)
         id_municipio = payload.id_municipio
         if not id_municipio and payload.municipio:
             # Buscar municipio por nombre
-            muni_sql = text("SELECT id_municipio FROM cat_municipio WHERE nombre LIKE :nombre LIMIT 1")
-            muni_row = db.execute(muni_sql, {"nombre": f"%{payload.municipio}%"}).first()
-            if muni_row:
-                id_municipio = muni_row[0]
+            id_municipio = cache_catalogos.buscar_id("cat_municipio", payload.municipio, contiene=True)
 
         # Insertar UPP con campos reales de BD
         insert_sql = text("""
@@ -296,7 +338,8 @@ def crear_upp(payload: UppCreate, db: Session = Depends(get_db)):
             )
         """)
 
-        db.execute(insert_sql, {
+        # La llave única de clave_upp y la FK a propietarios validan en el mismo INSERT
+        new_id = insertar_fila(db, insert_sql, {
             "clave_upp": payload.clave_upp.upper(),
             "id_propietario": payload.id_propietario,
             "id_municipio": id_municipio,
@@ -304,12 +347,13 @@ def crear_upp(payload: UppCreate, db: Session = Depends(get_db)):
             "direccion": payload.direccion,
             "telefono_contacto": payload.telefono_contacto,
             "estatus": 1 if payload.estatus else 0
+        }, errores={
+            "clave_upp": (400, "Ya existe una UPP con esa clave"),
+            "id_propietario": (404, "El propietario especificado no existe"),
         })
 
-        # Obtener ID de la UPP creada
-        new_id = db.execute(text("SELECT LAST_INSERT_ID() AS id")).mappings().first()["id"]
-
         db.commit()
+        indice_upp.actualizar(int(new_id))
 
         return {
             "success": True,
@@ -330,51 +374,27 @@ def crear_upp(payload: UppCreate, db: Session = Depends(get_db)):
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.put("/{id_upp}")
-def actualizar_upp(id_upp: int, payload: UppUpdate, db: Session = Depends(get_db)):
+def actualizar_upp(
+    id_upp: int,
+    payload: UppUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Actualiza los datos de una UPP existente
     BD: id_upp, clave_upp, id_propietario, id_municipio, localidad, direccion, telefono_contacto, estatus, fecha_registro
     """
     try:
-        # Verificar que la UPP existe
-        check_sql = text("SELECT id_upp FROM upp WHERE id_upp = :id_upp")
-        existe = db.execute(check_sql, {"id_upp": id_upp}).first()
-
-        if not existe:
-            raise HTTPException(status_code=404, detail="UPP no encontrada")
-
         # Construir UPDATE dinámicamente solo con campos reales de BD
         campos = []
         params = {"id_upp": id_upp}
 
         if payload.clave_upp is not None:
-            # Verificar que no exista otra UPP con esa clave
-            check_clave = text("""
-                SELECT id_upp FROM upp
-                WHERE clave_upp = :clave_upp AND id_upp != :id_upp
-            """)
-            existe_clave = db.execute(check_clave, {
-                "clave_upp": payload.clave_upp.upper(),
-                "id_upp": id_upp
-            }).first()
-
-            if existe_clave:
-                raise HTTPException(status_code=400, detail="Ya existe otra UPP con esa clave")
-
             campos.append("clave_upp = :clave_upp")
             params["clave_upp"] = payload.clave_upp.upper()
 
         if payload.id_propietario is not None:
-            # Verificar que el propietario existe
-            check_propietario = text("""
-                SELECT id_propietario FROM propietarios
-                WHERE id_propietario = :id_propietario
-            """)
-            propietario = db.execute(check_propietario, {"id_propietario": payload.id_propietario}).first()
-
-            if not propietario:
-                raise HTTPException(status_code=404, detail="El propietario especificado no existe")
-
             campos.append("id_propietario = :id_propietario")
             params["id_propietario"] = payload.id_propietario
 
@@ -384,11 +404,10 @@ def actualizar_upp(id_upp: int, payload: UppUpdate, db: Session = Depends(get_db
             params["id_municipio"] = payload.id_municipio
         elif payload.municipio is not None:
             # Buscar municipio por nombre
-            muni_sql = text("SELECT id_municipio FROM cat_municipio WHERE nombre LIKE :nombre LIMIT 1")
-            muni_row = db.execute(muni_sql, {"nombre": f"%{payload.municipio}%"}).first()
-            if muni_row:
+            id_municipio = cache_catalogos.buscar_id("cat_municipio", payload.municipio, contiene=True)
+            if id_municipio:
                 campos.append("id_municipio = :id_municipio")
-                params["id_municipio"] = muni_row[0]
+                params["id_municipio"] = id_municipio
 
         if payload.localidad is not None:
             campos.append("localidad = :localidad")
@@ -409,15 +428,19 @@ def actualizar_upp(id_upp: int, payload: UppUpdate, db: Session = Depends(get_db
         if not campos:
             raise HTTPException(status_code=400, detail="No hay campos para actualizar")
 
-        # Ejecutar UPDATE
-        update_sql = f"""
-            UPDATE upp
-            SET {', '.join(campos)}
-            WHERE id_upp = :id_upp
-        """
-
-        db.execute(text(update_sql), params)
+        # Un solo UPDATE: 404/412 según exista o no la fila con esa versión (If-Match)
+        version = actualizar_con_version(
+            db, "upp", "id_upp", campos, params,
+            version_esperada=version_de_if_match(if_match),
+            no_encontrado="UPP no encontrada",
+            errores={
+                "clave_upp": (400, "Ya existe otra UPP con esa clave"),
+                "id_propietario": (404, "El propietario especificado no existe"),
+            },
+        )
         db.commit()
+        response.headers["ETag"] = etag_version(version)
+        indice_upp.actualizar(id_upp)
 
         return {
             "success": True,
@@ -444,7 +467,7 @@ def dar_baja_upp(id_upp: int, db: Session = Depends(get_db)):
     try:
         sql = text("""
             UPDATE upp
-            SET estatus = 0
+            SET estatus = 0, version = version + 1
             WHERE id_upp = :id_upp
         """)
 
@@ -454,6 +477,8 @@ def dar_baja_upp(id_upp: int, db: Session = Depends(get_db)):
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="UPP no encontrada")
 
+        indice_upp.cambiar_estatus(id_upp, False)
+
         return {
             "success": True,
             "message": "UPP dada de baja exitosamente"
@@ -479,7 +504,7 @@ def reactivar_upp(id_upp: int, db: Session = Depends(get_db)):
     try:
         sql = text("""
             UPDATE upp
-            SET estatus = 1
+            SET estatus = 1, version = version + 1
             WHERE id_upp = :id_upp
         """)
 
@@ -489,6 +514,8 @@ def reactivar_upp(id_upp: int, db: Session = Depends(get_db)):
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="UPP no encontrada")
 
+        indice_upp.cambiar_estatus(id_upp, True)
+
         return {
             "success": True,
             "message": "UPP reactivada exitosamente"
@@ -524,6 +551,8 @@ def eliminar_upp(id_upp: int, db: Session = Depends(get_db)):
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="UPP no encontrada")
 
+        indice_upp.quitar(id_upp)
+
         return {
             "success": True,
             "message": "UPP eliminada permanentemente"
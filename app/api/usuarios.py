@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import date, datetime
-import hashlib
 
+from app.core.etag import etag_version, version_de_if_match
+from app.core.seguridad import hash_password
+from app.db.actualizaciones import actualizar_con_version
+from app.db.catalogos import cache_catalogos
+from app.db.consultas_dinamicas import ConsultaDinamica
 from app.db.database import get_db
+from app.db.inserciones import insertar_fila
+from app.db.sesiones import almacen_sesiones
 
 router = APIRouter(prefix="/api/usuarios", tags=["usuarios"])
 
@@ -38,9 +44,29 @@ class UsuarioUpdate(BaseModel):
     activo: Optional[bool] = None
 
 
-def hash_password(password: str) -> str:
-    """Hashea la contraseña usando SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+CONSULTA_USUARIOS = ConsultaDinamica(
+    base="""
+        SELECT
+            u.id_usuario,
+            u.usuario,
+            u.nombre,
+            u.id_rol,
+            u.activo,
+            u.email,
+            u.telefono,
+            u.fecha_creacion,
+            r.nombre as rol_nombre,
+            r.descripcion as rol_descripcion
+        FROM usuarios u
+        INNER JOIN cat_rol r ON r.id_rol = u.id_rol
+        WHERE 1=1""",
+    filtros={
+        "usuario": "u.usuario LIKE :usuario",
+        "nombre": "u.nombre LIKE :nombre",
+        "activo": "u.activo = :activo",
+    },
+    final="ORDER BY u.id_usuario DESC LIMIT :limit",
+)
 
 
 @router.get("")
@@ -57,31 +83,16 @@ def consultar_usuarios(
     Consulta usuarios con filtros opcionales
     """
     # BD: id_usuario, id_rol, nombre, usuario, password_hash, email, telefono, activo, fecha_creacion, fecha_actualizacion
-    sql = """
-        SELECT
-            u.id_usuario,
-            u.usuario,
-            u.nombre,
-            u.id_rol,
-            u.activo,
-            u.email,
-            u.telefono,
-            u.fecha_creacion,
-            r.nombre as rol_nombre,
-            r.descripcion as rol_descripcion
-        FROM usuarios u
-        INNER JOIN cat_rol r ON r.id_rol = u.id_rol
-        WHERE 1=1
-    """
+    activos = []
     params = {"limit": int(limit)}
 
     # Mapear nombre_usuario del frontend a usuario de la BD
     if nombre_usuario:
-        sql += " AND u.usuario LIKE :usuario"
+        activos.append("usuario")
         params["usuario"] = f"%{nombre_usuario.strip()}%"
 
     if nombre:
-        sql += " AND u.nombre LIKE :nombre"
+        activos.append("nombre")
         params["nombre"] = f"%{nombre.strip()}%"
 
     # Nota: clave_de_rumiantes y correo no existen en BD real, se ignoran
@@ -91,12 +102,10 @@ def consultar_usuarios(
     #     pass  # Campo no existe en BD
 
     if activo is not None:
-        sql += " AND u.activo = :activo"
+        activos.append("activo")
         params["activo"] = 1 if activo else 0
 
-    sql += " ORDER BY u.id_usuario DESC LIMIT :limit"
-
-    rows = db.execute(text(sql), params).mappings().all()
+    rows = db.execute(CONSULTA_USUARIOS.sentencia(activos), params).mappings().all()
 
     # Formatear respuesta mapeando campos reales de DB a campos esperados por frontend
     usuarios = []
@@ -125,12 +134,13 @@ def consultar_usuarios(
 
 
 @router.get("/{id_usuario}")
-def obtener_usuario(id_usuario: int, db: Session = Depends(get_db)):
+def obtener_usuario(id_usuario: int, response: Response, db: Session = Depends(get_db)):
     """
     Obtiene un usuario específico por ID
     """
     sql = text("""
         SELECT
+            u.version,
             u.id_usuario,
             u.usuario,
             u.nombre,
@@ -171,6 +181,7 @@ def obtener_usuario(id_usuario: int, db: Session = Depends(get_db)):
         "rol_descripcion": row["rol_descripcion"]
     }
 
+    response.headers["ETag"] = etag_version(row["version"])
     return usuario_data
 
 
@@ -185,27 +196,8 @@ def crear_usuario(payload: UsuarioCreate, db: Session = Depends(get_db)):
     Mapea campos del frontend (estructura antigua) a campos reales de BD
     """
     try:
-        # Validar que el nombre de usuario no exista
-        check_sql = text("""
-            SELECT id_usuario FROM usuarios
-            WHERE usuario = :usuario
-        """)
-        existe = db.execute(check_sql, {"usuario": payload.nombre_usuario}).first()
-
-        if existe:
-            raise HTTPException(
-                status_code=400,
-                detail="El nombre de usuario ya existe"
-            )
-
         # Validar que el id_rol exista en cat_rol (tipo_usuario del frontend)
-        check_rol_sql = text("""
-            SELECT id_rol FROM cat_rol
-            WHERE id_rol = :id_rol
-        """)
-        existe_rol = db.execute(check_rol_sql, {"id_rol": payload.tipo_usuario}).first()
-
-        if not existe_rol:
+        if not cache_catalogos.fila("cat_rol", payload.tipo_usuario):
             raise HTTPException(
                 status_code=400,
                 detail="El rol especificado no existe"
@@ -239,17 +231,15 @@ def crear_usuario(payload: UsuarioCreate, db: Session = Depends(get_db)):
             )
         """)
 
-        db.execute(insert_sql, {
+        # La llave única de usuario valida duplicados en el mismo INSERT
+        new_id = insertar_fila(db, insert_sql, {
             "usuario": payload.nombre_usuario,
             "password_hash": password_hash,
             "nombre": nombre_completo,
             "id_rol": payload.tipo_usuario,
             "email": payload.email or "",
             "activo": 1 if payload.activo else 0
-        })
-
-        # Obtener ID del usuario creado
-        new_id = db.execute(text("SELECT LAST_INSERT_ID() AS id")).mappings().first()["id"]
+        }, errores={"usuario": (400, "El nombre de usuario ya existe")})
 
         db.commit()
 
@@ -272,38 +262,24 @@ def crear_usuario(payload: UsuarioCreate, db: Session = Depends(get_db)):
 # ==================== EMPIEZAN CAMBIOS ====================
 
 @router.put("/{id_usuario}")
-def actualizar_usuario(id_usuario: int, payload: UsuarioUpdate, db: Session = Depends(get_db)):
+def actualizar_usuario(
+    id_usuario: int,
+    payload: UsuarioUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Actualiza los datos de un usuario existente
     Mapea campos del frontend (estructura antigua) a campos reales de BD
     """
     try:
-        # Verificar que el usuario existe
-        check_sql = text("SELECT id_usuario FROM usuarios WHERE id_usuario = :id_usuario")
-        existe = db.execute(check_sql, {"id_usuario": id_usuario}).first()
-
-        if not existe:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
         # Construir UPDATE dinámicamente
         campos = []
         params = {"id_usuario": id_usuario}
 
         # Mapear nombre_usuario del frontend a usuario de la BD
         if payload.nombre_usuario is not None:
-            # Verificar que no exista otro usuario con ese nombre
-            check_username = text("""
-                SELECT id_usuario FROM usuarios
-                WHERE usuario = :usuario AND id_usuario != :id_usuario
-            """)
-            existe_username = db.execute(check_username, {
-                "usuario": payload.nombre_usuario,
-                "id_usuario": id_usuario
-            }).first()
-
-            if existe_username:
-                raise HTTPException(status_code=400, detail="El nombre de usuario ya existe")
-
             campos.append("usuario = :usuario")
             params["usuario"] = payload.nombre_usuario
 
@@ -328,13 +304,7 @@ def actualizar_usuario(id_usuario: int, payload: UsuarioUpdate, db: Session = De
         # Mapear tipo_usuario del frontend a id_rol de la BD
         if payload.tipo_usuario is not None:
             # Validar que el id_rol exista en cat_rol
-            check_rol_sql = text("""
-                SELECT id_rol FROM cat_rol
-                WHERE id_rol = :id_rol
-            """)
-            existe_rol = db.execute(check_rol_sql, {"id_rol": payload.tipo_usuario}).first()
-
-            if not existe_rol:
+            if not cache_catalogos.fila("cat_rol", payload.tipo_usuario):
                 raise HTTPException(status_code=400, detail="El rol especificado no existe")
 
             campos.append("id_rol = :id_rol")
@@ -358,15 +328,17 @@ def actualizar_usuario(id_usuario: int, payload: UsuarioUpdate, db: Session = De
         # Agregar fecha_actualizacion
         campos.append("fecha_actualizacion = NOW()")
 
-        # Ejecutar UPDATE
-        update_sql = f"""
-            UPDATE usuarios
-            SET {', '.join(campos)}
-            WHERE id_usuario = :id_usuario
-        """
-
-        db.execute(text(update_sql), params)
+        # Un solo UPDATE: 404/412 según exista o no la fila con esa versión (If-Match)
+        version = actualizar_con_version(
+            db, "usuarios", "id_usuario", campos, params,
+            version_esperada=version_de_if_match(if_match),
+            no_encontrado="Usuario no encontrado",
+            errores={
+                "usuario": (400, "El nombre de usuario ya existe"),
+            },
+        )
         db.commit()
+        response.headers["ETag"] = etag_version(version)
 
         return {
             "success": True,
@@ -393,16 +365,19 @@ def desactivar_usuario(id_usuario: int, db: Session = Depends(get_db)):
     try:
         sql = text("""
             UPDATE usuarios
-            SET activo = 0
+            SET activo = 0, version = version + 1
             WHERE id_usuario = :id_usuario
         """)
 
         result = db.execute(sql, {"id_usuario": id_usuario})
-        db.commit()
 
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+        # Un usuario dado de baja pierde sus sesiones abiertas
+        almacen_sesiones.revocar_usuario(db, id_usuario)
+        db.commit()
+
         return {
             "success": True,
             "message": "Usuario desactivado exitosamente"
@@ -428,7 +403,7 @@ def reactivar_usuario(id_usuario: int, db: Session = Depends(get_db)):
     try:
         sql = text("""
             UPDATE usuarios
-            SET activo = 1
+            SET activo = 1, version = version + 1
             WHERE id_usuario = :id_usuario
         """)
 
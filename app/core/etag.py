@@ -0,0 +1,46 @@
+import hashlib
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def etag_fuerte(contenido: bytes) -> str:
+    """ETag fuerte derivado del contenido exacto de la respuesta"""
+    return '"' + hashlib.sha256(contenido).hexdigest()[:32] + '"'
+
+
+def coincide(encabezado: Optional[str], etag: str) -> bool:
+    """
+    Compara If-None-Match con el ETag actual (comparación débil, RFC 9110):
+    acepta listas separadas por comas, prefijo W/ y "*"
+    """
+    if not encabezado:
+        return False
+    for candidato in encabezado.split(","):
+        candidato = candidato.strip()
+        if candidato == "*":
+            return True
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == etag:
+            return True
+    return False
+
+
+# ==================== ETag por versión de fila ====================
+
+def etag_version(version: int) -> str:
+    return f'"{int(version)}"'
+
+
+def version_de_if_match(encabezado: Optional[str]) -> Optional[int]:
+    """
+    Versión esperada según If-Match; None si no vino o es "*" (actualización sin condición)
+    Un ETag débil o que no es una versión nunca coincide: 412
+    """
+    if not encabezado or encabezado.strip() == "*":
+        return None
+    candidato = encabezado.split(",")[0].strip()
+    if candidato.startswith('"') and candidato.endswith('"') and candidato[1:-1].isdigit():
+        return int(candidato[1:-1])
+    raise HTTPException(status_code=412, detail="If-Match no corresponde a la versión actual del registro")
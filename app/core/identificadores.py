@@ -0,0 +1,47 @@
+# ==================== Formato de identificadores ====================
+# Un valor con la forma completa de un identificador se busca con "=" (índice
+# único) en lugar de LIKE '%...%'. Ver filtro_identificador en
+# app/db/consultas_dinamicas.py.
+# ==================== Formato de identificadores ====================
+
+import re
+import string
+from typing import Optional
+
+from app.core.config import settings
+
+# CURP (RENAPO): 4 letras, fecha AAMMDD, sexo, entidad, 3 consonantes, homoclave, dígito
+PATRON_CURP = re.compile(r"^[A-Z]{4}\d{6}[HMX][A-Z]{5}[A-Z0-9]\d$")
+
+# Arete SINIIGA: 10 dígitos
+PATRON_ARETE = re.compile(r"^\d{10}$")
+
+
+def _patron(expresion: str) -> Optional[re.Pattern]:
+    return re.compile(expresion) if expresion else None
+
+
+def _patron_de_formato(formato: str) -> re.Pattern:
+    """Regex equivalente a un formato str.format con campos anio y n ("{anio}-{n:06d}")"""
+    partes = []
+    for literal, campo, especificacion, _ in string.Formatter().parse(formato):
+        partes.append(re.escape(literal))
+        if campo is None:
+            continue
+        ancho = re.fullmatch(r"0?(\d+)d", especificacion or "")
+        if campo == "anio":
+            partes.append(r"\d{4}")
+        elif ancho:
+            partes.append(rf"\d{{{ancho.group(1)}}}")
+        else:
+            partes.append(r"\d+")
+    return re.compile("^" + "".join(partes) + "$")
+
+
+# Con CASOS_NUMERACION=sp el formato lo decide el procedimiento almacenado:
+# solo se detecta si se configura CASOS_NUMERO_PATRON
+PATRON_NUMERO_CASO = _patron(settings.CASOS_NUMERO_PATRON) or (
+    _patron_de_formato(settings.CASOS_NUMERO_FORMATO) if settings.CASOS_NUMERACION == "secuencia" else None
+)
+PATRON_CLAVE_UPP = _patron(settings.UPP_CLAVE_PATRON)
+PATRON_CODIGO_MUESTRA = _patron(settings.MUESTRAS_CODIGO_PATRON)
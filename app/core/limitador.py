@@ -0,0 +1,221 @@
+# ==================== Limitador de intentos de login ====================
+# Cubetas de tokens por usuario y por IP en memoria del proceso. Un intento
+# rechazado se resuelve aquí, sin tocar MySQL ni el pool de contraseñas.
+# Cada fallo consecutivo por encima del umbral duplica el bloqueo (hasta un
+# máximo); un login correcto limpia el historial del usuario. Los fallos se
+# cuentan dentro de una ventana (LOGIN_VENTANA_FALLOS_SEG) desde el último.
+# La compactación periódica descarta las claves que ya volvieron a su estado
+# inicial y, si LIMITADOR_SQLITE está configurado, guarda el resto para
+# sobrevivir reinicios.
+# ==================== Limitador de intentos de login ====================
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import BASE_DIR, settings
+
+
+class Cubeta:
+    __slots__ = ("tokens", "actualizada", "fallos", "bloqueada_hasta", "ultimo_fallo")
+
+    def __init__(
+        self,
+        tokens: float,
+        actualizada: float,
+        fallos: int = 0,
+        bloqueada_hasta: float = 0.0,
+        ultimo_fallo: float = 0.0,
+    ):
+        self.tokens = tokens
+        self.actualizada = actualizada
+        self.fallos = fallos
+        self.bloqueada_hasta = bloqueada_hasta
+        self.ultimo_fallo = ultimo_fallo
+
+
+class Limitador:
+    """
+    Cubeta de `capacidad` intentos que se recarga a `recarga` intentos/seg
+    - intentar(): None si el intento pasa, o segundos a esperar (Retry-After)
+    - fallo() / exito(): resultado del intento, para el bloqueo exponencial
+    - ventana_fallos: segundos sin fallos tras los que el conteo vuelve a cero
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        capacidad: float,
+        recarga: float,
+        umbral_fallos: int,
+        bloqueo_base: float,
+        bloqueo_max: float,
+        ventana_fallos: float,
+    ):
+        self.nombre = nombre
+        self.capacidad = capacidad
+        self.recarga = recarga
+        self.umbral_fallos = umbral_fallos
+        self.bloqueo_base = bloqueo_base
+        self.bloqueo_max = bloqueo_max
+        self.ventana_fallos = ventana_fallos
+        self._cubetas: dict[str, Cubeta] = {}
+        self._lock = threading.Lock()
+
+    def _cubeta(self, clave: str, ahora: float) -> Cubeta:
+        cubeta = self._cubetas.get(clave)
+        if cubeta is None:
+            cubeta = self._cubetas[clave] = Cubeta(self.capacidad, ahora)
+        else:
+            cubeta.tokens = min(self.capacidad, cubeta.tokens + (ahora - cubeta.actualizada) * self.recarga)
+            cubeta.actualizada = ahora
+        return cubeta
+
+    def intentar(self, clave: str) -> Optional[float]:
+        ahora = time.time()
+        with self._lock:
+            cubeta = self._cubeta(clave, ahora)
+            if cubeta.bloqueada_hasta > ahora:
+                return cubeta.bloqueada_hasta - ahora
+            if cubeta.tokens < 1:
+                return (1 - cubeta.tokens) / self.recarga
+            cubeta.tokens -= 1
+            return None
+
+    def fallo(self, clave: str):
+        ahora = time.time()
+        with self._lock:
+            cubeta = self._cubeta(clave, ahora)
+            if ahora - cubeta.ultimo_fallo > self.ventana_fallos:
+                cubeta.fallos = 0
+            cubeta.fallos += 1
+            cubeta.ultimo_fallo = ahora
+            exceso = cubeta.fallos - self.umbral_fallos
+            if exceso >= 0:
+                cubeta.bloqueada_hasta = ahora + min(self.bloqueo_base * 2 ** min(exceso, 30), self.bloqueo_max)
+
+    def exito(self, clave: str):
+        with self._lock:
+            cubeta = self._cubetas.get(clave)
+            if cubeta is not None:
+                cubeta.fallos = 0
+                cubeta.bloqueada_hasta = 0.0
+
+    def compactar(self) -> list[tuple]:
+        """
+        Quita las claves sin bloqueo, con la cubeta llena y sin fallos dentro de
+        la ventana (equivalen a una clave nueva). Una clave con fallos por debajo
+        del umbral se conserva: olvidarla reiniciaría el conteo y permitiría
+        quedarse siempre un intento antes del bloqueo.
+        Devuelve las que quedan, para persistir
+        """
+        ahora = time.time()
+        with self._lock:
+            for clave in list(self._cubetas):
+                cubeta = self._cubeta(clave, ahora)
+                sin_fallos = cubeta.fallos == 0 or ahora - cubeta.ultimo_fallo > self.ventana_fallos
+                if cubeta.tokens >= self.capacidad and cubeta.bloqueada_hasta <= ahora and sin_fallos:
+                    del self._cubetas[clave]
+            return [
+                (self.nombre, clave, c.tokens, c.actualizada, c.fallos, c.bloqueada_hasta, c.ultimo_fallo)
+                for clave, c in self._cubetas.items()
+            ]
+
+    def restaurar(self, filas: list[tuple]):
+        with self._lock:
+            for clave, tokens, actualizada, fallos, bloqueada_hasta, ultimo_fallo in filas:
+                self._cubetas[clave] = Cubeta(tokens, actualizada, fallos, bloqueada_hasta, ultimo_fallo)
+
+    def __len__(self):
+        return len(self._cubetas)
+
+
+# ==================== Persistencia opcional (SQLite local) ====================
+
+def _ruta_sqlite() -> Optional[Path]:
+    if not settings.LIMITADOR_SQLITE:
+        return None
+    ruta = Path(settings.LIMITADOR_SQLITE)
+    return ruta if ruta.is_absolute() else BASE_DIR / ruta
+
+
+def _conectar(ruta: Path) -> sqlite3.Connection:
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(ruta)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cubetas (
+            limitador TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            tokens REAL NOT NULL,
+            actualizada REAL NOT NULL,
+            fallos INTEGER NOT NULL,
+            bloqueada_hasta REAL NOT NULL,
+            ultimo_fallo REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (limitador, clave)
+        )
+    """)
+    columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(cubetas)")}
+    if "ultimo_fallo" not in columnas:
+        # Archivo guardado por una versión anterior
+        conn.execute("ALTER TABLE cubetas ADD COLUMN ultimo_fallo REAL NOT NULL DEFAULT 0")
+    return conn
+
+
+limitador_usuario = Limitador(
+    "usuario",
+    capacidad=settings.LOGIN_INTENTOS_USUARIO,
+    recarga=settings.LOGIN_INTENTOS_USUARIO / 60,
+    umbral_fallos=settings.LOGIN_FALLOS_BLOQUEO,
+    bloqueo_base=settings.LOGIN_BLOQUEO_SEG,
+    bloqueo_max=settings.LOGIN_BLOQUEO_MAX_SEG,
+    ventana_fallos=settings.LOGIN_VENTANA_FALLOS_SEG,
+)
+limitador_ip = Limitador(
+    "ip",
+    capacidad=settings.LOGIN_INTENTOS_IP,
+    recarga=settings.LOGIN_INTENTOS_IP / 60,
+    # Una IP puede ser una oficina completa detrás de NAT: más margen antes de bloquear
+    umbral_fallos=settings.LOGIN_FALLOS_BLOQUEO * 4,
+    bloqueo_base=settings.LOGIN_BLOQUEO_SEG,
+    bloqueo_max=settings.LOGIN_BLOQUEO_MAX_SEG,
+    ventana_fallos=settings.LOGIN_VENTANA_FALLOS_SEG,
+)
+_limitadores = {l.nombre: l for l in (limitador_usuario, limitador_ip)}
+
+
+def cargar_limitadores():
+    """Restaura las cubetas guardadas por compactar_limitadores (si hay SQLite)"""
+    ruta = _ruta_sqlite()
+    if ruta is None or not ruta.exists():
+        return
+    with _conectar(ruta) as conn:
+        filas = conn.execute(
+            "SELECT limitador, clave, tokens, actualizada, fallos, bloqueada_hasta, ultimo_fallo FROM cubetas"
+        ).fetchall()
+    for nombre, limitador in _limitadores.items():
+        limitador.restaurar([fila[1:] for fila in filas if fila[0] == nombre])
+
+
+def compactar_limitadores():
+    """Compacta las cubetas en memoria y, si hay SQLite, reemplaza la copia guardada"""
+    vigentes = [fila for limitador in _limitadores.values() for fila in limitador.compactar()]
+    ruta = _ruta_sqlite()
+    if ruta is None:
+        return
+    conn = _conectar(ruta)
+    try:
+        with conn:
+            conn.execute("DELETE FROM cubetas")
+            conn.executemany(
+                "INSERT INTO cubetas (limitador, clave, tokens, actualizada, fallos, bloqueada_hasta, ultimo_fallo)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                vigentes,
+            )
+    finally:
+        conn.close()
+
+
+def estado_limitadores() -> dict:
+    return {nombre: len(limitador) for nombre, limitador in _limitadores.items()}
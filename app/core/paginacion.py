@@ -0,0 +1,22 @@
+# ==================== Paginación por cursor ====================
+# El cursor es opaco para el cliente: codifica el último id entregado para
+# que la siguiente página busque "id < cursor" por índice en lugar de OFFSET.
+# ==================== Paginación por cursor ====================
+
+import base64
+import json
+
+
+def codificar_cursor(ultimo_id: int) -> str:
+    contenido = json.dumps({"id": int(ultimo_id)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(contenido).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> int:
+    """Último id del cursor; ValueError si el cursor no es válido"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return int(datos["id"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Cursor inválido") from e
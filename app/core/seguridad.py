@@ -0,0 +1,88 @@
+# ==================== Contraseñas ====================
+# bcrypt (passlib) cuesta cientos de ms de CPU por hash. Todo el cálculo va a
+# un pool propio y acotado: un pico de logins hace cola aquí y no ocupa los
+# hilos del threadpool de FastAPI ni bloquea el event loop. Los hashes
+# SHA-256 sin sal heredados se siguen aceptando y se reemplazan por bcrypt
+# en el primer login correcto.
+# ==================== Contraseñas ====================
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+# hex_sha256 = formato anterior (hashlib.sha256(password).hexdigest())
+contexto_passwords = CryptContext(
+    schemes=["bcrypt", "hex_sha256"],
+    deprecated=["hex_sha256"],
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HILOS, thread_name_prefix="password")
+_lock = threading.Lock()
+_pendientes = 0
+
+# Hash contra el que se compara cuando el usuario no existe: el 401 tarda lo mismo
+_HASH_SIMULADO = contexto_passwords.hash("sistpec-usuario-inexistente")
+
+
+def _reservar():
+    global _pendientes
+    with _lock:
+        if _pendientes >= settings.PASSWORD_MAX_PENDIENTES:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Demasiados inicios de sesión simultáneos, intente de nuevo",
+                headers={"Retry-After": "1"},
+            )
+        _pendientes += 1
+
+
+def _liberar(_=None):
+    global _pendientes
+    with _lock:
+        _pendientes -= 1
+
+
+def _enviar(funcion, *args):
+    _reservar()
+    try:
+        futuro = _pool.submit(funcion, *args)
+    except Exception:
+        _liberar()
+        raise
+    futuro.add_done_callback(_liberar)
+    return futuro
+
+
+def hash_password(password: str) -> str:
+    """Hash bcrypt para endpoints sync (alta/cambio de contraseña)"""
+    return _enviar(contexto_passwords.hash, password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_enviar(contexto_passwords.hash, password))
+
+
+async def verificar_password(password: str, password_hash: Optional[str]) -> tuple[bool, Optional[str]]:
+    """
+    (válida, hash_nuevo). hash_nuevo trae el bcrypt que debe guardarse cuando
+    el hash actual es de un esquema obsoleto; None si no hay que cambiar nada
+    """
+    if not password_hash:
+        await asyncio.wrap_future(_enviar(contexto_passwords.verify, password, _HASH_SIMULADO))
+        return False, None
+    try:
+        return await asyncio.wrap_future(_enviar(contexto_passwords.verify_and_update, password, password_hash))
+    except ValueError:
+        # Hash con formato desconocido en la BD: se trata como contraseña incorrecta
+        return False, None
+
+
+def estado_pool() -> dict:
+    return {"hilos": settings.PASSWORD_HILOS, "pendientes": _pendientes}
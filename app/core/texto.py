@@ -0,0 +1,54 @@
+import re
+import unicodedata
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin acentos, como compara MySQL con collation *_ai_ci"""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+
+# ==================== Nombres de propietario ====================
+
+def nombre_canonico(nombre: str) -> str:
+    """
+    Forma comparable de un nombre: sin acentos ni mayúsculas, sin signos y con
+    las palabras en orden alfabético ("Pérez López, Juan" == "JUAN LOPEZ PEREZ")
+    """
+    return " ".join(sorted(re.findall(r"\w+", normalizar(nombre or ""))))
+
+
+def trigramas(texto: str) -> frozenset:
+    """Trigramas de cada palabra con relleno al inicio y al final, como pg_trgm"""
+    conjunto = set()
+    for palabra in texto.split():
+        relleno = f"  {palabra} "
+        conjunto.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return frozenset(conjunto)
+
+
+def similitud(a: frozenset, b: frozenset) -> float:
+    """Trigramas compartidos / trigramas totales (0 a 1)"""
+    if not a or not b:
+        return 0.0
+    comunes = len(a & b)
+    return comunes / (len(a) + len(b) - comunes)
+
+
+# ==================== Búsqueda FULLTEXT ====================
+
+# Palabras más cortas que ngram_token_size (2) no generan tokens en el índice
+_MIN_TERMINO = 2
+_MAX_TERMINOS = 8
+
+
+def consulta_booleana(texto: str) -> str:
+    """
+    Convierte el texto del usuario en una consulta IN BOOLEAN MODE: cada
+    palabra es obligatoria y se busca como frase de n-gramas. Se descartan
+    los operadores booleanos que vengan en el texto. Vacío si no queda nada buscable
+    """
+    terminos = [t for t in re.findall(r"\w+", texto or "") if len(t) >= _MIN_TERMINO]
+    return " ".join(f'+"{termino}"' for termino in terminos[:_MAX_TERMINOS])
+
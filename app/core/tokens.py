@@ -0,0 +1,88 @@
+# ==================== Tokens de acceso (JWT) ====================
+# Access token firmado HS256 de vida corta con id_usuario, id_rol y rol:
+# cualquier proceso lo verifica solo con CPU, sin consultar sesiones ni la BD.
+# El refresh token es el token de sesión (app/db/sesiones.py), que sí se
+# puede revocar. Rotación de llaves: JWT_CLAVES = "kid:secreto,kid:secreto";
+# se firma con la primera y se aceptan todas mientras sigan listadas.
+# ==================== Tokens de acceso (JWT) ====================
+
+import logging
+import secrets
+import time
+from typing import Optional
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ALGORITMO = "HS256"
+EMISOR = "sistpec"
+
+
+class Acceso:
+    """Claims de un access token válido"""
+
+    __slots__ = ("id_usuario", "id_rol", "rol", "expira")
+
+    def __init__(self, id_usuario: int, id_rol: int, rol: Optional[str], expira: int):
+        self.id_usuario = id_usuario
+        self.id_rol = id_rol
+        self.rol = rol
+        self.expira = expira
+
+
+def _cargar_claves() -> dict[str, str]:
+    claves = {}
+    for par in settings.JWT_CLAVES.split(","):
+        kid, _, secreto = par.strip().partition(":")
+        if kid and secreto:
+            claves[kid] = secreto
+    if not claves:
+        # Con una llave por proceso, un token emitido por un worker es 401 en los demás
+        if not settings.JWT_LLAVE_TEMPORAL:
+            raise RuntimeError(
+                "JWT_CLAVES no está configurado (formato kid:secreto). "
+                "Solo para desarrollo con un proceso: JWT_LLAVE_TEMPORAL=true"
+            )
+        logger.warning("JWT_CLAVES vacío: se usa una llave temporal por proceso")
+        claves["local"] = secrets.token_urlsafe(32)
+    return claves
+
+
+_claves = _cargar_claves()
+_kid_firma = next(iter(_claves))
+
+
+def emitir_acceso(id_usuario: int, id_rol: int, rol: Optional[str]) -> tuple[str, int]:
+    """Access token firmado con la llave vigente; devuelve (token, exp en epoch)"""
+    ahora = int(time.time())
+    expira = ahora + settings.JWT_ACCESO_MIN * 60
+    claims = {
+        "iss": EMISOR,
+        "sub": str(id_usuario),
+        "rol_id": id_rol,
+        "rol": rol,
+        "iat": ahora,
+        "exp": expira,
+    }
+    token = jwt.encode(claims, _claves[_kid_firma], algorithm=ALGORITMO, headers={"kid": _kid_firma})
+    return token, expira
+
+
+def verificar_acceso(token: str) -> Optional[Acceso]:
+    """Claims del token si la firma, el emisor y la vigencia son válidos; si no, None"""
+    try:
+        secreto = _claves.get(jwt.get_unverified_header(token).get("kid"))
+        if secreto is None:
+            return None
+        claims = jwt.decode(token, secreto, algorithms=[ALGORITMO], issuer=EMISOR)
+        return Acceso(int(claims["sub"]), claims["rol_id"], claims.get("rol"), claims["exp"])
+    except (JWTError, KeyError, ValueError):
+        return None
+
+
+def es_jwt(token: str) -> bool:
+    # Los tokens de sesión (token_urlsafe) no contienen puntos
+    return token.count(".") == 2
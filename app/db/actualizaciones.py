@@ -0,0 +1,57 @@
+# ==================== Actualizaciones con control de versión ====================
+# Cada tabla editable tiene una columna version (migrations/004). El UPDATE
+# incrementa la versión y, si el cliente mandó If-Match, solo aplica cuando
+# la versión sigue siendo la que leyó: un solo round trip, sin ventana entre
+# un SELECT de existencia y el UPDATE.
+# ==================== Actualizaciones con control de versión ====================
+
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.inserciones import traducir_integridad
+
+
+def actualizar_con_version(
+    db: Session,
+    tabla: str,
+    pk: str,
+    campos: list[str],
+    params: dict,
+    version_esperada: Optional[int],
+    no_encontrado: str,
+    errores: Optional[dict[str, tuple[int, str]]] = None,
+) -> int:
+    """
+    UPDATE {tabla} SET {campos} WHERE {pk} = :{pk} [AND version = :version_esperada]
+    Devuelve la nueva versión. 404 si la fila no existe, 412 si cambió de versión.
+    errores: como en insertar_fila, para violaciones de unique/FK
+    """
+    # LAST_INSERT_ID(expr) devuelve la nueva versión como lastrowid del mismo UPDATE
+    sql = f"UPDATE {tabla} SET {', '.join(campos)}, version = LAST_INSERT_ID(version + 1) WHERE {pk} = :{pk}"
+    if version_esperada is not None:
+        sql += " AND version = :version_esperada"
+        params = {**params, "version_esperada": version_esperada}
+
+    try:
+        resultado = db.execute(text(sql), params)
+    except IntegrityError as e:
+        traducido = traducir_integridad(e, errores or {}, params)
+        if traducido is None:
+            raise
+        raise traducido from e
+
+    if resultado.rowcount:
+        return int(resultado.lastrowid)
+
+    # Sin filas: solo en este caso se consulta para distinguir 404 de 412
+    existe = db.execute(text(f"SELECT 1 FROM {tabla} WHERE {pk} = :{pk}"), {pk: params[pk]}).first()
+    if not existe:
+        raise HTTPException(status_code=404, detail=no_encontrado)
+    raise HTTPException(
+        status_code=412,
+        detail="El registro fue modificado por otro usuario; recargue los datos e intente de nuevo",
+    )
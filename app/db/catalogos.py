@@ -0,0 +1,196 @@
+# ==================== Caché de catálogos ====================
+# Los catálogos (cat_*) casi no cambian, pero los endpoints de alta los
+# consultaban en cada inserción. Se cargan completos al arrancar, se
+# refrescan en segundo plano al vencer CATALOGOS_TTL y se pueden invalidar
+# explícitamente después de escribir en ellos.
+# ==================== Caché de catálogos ====================
+
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from anyio import to_thread
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.texto import normalizar
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Tabla -> columna de llave primaria
+CATALOGOS = {
+    "cat_rol": "id_rol",
+    "cat_estatus_caso": "id_estatus_caso",
+    "cat_estatus_muestra": "id_estatus_muestra",
+    "cat_tipo_muestra": "id_tipo_muestra",
+    "cat_resultado": "id_resultado",
+    "cat_prueba": "id_prueba",
+    "cat_especie": "id_especie",
+    "cat_raza": "id_raza",
+    "cat_municipio": "id_municipio",
+    "cat_estado": "id_estado",
+}
+
+
+class Catalogo:
+    """Filas de un catálogo con índices en memoria"""
+
+    def __init__(self, tabla: str, filas: list[dict]):
+        self.tabla = tabla
+        self.pk = CATALOGOS[tabla]
+        self.filas = filas
+        self.por_id = {fila[self.pk]: fila for fila in filas}
+        self.cargado_en = time.monotonic()
+        self._exactos: dict[str, dict[str, int]] = {}
+        self._contiene: dict[tuple[str, str], Optional[int]] = {}
+
+    def buscar_exacto(self, campo: str, valor: str) -> Optional[int]:
+        # Equivale a "WHERE campo = :valor LIMIT 1"
+        indice = self._exactos.get(campo)
+        if indice is None:
+            indice = {}
+            for fila in self.filas:
+                if fila.get(campo) is not None:
+                    indice.setdefault(normalizar(str(fila[campo])), fila[self.pk])
+            self._exactos[campo] = indice
+        return indice.get(normalizar(valor))
+
+    def buscar_contiene(self, campo: str, valor: str) -> Optional[int]:
+        # Equivale a "WHERE campo LIKE '%valor%' LIMIT 1"
+        clave = (campo, normalizar(valor))
+        if clave not in self._contiene:
+            encontrado = None
+            for fila in self.filas:
+                if fila.get(campo) is not None and clave[1] in normalizar(str(fila[campo])):
+                    encontrado = fila[self.pk]
+                    break
+            if len(self._contiene) < 1024:
+                self._contiene[clave] = encontrado
+            return encontrado
+        return self._contiene[clave]
+
+
+class CacheCatalogos:
+    """
+    Catálogos completos en memoria del proceso
+    - Al vencer el TTL se sirven los datos anteriores mientras un hilo recarga
+    - invalidar() fuerza la recarga después de escribir en un catálogo
+    - al_invalidar() registra funciones que se llaman tras cada recarga
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._catalogos: dict[str, Catalogo] = {}
+        self._recargando: set[str] = set()
+        self._lock = threading.Lock()
+        self._oyentes: list[Callable[[str], None]] = []
+
+    def cargar(self, tablas: Optional[list[str]] = None):
+        """Carga (o recarga) los catálogos indicados, todos por defecto"""
+        tablas = tablas or list(CATALOGOS)
+        with engine.connect() as conn:
+            nuevos = {
+                tabla: Catalogo(
+                    tabla,
+                    [dict(fila) for fila in conn.execute(
+                        text(f"SELECT * FROM {tabla} ORDER BY {CATALOGOS[tabla]}")
+                    ).mappings()],
+                )
+                for tabla in tablas
+            }
+        with self._lock:
+            self._catalogos.update(nuevos)
+            self.version += 1
+        for tabla in tablas:
+            for oyente in self._oyentes:
+                oyente(tabla)
+
+    def _recargar_en_segundo_plano(self, tabla: str):
+        with self._lock:
+            if tabla in self._recargando:
+                return
+            self._recargando.add(tabla)
+
+        def recargar():
+            try:
+                self.cargar([tabla])
+            except Exception:
+                logger.exception("No se pudo recargar el catálogo %s", tabla)
+            finally:
+                with self._lock:
+                    self._recargando.discard(tabla)
+
+        threading.Thread(target=recargar, name=f"catalogo-{tabla}", daemon=True).start()
+
+    def catalogo(self, tabla: str) -> Catalogo:
+        actual = self._catalogos.get(tabla)
+        if actual is None:
+            # Nunca cargado (p. ej. la BD no respondía al arrancar): carga en línea
+            self.cargar([tabla])
+            return self._catalogos[tabla]
+        if time.monotonic() - actual.cargado_en > self.ttl:
+            self._recargar_en_segundo_plano(tabla)
+        return actual
+
+    async def asegurar(self, tablas: list[str]):
+        """
+        Para endpoints async: carga en el threadpool los catálogos que nunca se
+        cargaron, así catalogo() no consulta MySQL dentro del event loop
+        """
+        faltantes = [tabla for tabla in tablas if tabla not in self._catalogos]
+        if faltantes:
+            await to_thread.run_sync(self.cargar, faltantes)
+
+    def invalidar(self, tabla: Optional[str] = None):
+        """Recarga de inmediato el catálogo indicado (todos por defecto) tras escribir en él"""
+        self.cargar([tabla] if tabla else None)
+
+    def al_invalidar(self, oyente: Callable[[str], None]):
+        self._oyentes.append(oyente)
+
+    # ==================== Consultas ====================
+
+    def filas(self, tabla: str) -> list[dict]:
+        return self.catalogo(tabla).filas
+
+    def fila(self, tabla: str, id_valor) -> Optional[dict]:
+        return self.catalogo(tabla).por_id.get(id_valor)
+
+    def buscar_id(self, tabla: str, valor: str, campo: str = "nombre", contiene: bool = False) -> Optional[int]:
+        """
+        Id por nombre/descripción, sin distinguir mayúsculas ni acentos
+        contiene=True replica el LIKE '%valor%' que usaban los endpoints
+        """
+        catalogo = self.catalogo(tabla)
+        if contiene:
+            return catalogo.buscar_contiene(campo, valor)
+        return catalogo.buscar_exacto(campo, valor)
+
+    def nombre(self, tabla: str, id_valor, campo: str = "nombre"):
+        """Columna de la fila con ese id; sustituye un LEFT JOIN al catálogo"""
+        if id_valor is None:
+            return None
+        fila = self.fila(tabla, id_valor)
+        return fila.get(campo) if fila else None
+
+    def ids_coinciden(self, tabla: str, valor: str, campo: str = "nombre", contiene: bool = False) -> list:
+        """
+        Todos los ids cuyo campo es igual (o contiene) valor; sustituye
+        "cat.campo = :valor" / "cat.campo LIKE '%valor%'" en un WHERE por "fk IN :ids"
+        """
+        catalogo = self.catalogo(tabla)
+        buscado = normalizar(valor)
+        ids = []
+        for fila in catalogo.filas:
+            if fila.get(campo) is None:
+                continue
+            texto = normalizar(str(fila[campo]))
+            if (buscado in texto) if contiene else (buscado == texto):
+                ids.append(fila[catalogo.pk])
+        return ids
+
+
+cache_catalogos = CacheCatalogos(settings.CATALOGOS_TTL)
@@ -0,0 +1,79 @@
+# ==================== Consultas con filtros dinámicos ====================
+# Los listados arman "WHERE 1=1 AND ..." según los filtros que llegan.
+# En lugar de concatenar y llamar text() en cada petición, cada combinación
+# de filtros activos se arma una sola vez y la sentencia se reutiliza; así
+# SQLAlchemy también encuentra la versión compilada en su caché.
+# ==================== Consultas con filtros dinámicos ====================
+
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.sql.elements import TextClause
+
+
+class ConsultaDinamica:
+    """
+    SELECT base + filtros opcionales + cola (ORDER BY / LIMIT)
+
+    - base: SQL hasta "WHERE 1=1"
+    - filtros: nombre -> condición SQL (se agregan con AND en el orden declarado)
+    - final: ORDER BY / LIMIT
+    - expandibles: parámetros que reciben listas para "IN :param"
+    """
+
+    def __init__(self, base: str, filtros: dict[str, str], final: str, expandibles: Iterable[str] = ()):
+        self.base = base
+        self.filtros = filtros
+        self.final = final
+        self.expandibles = tuple(expandibles)
+        self._compilada = lru_cache(maxsize=256)(self._construir)
+
+    def _construir(self, activos: tuple[str, ...]) -> TextClause:
+        condiciones = "".join(f"\n        AND {self.filtros[nombre]}" for nombre in activos)
+        sentencia = text(f"{self.base}{condiciones}\n        {self.final}")
+        expandibles = [
+            bindparam(nombre, expanding=True)
+            for nombre in self.expandibles
+            if any(f":{nombre}" in self.filtros[activo] for activo in activos)
+        ]
+        if expandibles:
+            sentencia = sentencia.bindparams(*expandibles)
+        return sentencia
+
+    def sentencia(self, activos: Iterable[str]) -> TextClause:
+        """Sentencia cacheada para el conjunto de filtros activos"""
+        activos = set(activos)
+        # Orden canónico: la misma combinación siempre usa la misma entrada
+        return self._compilada(tuple(nombre for nombre in self.filtros if nombre in activos))
+
+    def estadisticas_cache(self):
+        return self._compilada.cache_info()
+
+
+# ==================== Filtros por identificador ====================
+
+MODOS_COINCIDENCIA = ("exact", "prefix", "contains")
+PATRON_MODO = "^(exact|prefix|contains)$"
+
+
+def escapar_like(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filtro_identificador(filtro: str, valor: str, modo: Optional[str] = None, patron=None) -> tuple[str, str]:
+    """
+    (filtro activo, valor del parámetro) para un identificador. La consulta
+    declara "<filtro>" (LIKE) y "<filtro>_exacto" (=) con el mismo parámetro
+    - exact: "=" sobre el índice único
+    - prefix: LIKE 'valor%', rango sobre el índice
+    - contains: LIKE '%valor%', recorre la tabla
+    Sin modo: exact si el valor cumple `patron` (identificador completo), si no contains
+    """
+    if modo is None:
+        modo = "exact" if patron is not None and patron.match(valor) else "contains"
+    if modo == "exact":
+        return f"{filtro}_exacto", valor
+    if modo == "prefix":
+        return filtro, f"{escapar_like(valor)}%"
+    return filtro, f"%{escapar_like(valor)}%"
@@ -0,0 +1,153 @@
+# ==================== Registro de consultas lentas ====================
+# Cada sentencia que supera DB_SLOW_QUERY_MS se guarda normalizada, con los
+# parámetros redactados, la ruta que la ejecutó y su plan EXPLAIN FORMAT=JSON.
+# El EXPLAIN corre en un hilo aparte para no alargar la petición original.
+# ==================== Registro de consultas lentas ====================
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import BASE_DIR, settings
+
+# Planes recientes por huella de consulta: no repetir EXPLAIN de la misma forma de SQL
+_PLAN_TTL = 600
+# EXPLAIN en cola como máximo; si se rebasa se registra sin plan
+_MAX_PENDIENTES = 20
+
+_recientes: deque = deque(maxlen=200)
+_planes: dict[str, tuple[float, object]] = {}
+_lock = threading.Lock()
+_pendientes = 0
+_explain = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+_logger: Optional[logging.Logger] = None
+
+
+def normalizar_sql(statement: str) -> str:
+    """Quita literales y espacios para agrupar consultas con la misma forma"""
+    sql = re.sub(r"'(?:[^'\\]|\\.)*'", "?", statement)
+    sql = re.sub(r"\b\d+\b", "?", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def _redactar(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (bool, int, float)):
+        return type(valor).__name__
+    return f"<{type(valor).__name__}:{len(str(valor))}>"
+
+
+def redactar_parametros(parametros):
+    """Conserva nombres y tipos de los parámetros, nunca sus valores"""
+    if isinstance(parametros, dict):
+        return {clave: _redactar(valor) for clave, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        return [_redactar(valor) for valor in parametros]
+    return None
+
+
+def _obtener_logger() -> logging.Logger:
+    global _logger
+    with _lock:
+        if _logger is None:
+            ruta = Path(settings.DB_SLOW_QUERY_LOG)
+            if not ruta.is_absolute():
+                ruta = BASE_DIR / ruta
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(ruta, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("sistpec.consultas_lentas")
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            _logger = logger
+        return _logger
+
+
+def _publicar(entrada: dict):
+    _recientes.append(entrada)
+    try:
+        _obtener_logger().info(json.dumps(entrada, default=str, ensure_ascii=False))
+    except OSError:
+        # Sin disco para el log: la entrada sigue disponible en /debug/slow-queries
+        pass
+
+
+def _explicar(entrada: dict, statement: str, parametros, motor):
+    global _pendientes
+    try:
+        conexion = motor.raw_connection()
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("EXPLAIN FORMAT=JSON " + statement, parametros)
+            fila = cursor.fetchone()
+            cursor.close()
+            plan = json.loads(fila[0]) if fila else None
+        finally:
+            conexion.close()
+    except Exception as e:
+        plan = {"error": str(e)}
+
+    with _lock:
+        _pendientes -= 1
+        _planes[entrada["fingerprint"]] = (time.monotonic(), plan)
+    entrada["plan"] = plan
+    _publicar(entrada)
+
+
+def registrar(statement: str, parametros, duracion: float, ruta: Optional[str], motor, executemany: bool):
+    """Registra una consulta que superó el umbral y programa su EXPLAIN"""
+    global _pendientes
+    normalizado = normalizar_sql(statement)
+    huella = hashlib.sha1(normalizado.encode()).hexdigest()[:16]
+    entrada = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duracion * 1000, 3),
+        "route": ruta,
+        "fingerprint": huella,
+        "sql": normalizado,
+        "params": None if executemany else redactar_parametros(parametros),
+        "executemany": executemany,
+        "plan": None,
+    }
+
+    explicable = (
+        settings.DB_SLOW_QUERY_EXPLAIN
+        and not executemany
+        and motor is not None
+        and normalizado[:6].upper() == "SELECT"
+    )
+    if not explicable:
+        _publicar(entrada)
+        return
+
+    with _lock:
+        en_cache = _planes.get(huella)
+        if en_cache and time.monotonic() - en_cache[0] < _PLAN_TTL:
+            entrada["plan"] = en_cache[1]
+            programar = False
+        elif _pendientes < _MAX_PENDIENTES:
+            _pendientes += 1
+            programar = True
+        else:
+            programar = False
+
+    if programar:
+        _explain.submit(_explicar, entrada, statement, parametros, motor)
+    else:
+        _publicar(entrada)
+
+
+def consultas_recientes(limite: int = 50) -> list[dict]:
+    """Últimas consultas lentas registradas por este proceso, la más reciente primero"""
+    return list(reversed(_recientes))[:limite]
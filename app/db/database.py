@@ -1,29 +1,154 @@
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, exc, make_url, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-# Carga variables desde backend/.env
-load_dotenv()
+from app.core.config import settings
+from app.db import consultas_lentas
 
-DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
-DB_PORT = os.getenv("DB_PORT", "3306")
-DB_NAME = os.getenv("DB_NAME", "sistpec_cfpp")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-DB_CHARSET = os.getenv("DB_CHARSET", "utf8mb4")
+DB_HOST = settings.DB_HOST
+DB_PORT = settings.DB_PORT
+DB_NAME = settings.DB_NAME
+DB_USER = settings.DB_USER
+DB_PASSWORD = settings.DB_PASSWORD
+DB_CHARSET = settings.DB_CHARSET
 
 DATABASE_URL = (
     f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     f"?charset={DB_CHARSET}"
 )
 
+# Misma BD con driver asíncrono (aiomysql) para endpoints async def
+ASYNC_DATABASE_URL = (
+    f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    f"?charset={DB_CHARSET}"
+)
+
+
+# ==================== Métricas del pool ====================
+
+class MetricasPool:
+    """Contadores acumulados de checkouts y tiempo de espera por conexión"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.en_espera = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def iniciar_espera(self):
+        with self._lock:
+            self.en_espera += 1
+
+    def cancelar_espera(self):
+        with self._lock:
+            self.en_espera -= 1
+
+    def terminar_espera(self, segundos: float, timeout: bool = False):
+        with self._lock:
+            self.en_espera -= 1
+            if timeout:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.espera_total += segundos
+            if segundos > self.espera_max:
+                self.espera_max = segundos
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            promedio = self.espera_total / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts_total": self.checkouts,
+                "timeouts_total": self.timeouts,
+                "waiting": self.en_espera,
+                "wait_ms_total": round(self.espera_total * 1000, 3),
+                "wait_ms_avg": round(promedio * 1000, 3),
+                "wait_ms_max": round(self.espera_max * 1000, 3),
+            }
+
+
+class _MedicionEspera:
+    """Mide cuánto espera cada checkout del pool por una conexión libre"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = MetricasPool()
+
+    def _do_get(self):
+        self.metricas.iniciar_espera()
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except exc.TimeoutError:
+            self.metricas.terminar_espera(time.perf_counter() - inicio, timeout=True)
+            raise
+        except BaseException:
+            self.metricas.cancelar_espera()
+            raise
+        self.metricas.terminar_espera(time.perf_counter() - inicio)
+        return conexion
+
+
+class PoolConMetricas(_MedicionEspera, QueuePool):
+    pass
+
+
+class AsyncPoolConMetricas(_MedicionEspera, AsyncAdaptedQueuePool):
+    pass
+
+
+def _opciones_pool() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING == "always",
+    }
+
+
+def _instalar_ping_inactivas(motor):
+    """
+    Estrategia "idle": solo hace ping a conexiones que estuvieron inactivas
+    más de DB_POOL_PING_IDLE segundos, en lugar de en cada checkout
+    """
+    @event.listens_for(motor, "checkin")
+    def _marcar_devolucion(dbapi_connection, connection_record):
+        connection_record.info["devuelta_en"] = time.monotonic()
+
+    @event.listens_for(motor, "checkout")
+    def _ping_si_inactiva(dbapi_connection, connection_record, connection_proxy):
+        devuelta_en = connection_record.info.get("devuelta_en")
+        if devuelta_en is None or time.monotonic() - devuelta_en < settings.DB_POOL_PING_IDLE:
+            return
+        try:
+            motor.dialect.do_ping(dbapi_connection)
+        except Exception:
+            # El pool descarta la conexión y reintenta con una nueva
+            raise exc.DisconnectionError()
+
+
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
+    poolclass=PoolConMetricas,
     future=True,
+    **_opciones_pool(),
 )
 
+if settings.DB_POOL_PRE_PING == "idle":
+    _instalar_ping_inactivas(engine)
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -31,13 +156,184 @@ SessionLocal = sessionmaker(
     future=True,
 )
 
-def get_db():
-    db = SessionLocal()
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncPoolConMetricas,
+    **_opciones_pool(),
+)
+
+if settings.DB_POOL_PRE_PING == "idle":
+    _instalar_ping_inactivas(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# ==================== Réplicas de lectura ====================
+
+replica_engines = []
+async_replica_engines = []
+
+for _url in settings.replica_urls:
+    _motor = create_engine(_url, poolclass=PoolConMetricas, future=True, **_opciones_pool())
+    _motor_async = create_async_engine(
+        make_url(_url).set(drivername="mysql+aiomysql"),
+        poolclass=AsyncPoolConMetricas,
+        **_opciones_pool(),
+    )
+    if settings.DB_POOL_PRE_PING == "idle":
+        _instalar_ping_inactivas(_motor)
+        _instalar_ping_inactivas(_motor_async.sync_engine)
+    replica_engines.append(_motor)
+    async_replica_engines.append(_motor_async)
+
+_METODOS_LECTURA = {"GET", "HEAD"}
+_turno_replica = itertools.count()
+
+
+class _VentanaEscrituras:
+    """Recuerda qué clientes escribieron hace poco para que lean del primario"""
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self._lock = threading.Lock()
+        self._ultimas: dict[str, float] = {}
+
+    def registrar(self, cliente: str):
+        ahora = time.monotonic()
+        with self._lock:
+            self._ultimas[cliente] = ahora
+            if len(self._ultimas) > 10000:
+                # Purga de clientes cuya ventana ya venció
+                limite = ahora - self.segundos
+                self._ultimas = {c: t for c, t in self._ultimas.items() if t > limite}
+
+    def reciente(self, cliente: str) -> bool:
+        ultima = self._ultimas.get(cliente)
+        return ultima is not None and time.monotonic() - ultima < self.segundos
+
+
+_ventana_escrituras = _VentanaEscrituras(settings.DB_READ_YOUR_WRITES)
+
+
+def _cliente(request: Request) -> str:
+    # El token identifica mejor al usuario que la IP (varios detrás de un NAT)
+    autorizacion = request.headers.get("authorization")
+    if autorizacion:
+        return autorizacion
+    return request.client.host if request.client else ""
+
+
+def _indice_replica(request: Request):
+    """
+    Índice de la réplica a usar para la petición, o None para usar el primario.
+    Las escrituras marcan al cliente para leer del primario durante DB_READ_YOUR_WRITES.
+    """
+    if request.method not in _METODOS_LECTURA:
+        _ventana_escrituras.registrar(_cliente(request))
+        return None
+    if not replica_engines or _ventana_escrituras.reciente(_cliente(request)):
+        return None
+    return next(_turno_replica) % len(replica_engines)
+
+
+def motor_para(request: Request):
+    """Engine sync (primario o réplica) que corresponde a la petición"""
+    indice = _indice_replica(request)
+    return engine if indice is None else replica_engines[indice]
+
+
+def get_db(request: Request):
+    db = SessionLocal(bind=motor_para(request))
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db(request: Request):
+    # Sesión async: la espera de MySQL no ocupa un hilo del threadpool
+    indice = _indice_replica(request)
+    motor = async_engine if indice is None else async_replica_engines[indice]
+    async with AsyncSessionLocal(bind=motor) as db:
+        yield db
+
+# ==================== Instrumentación por petición ====================
+
+class EstadisticasSolicitud:
+    """Consultas ejecutadas y tiempo acumulado en MySQL durante una petición"""
+    __slots__ = ("consultas", "tiempo_db", "scope")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.scope = scope
+
+
+# El objeto es mutable: el threadpool copia el contexto pero comparte la instancia
+_estadisticas: ContextVar[Optional[EstadisticasSolicitud]] = ContextVar(
+    "estadisticas_solicitud", default=None
+)
+
+
+def iniciar_estadisticas(scope: Optional[dict] = None) -> EstadisticasSolicitud:
+    estadisticas = EstadisticasSolicitud(scope)
+    _estadisticas.set(estadisticas)
+    return estadisticas
+
+
+# Escuchan a nivel de clase Engine: cubren primario, réplicas y engines async
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info["inicio_consulta"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info.pop("inicio_consulta", time.perf_counter())
+    estadisticas = _estadisticas.get()
+    if estadisticas is not None:
+        estadisticas.consultas += 1
+        estadisticas.tiempo_db += duracion
+
+    if settings.DB_SLOW_QUERY_MS and duracion * 1000 >= settings.DB_SLOW_QUERY_MS:
+        # El EXPLAIN corre en otro hilo: con drivers async se usa el engine sync del primario
+        motor = engine if conn.dialect.is_async else conn.engine
+        consultas_lentas.registrar(
+            statement, parameters, duracion, _ruta(estadisticas), motor, executemany
+        )
+
+
+def _ruta(estadisticas: Optional[EstadisticasSolicitud]) -> Optional[str]:
+    if estadisticas is None or estadisticas.scope is None:
+        return None
+    scope = estadisticas.scope
+    route = scope.get("route")
+    return f"{scope.get('method')} {route.path if route else scope.get('path')}"
+
+
 def test_db_connection():
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
+
+
+def estado_pool(motor=None) -> dict:
+    """Estado actual del pool y contadores acumulados de espera"""
+    motor = motor or engine
+    pool = getattr(motor, "sync_engine", motor).pool
+    estado = {
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    metricas = getattr(pool, "metricas", None)
+    if metricas is not None:
+        estado.update(metricas.snapshot())
+    return estado
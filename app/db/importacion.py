@@ -0,0 +1,343 @@
+# ==================== Importación de UPP y propietarios ====================
+# Carga masiva desde CSV (alta de un municipio completo). Se lee el archivo
+# por bloques, se eliminan duplicados en memoria, los propietarios se
+# resuelven por CURP (o, sin CURP, por nombre normalizado) con una consulta
+# IN por bloque y ambas tablas se escriben con INSERT ... ON DUPLICATE KEY
+# UPDATE. Cada bloque hace commit, así que una importación interrumpida se
+# puede repetir sin duplicar. Las filas con id_propietario inexistente se
+# reportan como error y no detienen la importación.
+#
+# Requiere llaves únicas en propietarios.curp y upp.clave_upp
+# (migrations/001_llaves_unicas_importacion.sql) y la columna
+# propietarios.nombre_normalizado (migrations/007_nombre_normalizado.sql).
+#
+# Uso: python -m app.db.importacion archivo.csv [--dry-run] [--bloque 1000]
+# ==================== Importación de UPP y propietarios ====================
+
+import argparse
+import csv
+import sys
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.core.texto import nombre_canonico, normalizar
+from app.db.catalogos import cache_catalogos
+from app.db.inserciones import insertar_lote, insertar_o_actualizar_lote
+
+# Filas del CSV por bloque (consulta IN + upsert + commit)
+TAMANO_BLOQUE = 1000
+# Errores que se devuelven en el resumen; el resto solo se cuenta
+MAX_ERRORES = 100
+
+COLUMNAS_PROPIETARIO = ("nombre", "nombre_normalizado", "curp", "rfc", "telefono", "email", "estatus")
+COLUMNAS_UPP = (
+    "clave_upp",
+    "id_propietario",
+    "id_municipio",
+    "localidad",
+    "direccion",
+    "telefono_contacto",
+    "estatus",
+)
+
+PROPIETARIOS_POR_CURP = text(
+    "SELECT curp, id_propietario FROM propietarios WHERE curp IN :curps"
+).bindparams(bindparam("curps", expanding=True))
+
+# Propietarios sin CURP: se reconocen por nombre normalizado (migrations/007)
+PROPIETARIOS_POR_NOMBRE = text(
+    "SELECT nombre_normalizado, id_propietario FROM propietarios "
+    "WHERE curp IS NULL AND nombre_normalizado IN :nombres ORDER BY id_propietario"
+).bindparams(bindparam("nombres", expanding=True))
+
+PROPIETARIOS_POR_ID = text(
+    "SELECT id_propietario FROM propietarios WHERE id_propietario IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+UPP_EXISTENTES = text(
+    "SELECT clave_upp FROM upp WHERE clave_upp IN :claves"
+).bindparams(bindparam("claves", expanding=True))
+
+
+def _texto(registro: dict, *claves) -> Optional[str]:
+    for clave in claves:
+        valor = (registro.get(clave) or "").strip()
+        if valor:
+            return valor
+    return None
+
+
+def _booleano(valor: Optional[str], defecto: bool = True) -> int:
+    if valor is None:
+        return 1 if defecto else 0
+    return 1 if normalizar(valor) in ("1", "true", "si", "s", "activo", "activa") else 0
+
+
+def _leer_fila(registro: dict) -> tuple[dict, dict]:
+    """
+    Convierte un renglón del CSV en (upp, propietario)
+    Encabezados: clave_upp, propietario, curp, rfc, telefono, email, estatus_propietario,
+    id_propietario, id_municipio | municipio, localidad, direccion, telefono_contacto, estatus
+    """
+    registro = {(clave or "").strip().lower(): valor for clave, valor in registro.items()}
+
+    clave_upp = _texto(registro, "clave_upp")
+    if not clave_upp:
+        raise ValueError("Falta clave_upp")
+
+    id_municipio = _texto(registro, "id_municipio")
+    municipio = _texto(registro, "municipio")
+    if id_municipio:
+        id_municipio = int(id_municipio)
+    elif municipio:
+        id_municipio = cache_catalogos.buscar_id("cat_municipio", municipio, contiene=True)
+
+    curp = _texto(registro, "curp")
+    id_propietario = _texto(registro, "id_propietario")
+    nombre = _texto(registro, "propietario", "nombre_propietario")
+    propietario = {
+        "nombre": nombre,
+        "nombre_normalizado": nombre_canonico(nombre) if nombre else None,
+        "curp": curp.upper() if curp else None,
+        "rfc": (_texto(registro, "rfc") or "").upper() or None,
+        "telefono": _texto(registro, "telefono"),
+        "email": _texto(registro, "email", "correo"),
+        "estatus": (_texto(registro, "estatus_propietario") or "ACTIVO").upper(),
+        "id_propietario": int(id_propietario) if id_propietario else None,
+    }
+    if not propietario["id_propietario"] and not propietario["curp"] and not propietario["nombre"]:
+        raise ValueError("Falta propietario (curp, nombre o id_propietario)")
+
+    upp = {
+        "clave_upp": clave_upp.upper(),
+        "id_municipio": id_municipio,
+        "localidad": _texto(registro, "localidad"),
+        "direccion": _texto(registro, "direccion"),
+        "telefono_contacto": _texto(registro, "telefono_contacto"),
+        "estatus": _booleano(_texto(registro, "estatus")),
+    }
+    return upp, propietario
+
+
+class _Estado:
+    """Lo ya visto en el archivo: evita repetir UPP y propietarios entre bloques"""
+
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.claves_upp: set[str] = set()
+        self.por_curp: dict[str, Optional[int]] = {}
+        self.por_nombre: dict[str, Optional[int]] = {}
+        self.resumen = {
+            "dry_run": dry_run,
+            "filas": 0,
+            "upp_nuevas": 0,
+            "upp_actualizadas": 0,
+            "propietarios_nuevos": 0,
+            "propietarios_actualizados": 0,
+            "propietarios_existentes": 0,
+            "duplicadas": 0,
+            "con_error": 0,
+            "errores": [],
+        }
+
+    def error(self, linea: int, motivo: str):
+        self.resumen["con_error"] += 1
+        if len(self.resumen["errores"]) < MAX_ERRORES:
+            self.resumen["errores"].append({"linea": linea, "motivo": motivo})
+
+
+def _resolver_propietarios(db: Session, bloque: list, estado: _Estado) -> list:
+    """
+    Upsert de propietarios por CURP, reutiliza o da de alta los que no traen
+    CURP y valida los id_propietario del CSV; asigna id_propietario a cada UPP.
+    Devuelve el bloque sin las filas rechazadas
+    """
+    resumen = estado.resumen
+
+    # id_propietario explícito: una consulta IN; las filas con id inexistente se reportan
+    ids = {p["id_propietario"] for _, _, p in bloque if p["id_propietario"]}
+    if ids:
+        validos = {fila[0] for fila in db.execute(PROPIETARIOS_POR_ID, {"ids": list(ids)}).all()}
+        aceptadas = []
+        for linea, upp, propietario in bloque:
+            if propietario["id_propietario"] and propietario["id_propietario"] not in validos:
+                estado.error(linea, f"id_propietario {propietario['id_propietario']} no existe")
+                estado.claves_upp.discard(upp["clave_upp"])
+            else:
+                aceptadas.append((linea, upp, propietario))
+        bloque = aceptadas
+
+    # Con CURP: una consulta IN para saber cuáles existen, upsert y relectura de ids
+    con_curp = {}
+    for _, _, propietario in bloque:
+        curp = propietario["curp"]
+        if curp and not propietario["id_propietario"] and curp not in estado.por_curp:
+            con_curp.setdefault(curp, propietario)
+
+    if con_curp:
+        existentes = dict(db.execute(PROPIETARIOS_POR_CURP, {"curps": list(con_curp)}).all())
+        resumen["propietarios_nuevos"] += len(con_curp) - len(existentes)
+        resumen["propietarios_actualizados"] += len(existentes)
+        if estado.dry_run:
+            estado.por_curp.update({curp: existentes.get(curp) for curp in con_curp})
+        else:
+            # Un propietario nuevo sin nombre queda registrado con su CURP
+            insertar_o_actualizar_lote(
+                db, "propietarios", COLUMNAS_PROPIETARIO,
+                [
+                    {**p, "nombre": p["nombre"] or (None if curp in existentes else curp)}
+                    for curp, p in con_curp.items()
+                ],
+                actualizar=("nombre", "nombre_normalizado", "rfc", "telefono", "email", "estatus"),
+                expresiones={"fecha_registro": "NOW()"},
+                conservar_si_nulo=True,
+                incrementar_version=True,
+            )
+            estado.por_curp.update(db.execute(PROPIETARIOS_POR_CURP, {"curps": list(con_curp)}).all())
+
+    # Sin CURP ni id: se reutiliza el propietario con el mismo nombre normalizado
+    # (repetir o reanudar la importación no duplica) y solo los demás se dan de alta
+    sin_curp = {}
+    for _, _, propietario in bloque:
+        if not propietario["curp"] and not propietario["id_propietario"]:
+            nombre = propietario["nombre_normalizado"]
+            if nombre not in estado.por_nombre:
+                sin_curp.setdefault(nombre, propietario)
+
+    if sin_curp:
+        existentes = {}
+        for nombre, id_propietario in db.execute(PROPIETARIOS_POR_NOMBRE, {"nombres": list(sin_curp)}).all():
+            existentes.setdefault(nombre, id_propietario)
+        estado.por_nombre.update(existentes)
+        resumen["propietarios_existentes"] += len(existentes)
+        sin_curp = {nombre: p for nombre, p in sin_curp.items() if nombre not in existentes}
+
+    if sin_curp:
+        resumen["propietarios_nuevos"] += len(sin_curp)
+        if estado.dry_run:
+            estado.por_nombre.update(dict.fromkeys(sin_curp))
+        else:
+            ids = insertar_lote(
+                db, "propietarios", COLUMNAS_PROPIETARIO, list(sin_curp.values()),
+                expresiones={"fecha_registro": "NOW()"},
+            )
+            estado.por_nombre.update(zip(sin_curp, ids))
+
+    for _, upp, propietario in bloque:
+        if propietario["id_propietario"]:
+            upp["id_propietario"] = propietario["id_propietario"]
+        elif propietario["curp"]:
+            upp["id_propietario"] = estado.por_curp.get(propietario["curp"])
+        else:
+            upp["id_propietario"] = estado.por_nombre.get(propietario["nombre_normalizado"])
+    return bloque
+
+
+def _procesar_bloque(db: Session, bloque: list, estado: _Estado):
+    resumen = estado.resumen
+    bloque = _resolver_propietarios(db, bloque, estado)
+    if not bloque:
+        return
+
+    claves = [upp["clave_upp"] for _, upp, _ in bloque]
+    existentes = {fila[0] for fila in db.execute(UPP_EXISTENTES, {"claves": claves}).all()}
+    resumen["upp_nuevas"] += len(claves) - len(existentes)
+    resumen["upp_actualizadas"] += len(existentes)
+
+    if estado.dry_run:
+        return
+
+    insertar_o_actualizar_lote(
+        db, "upp", COLUMNAS_UPP, [upp for _, upp, _ in bloque],
+        actualizar=("id_propietario", "id_municipio", "localidad", "direccion", "telefono_contacto", "estatus"),
+        expresiones={"fecha_registro": "NOW()"},
+        conservar_si_nulo=True,
+        incrementar_version=True,
+    )
+    db.commit()
+
+
+def importar_upp(
+    db: Session,
+    lineas: Iterable[str],
+    dry_run: bool = False,
+    progreso: Optional[Callable[[dict], None]] = None,
+    tamano_bloque: int = TAMANO_BLOQUE,
+) -> dict:
+    """
+    Importa UPP (y sus propietarios) desde las líneas de un CSV con encabezados
+    - dry_run: solo lectura; cuenta lo que se crearía/actualizaría sin escribir
+    - progreso: se llama con el resumen parcial al terminar cada bloque
+    """
+    estado = _Estado(dry_run)
+    resumen = estado.resumen
+    bloque = []
+
+    lector = csv.DictReader(lineas)
+    for registro in lector:
+        resumen["filas"] += 1
+        linea = lector.line_num
+        try:
+            upp, propietario = _leer_fila(registro)
+        except ValueError as e:
+            estado.error(linea, str(e))
+            continue
+
+        if upp["clave_upp"] in estado.claves_upp:
+            resumen["duplicadas"] += 1
+            continue
+        estado.claves_upp.add(upp["clave_upp"])
+        bloque.append((linea, upp, propietario))
+
+        if len(bloque) >= tamano_bloque:
+            _procesar_bloque(db, bloque, estado)
+            bloque = []
+            if progreso:
+                progreso(resumen)
+
+    if bloque:
+        _procesar_bloque(db, bloque, estado)
+        if progreso:
+            progreso(resumen)
+
+    if dry_run:
+        db.rollback()
+    return resumen
+
+
+def main(argv: Optional[list[str]] = None):
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Importa UPP y propietarios desde un CSV")
+    parser.add_argument("archivo", help="CSV con encabezados (UTF-8)")
+    parser.add_argument("--dry-run", action="store_true", help="No escribe; solo reporta lo que haría")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas por bloque")
+    args = parser.parse_args(argv)
+
+    def reportar(resumen: dict):
+        print(
+            f"{resumen['filas']} filas leídas | UPP nuevas {resumen['upp_nuevas']}, "
+            f"actualizadas {resumen['upp_actualizadas']} | errores {resumen['con_error']}",
+            file=sys.stderr,
+        )
+
+    db = SessionLocal()
+    try:
+        with open(args.archivo, encoding="utf-8-sig", newline="") as archivo:
+            resumen = importar_upp(db, archivo, dry_run=args.dry_run, progreso=reportar, tamano_bloque=args.bloque)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for error in resumen["errores"]:
+        print(f"línea {error['linea']}: {error['motivo']}", file=sys.stderr)
+    print({clave: valor for clave, valor in resumen.items() if clave != "errores"})
+    return 1 if resumen["con_error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# ==================== Índice de claves UPP en memoria ====================
+# Autocompletado de clave_upp sin consultar la BD: una lista ordenada de
+# claves normalizadas y búsqueda por prefijo con bisect. Se carga completa al
+# arrancar, trae las UPP nuevas por fecha_registro cada INDICE_UPP_REFRESCO_SEG
+# y se recarga completa cada INDICE_UPP_RECARGA_SEG para ver los cambios
+# hechos por otros procesos. Los endpoints de escritura de este proceso lo
+# actualizan en el momento.
+# ==================== Índice de claves UPP en memoria ====================
+
+import bisect
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+_SELECT = """
+    SELECT u.id_upp, u.clave_upp, u.estatus, u.fecha_registro, p.nombre AS propietario
+    FROM upp u
+    INNER JOIN propietarios p ON p.id_propietario = u.id_propietario
+"""
+
+TODAS = text(_SELECT)
+DESDE = text(_SELECT + " WHERE u.fecha_registro >= :desde")
+POR_ID = text(_SELECT + " WHERE u.id_upp = :id_upp")
+POR_PROPIETARIO = text(_SELECT + " WHERE u.id_propietario = :id_propietario")
+
+
+class IndiceUpp:
+    """
+    - claves: clave_upp en mayúsculas, ordenadas (para bisect)
+    - entradas: (clave_upp, id_upp, propietario, estatus) en el mismo orden
+    - por_id: id_upp -> clave, para ubicar la entrada al editar o quitar
+    """
+
+    def __init__(self):
+        self._claves: list[str] = []
+        self._entradas: list[tuple] = []
+        self._por_id: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._ultimo_registro = None
+        self.cargado_en: Optional[float] = None
+
+    @property
+    def cargado(self) -> bool:
+        return self.cargado_en is not None
+
+    # ==================== Mantenimiento ====================
+
+    def _quitar(self, id_upp: int):
+        clave = self._por_id.pop(id_upp, None)
+        if clave is None:
+            return
+        inicio = bisect.bisect_left(self._claves, clave)
+        for i in range(inicio, len(self._claves)):
+            if self._claves[i] != clave:
+                break
+            if self._entradas[i][1] == id_upp:
+                del self._claves[i]
+                del self._entradas[i]
+                return
+
+    def _poner(self, fila):
+        self._quitar(fila.id_upp)
+        clave = fila.clave_upp.upper()
+        entrada = (fila.clave_upp, fila.id_upp, fila.propietario, bool(fila.estatus))
+        i = bisect.bisect_right(self._claves, clave)
+        self._claves.insert(i, clave)
+        self._entradas.insert(i, entrada)
+        self._por_id[fila.id_upp] = clave
+        if fila.fecha_registro and (self._ultimo_registro is None or fila.fecha_registro > self._ultimo_registro):
+            self._ultimo_registro = fila.fecha_registro
+
+    def cargar(self):
+        """Recarga completa: una consulta y un ordenamiento"""
+        with engine.connect() as conn:
+            filas = conn.execute(TODAS).all()
+        filas.sort(key=lambda fila: fila.clave_upp.upper())
+        ultimo = max((fila.fecha_registro for fila in filas if fila.fecha_registro), default=None)
+        with self._lock:
+            self._claves = [fila.clave_upp.upper() for fila in filas]
+            self._entradas = [
+                (fila.clave_upp, fila.id_upp, fila.propietario, bool(fila.estatus)) for fila in filas
+            ]
+            self._por_id = {fila.id_upp: clave for fila, clave in zip(filas, self._claves)}
+            self._ultimo_registro = ultimo
+            self.cargado_en = time.monotonic()
+        return len(filas)
+
+    def recargar_tras_escritura(self):
+        """
+        cargar() después de una escritura masiva ya confirmada (importación):
+        un error solo se registra, la recarga periódica lo corrige
+        """
+        if not self.cargado:
+            return
+        try:
+            self.cargar()
+        except Exception:
+            logger.warning("No se pudo recargar el índice de UPP", exc_info=True)
+
+    def refrescar(self) -> int:
+        """
+        UPP registradas desde la última vista (>= para no perder las del mismo
+        segundo); recarga completa si ya pasó INDICE_UPP_RECARGA_SEG
+        """
+        if not self.cargado or time.monotonic() - self.cargado_en > settings.INDICE_UPP_RECARGA_SEG:
+            self.cargar()
+            return 0
+        with engine.connect() as conn:
+            filas = conn.execute(DESDE, {"desde": self._ultimo_registro}).all() if self._ultimo_registro else []
+        nuevas = 0
+        with self._lock:
+            for fila in filas:
+                if fila.id_upp not in self._por_id:
+                    nuevas += 1
+                self._poner(fila)
+        return nuevas
+
+    def _releer(self, sentencia, params: dict, ids: tuple = ()):
+        # Después de escribir: el error no debe fallar la petición, la siguiente recarga corrige
+        if not self.cargado:
+            return
+        try:
+            with engine.connect() as conn:
+                filas = conn.execute(sentencia, params).all()
+            with self._lock:
+                for id_upp in ids:
+                    self._quitar(id_upp)
+                for fila in filas:
+                    self._poner(fila)
+        except Exception:
+            logger.warning("No se pudo actualizar el índice de UPP", exc_info=True)
+
+    def actualizar(self, id_upp: int):
+        """Vuelve a leer una UPP (alta, edición) o la quita si ya no existe"""
+        self._releer(POR_ID, {"id_upp": id_upp}, ids=(id_upp,))
+
+    def actualizar_propietario(self, id_propietario: int):
+        """Nombre de propietario cambiado: vuelve a leer sus UPP"""
+        self._releer(POR_PROPIETARIO, {"id_propietario": id_propietario})
+
+    def cambiar_estatus(self, id_upp: int, estatus: bool):
+        with self._lock:
+            clave = self._por_id.get(id_upp)
+            if clave is None:
+                return
+            i = bisect.bisect_left(self._claves, clave)
+            while i < len(self._claves) and self._claves[i] == clave:
+                entrada = self._entradas[i]
+                if entrada[1] == id_upp:
+                    self._entradas[i] = entrada[:3] + (estatus,)
+                    return
+                i += 1
+
+    def quitar(self, id_upp: int):
+        with self._lock:
+            self._quitar(id_upp)
+
+    # ==================== Consulta ====================
+
+    def buscar(self, prefijo: str, limite: int = 15, solo_activas: bool = True) -> list[dict]:
+        """UPP cuya clave empieza con `prefijo` (sin distinguir mayúsculas), en orden de clave"""
+        prefijo = prefijo.strip().upper()
+        resultado = []
+        with self._lock:
+            i = bisect.bisect_left(self._claves, prefijo)
+            while i < len(self._claves) and len(resultado) < limite:
+                if not self._claves[i].startswith(prefijo):
+                    break
+                clave_upp, id_upp, propietario, estatus = self._entradas[i]
+                if estatus or not solo_activas:
+                    resultado.append({
+                        "id_upp": id_upp,
+                        "clave_upp": clave_upp,
+                        "propietario": propietario,
+                        "estatus": estatus,
+                    })
+                i += 1
+        return resultado
+
+    def __len__(self):
+        return len(self._claves)
+
+
+indice_upp = IndiceUpp()
@@ -0,0 +1,151 @@
+# ==================== Inserciones por lote ====================
+# Un INSERT con varias filas en VALUES en lugar de un INSERT + commit por
+# fila. Para un INSERT de varias filas con valores explícitos InnoDB reserva
+# los auto-increment consecutivos, así que los ids salen de lastrowid.
+# ==================== Inserciones por lote ====================
+
+import re
+from typing import Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Filas por sentencia: mantiene el paquete muy por debajo de max_allowed_packet
+TAMANO_LOTE = 500
+
+# Códigos de error de MySQL
+ER_DUP_ENTRY = 1062
+ER_NO_REFERENCED_ROW = 1452
+
+
+def traducir_integridad(
+    error: IntegrityError, errores: dict[str, tuple[int, str]], params: Optional[dict] = None
+) -> Optional[HTTPException]:
+    """
+    HTTPException para una violación de unique/FK según la columna involucrada
+    errores: columna -> (status, detalle); None si la columna no está mapeada
+    """
+    args = getattr(error.orig, "args", ())
+    codigo = args[0] if args else None
+    mensaje = str(args[1]) if len(args) > 1 else str(error.orig)
+
+    if codigo == ER_NO_REFERENCED_ROW:
+        # ... CONSTRAINT `fk_x` FOREIGN KEY (`id_caso`) REFERENCES ...
+        encontrada = re.search(r"FOREIGN KEY \(`([^`]+)`\)", mensaje)
+        columna = encontrada.group(1) if encontrada else None
+        if columna in errores:
+            return HTTPException(status_code=errores[columna][0], detail=errores[columna][1])
+    elif codigo == ER_DUP_ENTRY:
+        # Duplicate entry 'X' for key 'propietarios.uq_propietarios_curp'
+        encontrada = re.search(r"Duplicate entry '(.*)' for key '([^']+)'", mensaje)
+        if not encontrada:
+            return None
+        valor, llave = encontrada.groups()
+        llave = llave.split(".")[-1]
+        for columna, (status, detalle) in errores.items():
+            # Primero por el valor duplicado; si no, por el nombre de la llave
+            if params is not None and columna in params:
+                coincide = str(params[columna]) == valor
+            else:
+                coincide = llave == columna or llave.endswith(f"_{columna}")
+            if coincide:
+                return HTTPException(status_code=status, detail=detalle)
+    return None
+
+
+def insertar_fila(db: Session, sql, params: dict, errores: Optional[dict[str, tuple[int, str]]] = None) -> int:
+    """
+    Ejecuta un INSERT de una fila y devuelve su id desde lastrowid del driver
+    (sin el SELECT LAST_INSERT_ID() adicional). Las violaciones de unique/FK
+    de las columnas en `errores` se convierten en la HTTPException indicada,
+    así la validación la hace la BD en el mismo round trip.
+    """
+    try:
+        return int(db.execute(sql, params).lastrowid)
+    except IntegrityError as e:
+        traducido = traducir_integridad(e, errores or {}, params)
+        if traducido is None:
+            raise
+        raise traducido from e
+
+
+def insertar_lote(
+    db: Session,
+    tabla: str,
+    columnas: Sequence[str],
+    filas: Sequence[dict],
+    expresiones: Optional[dict[str, str]] = None,
+    tamano_lote: int = TAMANO_LOTE,
+) -> list[int]:
+    """
+    Inserta filas (dicts con las claves de columnas) y devuelve sus ids en el mismo orden
+    - expresiones: columna -> SQL fijo para todas las filas, p. ej. {"created_at": "NOW()"}
+    - no hace commit: el llamador decide la transacción
+    """
+    expresiones = expresiones or {}
+    ids: list[int] = []
+    paso = None
+
+    for inicio in range(0, len(filas), tamano_lote):
+        lote = filas[inicio:inicio + tamano_lote]
+        sql, params = _insert_varias_filas(tabla, columnas, lote, expresiones)
+        primer_id = db.execute(text(sql), params).lastrowid
+
+        if paso is None:
+            # auto_increment_increment puede ser != 1 en replicación multi-primario
+            paso = int(db.execute(text("SELECT @@auto_increment_increment")).scalar() or 1)
+        ids.extend(primer_id + paso * i for i in range(len(lote)))
+
+    return ids
+
+
+def insertar_o_actualizar_lote(
+    db: Session,
+    tabla: str,
+    columnas: Sequence[str],
+    filas: Sequence[dict],
+    actualizar: Sequence[str],
+    expresiones: Optional[dict[str, str]] = None,
+    conservar_si_nulo: bool = False,
+    incrementar_version: bool = False,
+    tamano_lote: int = TAMANO_LOTE,
+) -> int:
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE por lotes; devuelve las filas afectadas
+    - actualizar: columnas que toman el valor nuevo cuando la llave única ya existe
+    - conservar_si_nulo: un NULL nuevo no borra el valor que ya estaba guardado
+    - incrementar_version: version + 1 en las filas existentes, así un If-Match
+      leído antes del upsert recibe 412 (migrations/004)
+    - no hace commit ni devuelve ids (para filas existentes LAST_INSERT_ID no aplica)
+    """
+    expresiones = expresiones or {}
+    if conservar_si_nulo:
+        asignaciones = ", ".join(f"{c} = COALESCE(VALUES({c}), {c})" for c in actualizar)
+    else:
+        asignaciones = ", ".join(f"{c} = VALUES({c})" for c in actualizar)
+    if incrementar_version:
+        asignaciones += ", version = version + 1"
+    afectadas = 0
+
+    for inicio in range(0, len(filas), tamano_lote):
+        lote = filas[inicio:inicio + tamano_lote]
+        sql, params = _insert_varias_filas(tabla, columnas, lote, expresiones)
+        afectadas += db.execute(text(f"{sql} ON DUPLICATE KEY UPDATE {asignaciones}"), params).rowcount
+
+    return afectadas
+
+
+def _insert_varias_filas(tabla, columnas, lote, expresiones) -> tuple[str, dict]:
+    nombres = list(columnas) + list(expresiones)
+    valores = []
+    params = {}
+    for i, fila in enumerate(lote):
+        marcadores = []
+        for columna in columnas:
+            params[f"{columna}_{i}"] = fila.get(columna)
+            marcadores.append(f":{columna}_{i}")
+        marcadores.extend(expresiones.values())
+        valores.append(f"({', '.join(marcadores)})")
+    return f"INSERT INTO {tabla} ({', '.join(nombres)}) VALUES {', '.join(valores)}", params
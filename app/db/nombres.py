@@ -0,0 +1,142 @@
+# ==================== Nombres de propietario similares ====================
+# Búsqueda tolerante a acentos, mayúsculas, espacios y orden de apellidos.
+# MySQL da los candidatos con el índice FULLTEXT ngram sobre
+# propietarios.nombre_normalizado (migrations/007); aquí se califican por
+# trigramas compartidos y se ordenan por puntaje.
+#
+# Llenado de la columna para registros existentes:
+#   python -m app.db.nombres [--bloque 1000]
+# ==================== Nombres de propietario similares ====================
+
+import argparse
+import sys
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.texto import nombre_canonico, similitud, trigramas
+
+# Candidatos que se califican por consulta (los de mayor relevancia FULLTEXT)
+MAX_CANDIDATOS = 200
+
+CANDIDATOS = text("""
+    SELECT id_propietario, nombre, curp, estatus, nombre_normalizado
+    FROM propietarios
+    WHERE MATCH (nombre_normalizado) AGAINST (:q IN NATURAL LANGUAGE MODE)
+    ORDER BY MATCH (nombre_normalizado) AGAINST (:q IN NATURAL LANGUAGE MODE) DESC
+    LIMIT :limite
+""")
+
+PENDIENTES = text("""
+    SELECT id_propietario, nombre
+    FROM propietarios
+    WHERE nombre_normalizado IS NULL AND nombre IS NOT NULL AND id_propietario > :desde
+    ORDER BY id_propietario
+    LIMIT :limite
+""")
+
+ACTUALIZAR = text("UPDATE propietarios SET nombre_normalizado = :nombre_normalizado WHERE id_propietario = :id")
+
+ALGUNO_PENDIENTE = text("""
+    SELECT 1 FROM propietarios
+    WHERE nombre_normalizado IS NULL AND nombre IS NOT NULL
+    LIMIT 1
+""")
+
+# Segundos entre revisiones mientras sigan quedando filas sin normalizar
+REVISAR_PENDIENTES_CADA = 300
+
+# None: no revisado; True: faltan filas por llenar; False: llenado completo
+_pendientes: dict = {"hay": None, "revisado_en": 0.0}
+
+
+def hay_sin_normalizar(db: Session) -> bool:
+    """
+    ¿Quedan propietarios sin nombre_normalizado (antes del llenado)? Esas filas
+    no aparecen en el índice FULLTEXT y las búsquedas deben incluirlas con LIKE.
+    Una vez en False no se vuelve a consultar: las altas y cambios ya la llenan
+    """
+    ahora = time.monotonic()
+    if _pendientes["hay"] is False:
+        return False
+    if _pendientes["hay"] is None or ahora - _pendientes["revisado_en"] > REVISAR_PENDIENTES_CADA:
+        _pendientes["hay"] = db.execute(ALGUNO_PENDIENTE).first() is not None
+        _pendientes["revisado_en"] = ahora
+    return _pendientes["hay"]
+
+
+def buscar_similares(
+    db: Session,
+    nombre: str,
+    limite: int = 10,
+    umbral: float = 0.3,
+    excluir_id: Optional[int] = None,
+) -> list[dict]:
+    """Propietarios con puntaje de similitud >= umbral, del más al menos parecido"""
+    canonico = nombre_canonico(nombre)
+    if not canonico:
+        return []
+    buscados = trigramas(canonico)
+
+    filas = db.execute(CANDIDATOS, {"q": canonico, "limite": MAX_CANDIDATOS}).all()
+    calificados = []
+    for fila in filas:
+        if fila.id_propietario == excluir_id:
+            continue
+        puntaje = similitud(buscados, trigramas(fila.nombre_normalizado))
+        if puntaje >= umbral:
+            calificados.append((puntaje, fila))
+
+    calificados.sort(key=lambda par: (-par[0], par[1].id_propietario))
+    return [
+        {
+            "id_propietario": fila.id_propietario,
+            "nombre": fila.nombre,
+            "curp": fila.curp,
+            "estatus": fila.estatus,
+            "score": round(puntaje, 3),
+        }
+        for puntaje, fila in calificados[:limite]
+    ]
+
+
+def rellenar(db: Session, bloque: int = 1000) -> int:
+    """Calcula nombre_normalizado donde falta, por bloques con commit; devuelve cuántos llenó"""
+    total = 0
+    desde = 0
+    while True:
+        filas = db.execute(PENDIENTES, {"desde": desde, "limite": bloque}).all()
+        if not filas:
+            _pendientes["hay"] = False
+            return total
+        db.execute(ACTUALIZAR, [
+            {"id": fila.id_propietario, "nombre_normalizado": nombre_canonico(fila.nombre)}
+            for fila in filas
+        ])
+        db.commit()
+        total += len(filas)
+        desde = filas[-1].id_propietario
+
+
+def main(argv: Optional[list[str]] = None):
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Llena propietarios.nombre_normalizado")
+    parser.add_argument("--bloque", type=int, default=1000, help="Filas por commit")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        print(f"{rellenar(db, args.bloque)} propietarios actualizados")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+# ==================== Secuencias por bloques (hi/lo) ====================
+# Cada proceso reserva un bloque de valores con una sola sentencia atómica
+# sobre la tabla secuencias y los entrega desde memoria. Dos procesos nunca
+# reciben el mismo bloque; si un proceso termina, el resto de su bloque se
+# pierde (huecos tolerados, nunca duplicados).
+# ==================== Secuencias por bloques (hi/lo) ====================
+
+import threading
+
+from sqlalchemy import text
+
+# LAST_INSERT_ID(expr) deja el nuevo máximo en el paquete OK de la respuesta:
+# se lee como lastrowid, sin un SELECT adicional
+RESERVAR_BLOQUE = text("""
+    INSERT INTO secuencias (nombre, valor) VALUES (:nombre, LAST_INSERT_ID(:bloque))
+    ON DUPLICATE KEY UPDATE valor = LAST_INSERT_ID(valor + :bloque)
+""")
+
+
+class AsignadorSecuencias:
+    """Entrega valores consecutivos por nombre de secuencia, reservando de a `tamano_bloque`"""
+
+    def __init__(self, motor, tamano_bloque: int):
+        self.motor = motor
+        self.tamano_bloque = tamano_bloque
+        self._lock = threading.Lock()
+        # nombre -> [siguiente valor, último valor reservado]
+        self._bloques: dict[str, list[int]] = {}
+
+    def _reservar(self, nombre: str) -> list[int]:
+        # Conexión propia en autocommit: la reserva no depende de la transacción del llamador
+        with self.motor.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            maximo = conn.execute(RESERVAR_BLOQUE, {"nombre": nombre, "bloque": self.tamano_bloque}).lastrowid
+        return [maximo - self.tamano_bloque + 1, maximo]
+
+    def siguiente(self, nombre: str) -> int:
+        with self._lock:
+            bloque = self._bloques.get(nombre)
+            if bloque is None or bloque[0] > bloque[1]:
+                bloque = self._reservar(nombre)
+                self._bloques[nombre] = bloque
+            valor = bloque[0]
+            bloque[0] += 1
+            return valor
@@ -0,0 +1,242 @@
+# ==================== Almacén de sesiones ====================
+# El token que entrega /api/auth/login se guarda como SHA-256 en la tabla
+# sesiones (migrations/005). Delante hay un LRU en memoria: una petición con
+# token conocido se valida sin ir a la BD. La expiración es deslizante; la
+# nueva fecha solo se escribe cuando ya se consumió la mitad de la ventana,
+# no en cada petición. Las entradas del LRU se revalidan contra la BD cada
+# SESIONES_CACHE_TTL segundos para ver los logout hechos en otros procesos.
+# Los tokens que la BD no reconoce también se recuerdan (SESIONES_CACHE_NEGATIVO_TTL):
+# un token inventado o revocado no cuesta una consulta en cada petición.
+# ==================== Almacén de sesiones ====================
+
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DateTime, text
+
+from app.core.config import settings
+from app.db.catalogos import cache_catalogos
+from app.db.database import engine
+
+CREAR = text("""
+    INSERT INTO sesiones (token_hash, id_usuario, creada, expira)
+    VALUES (:token_hash, :id_usuario, :creada, :expira)
+""")
+
+LEER = text("""
+    SELECT s.id_usuario, u.id_rol, s.expira
+    FROM sesiones s
+    INNER JOIN usuarios u ON u.id_usuario = s.id_usuario
+    WHERE s.token_hash = :token_hash AND s.expira > :ahora AND u.activo = 1
+""").columns(expira=DateTime)
+
+EXTENDER = text("UPDATE sesiones SET expira = :expira WHERE token_hash = :token_hash")
+
+REVOCAR = text("DELETE FROM sesiones WHERE token_hash = :token_hash")
+
+REVOCAR_USUARIO = text("DELETE FROM sesiones WHERE id_usuario = :id_usuario")
+
+# Por lotes para no bloquear la tabla con un DELETE enorme
+BARRER = text("DELETE FROM sesiones WHERE expira <= :ahora LIMIT 5000")
+
+# validar_en_memoria(): el LRU no alcanza, hay que llamar a validar()
+REQUIERE_BD = object()
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class Sesion:
+    """Sesión válida: a quién pertenece y hasta cuándo"""
+
+    __slots__ = ("token_hash", "id_usuario", "id_rol", "expira", "expira_guardada", "verificada_en")
+
+    def __init__(self, token_hash: str, id_usuario: int, id_rol: int, expira: datetime):
+        self.token_hash = token_hash
+        self.id_usuario = id_usuario
+        self.id_rol = id_rol
+        self.expira = expira
+        # Lo que hay en la BD; puede quedar atrás de expira mientras no convenga escribir
+        self.expira_guardada = expira
+        self.verificada_en = time.monotonic()
+
+    @property
+    def rol(self) -> Optional[str]:
+        return cache_catalogos.nombre("cat_rol", self.id_rol)
+
+
+class AlmacenSesiones:
+    """
+    Sesiones en la tabla sesiones con un LRU por proceso delante
+    - crear(): alta al hacer login, devuelve el token en claro
+    - validar(): sesión vigente o None; extiende la expiración
+    - validar_en_memoria(): lo mismo sin ir a la BD, o REQUIERE_BD
+    - revocar() / revocar_usuario(): logout, baja de usuario
+    - barrer(): borra las sesiones vencidas
+    """
+
+    def __init__(self, motor, duracion: timedelta, maximo: int, ttl_cache: float, ttl_negativo: float = 0):
+        self.motor = motor
+        self.duracion = duracion
+        self.maximo = maximo
+        self.ttl_cache = ttl_cache
+        self.ttl_negativo = ttl_negativo
+        self._lru: OrderedDict[str, Sesion] = OrderedDict()
+        # token_hash -> hasta cuándo (monotonic) se rechaza sin consultar la BD
+        self._invalidos: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recordar(self, sesion: Sesion):
+        with self._lock:
+            self._invalidos.pop(sesion.token_hash, None)
+            self._lru[sesion.token_hash] = sesion
+            self._lru.move_to_end(sesion.token_hash)
+            while len(self._lru) > self.maximo:
+                self._lru.popitem(last=False)
+
+    def _olvidar(self, token_hash: str):
+        with self._lock:
+            self._lru.pop(token_hash, None)
+
+    def _recordar_invalido(self, token_hash: str):
+        if self.ttl_negativo <= 0:
+            return
+        with self._lock:
+            self._lru.pop(token_hash, None)
+            self._invalidos[token_hash] = time.monotonic() + self.ttl_negativo
+            self._invalidos.move_to_end(token_hash)
+            # Acotado igual que el LRU: un flood de tokens basura no crece sin límite
+            while len(self._invalidos) > self.maximo:
+                self._invalidos.popitem(last=False)
+
+    def _nueva(self, id_usuario: int, id_rol: int) -> tuple[str, Sesion, dict]:
+        token = secrets.token_urlsafe(32)
+        ahora = datetime.utcnow()
+        sesion = Sesion(hash_token(token), id_usuario, id_rol, ahora + self.duracion)
+        params = {
+            "token_hash": sesion.token_hash,
+            "id_usuario": id_usuario,
+            "creada": ahora,
+            "expira": sesion.expira,
+        }
+        return token, sesion, params
+
+    def crear(self, db, id_usuario: int, id_rol: int) -> tuple[str, Sesion]:
+        """Registra la sesión en la transacción de `db` (el llamador hace commit)"""
+        token, sesion, params = self._nueva(id_usuario, id_rol)
+        db.execute(CREAR, params)
+        self._recordar(sesion)
+        return token, sesion
+
+    async def crear_async(self, db, id_usuario: int, id_rol: int) -> tuple[str, Sesion]:
+        """crear() con AsyncSession"""
+        token, sesion, params = self._nueva(id_usuario, id_rol)
+        await db.execute(CREAR, params)
+        self._recordar(sesion)
+        return token, sesion
+
+    def validar_en_memoria(self, token: str):
+        """
+        Resuelve la sesión solo con el LRU (apto para el event loop): la sesión
+        vigente, None si venció, o REQUIERE_BD si hay que leerla o guardar la
+        nueva expiración; en ese caso se llama a validar() en un hilo
+        """
+        token_hash = hash_token(token)
+        ahora = datetime.utcnow()
+
+        with self._lock:
+            sesion = self._lru.get(token_hash)
+            if sesion is not None:
+                self._lru.move_to_end(token_hash)
+            else:
+                rechazar_hasta = self._invalidos.get(token_hash)
+                if rechazar_hasta is not None:
+                    if time.monotonic() < rechazar_hasta:
+                        return None
+                    del self._invalidos[token_hash]
+
+        if sesion is None:
+            return REQUIERE_BD
+        if sesion.expira <= ahora:
+            self._olvidar(token_hash)
+            self._recordar_invalido(token_hash)
+            return None
+        if time.monotonic() - sesion.verificada_en > self.ttl_cache:
+            return REQUIERE_BD
+        if sesion.expira_guardada - ahora < self.duracion / 2:
+            return REQUIERE_BD
+
+        sesion.expira = ahora + self.duracion
+        return sesion
+
+    def validar(self, token: str) -> Optional[Sesion]:
+        resuelta = self.validar_en_memoria(token)
+        if resuelta is not REQUIERE_BD:
+            return resuelta
+
+        token_hash = hash_token(token)
+        ahora = datetime.utcnow()
+        with self._lock:
+            sesion = self._lru.get(token_hash)
+
+        if sesion is None or time.monotonic() - sesion.verificada_en > self.ttl_cache:
+            with self.motor.connect() as conn:
+                fila = conn.execute(LEER, {"token_hash": token_hash, "ahora": ahora}).first()
+            if fila is None:
+                self._recordar_invalido(token_hash)
+                return None
+            sesion = Sesion(token_hash, fila.id_usuario, fila.id_rol, fila.expira)
+            self._recordar(sesion)
+
+        # Expiración deslizante: se escribe solo si ya pasó la mitad de la ventana guardada
+        sesion.expira = ahora + self.duracion
+        if sesion.expira_guardada - ahora < self.duracion / 2:
+            with self.motor.begin() as conn:
+                conn.execute(EXTENDER, {"token_hash": token_hash, "expira": sesion.expira})
+            sesion.expira_guardada = sesion.expira
+        return sesion
+
+    def revocar(self, token: str) -> bool:
+        token_hash = hash_token(token)
+        with self.motor.begin() as conn:
+            revocada = conn.execute(REVOCAR, {"token_hash": token_hash}).rowcount > 0
+        # Ya no existe en la BD: se rechaza desde memoria en este proceso
+        self._olvidar(token_hash)
+        self._recordar_invalido(token_hash)
+        return revocada
+
+    def revocar_usuario(self, db, id_usuario: int):
+        """Cierra todas las sesiones de un usuario en la transacción de `db`"""
+        db.execute(REVOCAR_USUARIO, {"id_usuario": id_usuario})
+        with self._lock:
+            for token_hash in [h for h, s in self._lru.items() if s.id_usuario == id_usuario]:
+                del self._lru[token_hash]
+
+    def barrer(self) -> int:
+        """Borra de la BD y del LRU las sesiones vencidas; devuelve cuántas filas borró"""
+        ahora = datetime.utcnow()
+        with self._lock:
+            for token_hash in [h for h, s in self._lru.items() if s.expira <= ahora]:
+                del self._lru[token_hash]
+        borradas = 0
+        while True:
+            with self.motor.begin() as conn:
+                lote = conn.execute(BARRER, {"ahora": ahora}).rowcount
+            borradas += lote
+            if lote < 5000:
+                return borradas
+
+
+almacen_sesiones = AlmacenSesiones(
+    engine,
+    duracion=timedelta(minutes=settings.SESIONES_DURACION_MIN),
+    maximo=settings.SESIONES_CACHE_MAX,
+    ttl_cache=settings.SESIONES_CACHE_TTL,
+    ttl_negativo=settings.SESIONES_CACHE_NEGATIVO_TTL,
+)
@@ -1,29 +1,124 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+from fastapi import Depends, FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import HTTPException
-from app.db.database import test_db_connection
+from app.core.config import settings
+from app.core.limitador import cargar_limitadores, compactar_limitadores, estado_limitadores
+from app.core.seguridad import estado_pool as estado_pool_passwords
+from app.db.catalogos import cache_catalogos
+from app.db.consultas_lentas import consultas_recientes
+from app.db.indice_upp import indice_upp
+from app.db.sesiones import almacen_sesiones
+from app.db.database import (
+    async_engine,
+    estado_pool,
+    iniciar_estadisticas,
+    replica_engines,
+    test_db_connection,
+)
 from app.api.casos import router as casos_router
 from app.api.upp import router as upp_router
 from app.api.propietarios import router as propietarios_router
-from app.api.auth import router as auth_router
+from app.api.auth import router as auth_router, sesion_obligatoria, verificar_sesion
 from app.api.usuarios import router as usuarios_router
 from app.api.muestras import router as muestras_router
 from app.api.resultados import router as resultados_router
 from app.api.hoja_reporte import router as hoja_reporte_router
+from app.api.catalogos import router as catalogos_router
+from app.api.importacion import router as importacion_router
+from app.api.busqueda import router as busqueda_router
+
+
+logger = logging.getLogger(__name__)
+
+
+async def periodicamente(segundos: float, tarea, descripcion: str):
+    # Mantenimiento en segundo plano (en un hilo para no bloquear el event loop)
+    while True:
+        await asyncio.sleep(segundos)
+        try:
+            resultado = await to_thread.run_sync(tarea)
+            if resultado:
+                logger.info("%s: %s", descripcion, resultado)
+        except Exception:
+            logger.warning("Falló la tarea periódica: %s", descripcion, exc_info=True)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Catálogos en memoria antes de atender peticiones
+    try:
+        await to_thread.run_sync(cache_catalogos.cargar)
+    except Exception:
+        # Sin BD al arrancar: cada catálogo se carga en su primer uso
+        logger.warning("No se pudieron precargar los catálogos", exc_info=True)
+    try:
+        await to_thread.run_sync(indice_upp.cargar)
+    except Exception:
+        logger.warning("No se pudo cargar el índice de UPP", exc_info=True)
+    try:
+        cargar_limitadores()
+    except Exception:
+        logger.warning("No se pudieron restaurar los límites de login", exc_info=True)
+    tareas = [
+        asyncio.create_task(periodicamente(
+            settings.SESIONES_BARRIDO_SEG, almacen_sesiones.barrer, "Sesiones vencidas borradas"
+        )),
+        asyncio.create_task(periodicamente(
+            settings.LIMITADOR_COMPACTAR_SEG, compactar_limitadores, "Compactación de límites de login"
+        )),
+        asyncio.create_task(periodicamente(
+            settings.INDICE_UPP_REFRESCO_SEG, indice_upp.refrescar, "UPP nuevas en el índice"
+        )),
+    ]
+    yield
+    for tarea in tareas:
+        tarea.cancel()
+    # Los bloqueos vigentes quedan guardados si hay SQLite
+    try:
+        await to_thread.run_sync(compactar_limitadores)
+    except Exception:
+        logger.warning("No se pudieron guardar los límites de login", exc_info=True)
+
 
-app = FastAPI(title="SISTPEC API")
+app = FastAPI(title="SISTPEC API", lifespan=lifespan)
 
 
+# Todo salvo /api/auth pasa por la validación de sesión (ver AUTH_REQUERIDA)
+sesion_requerida = [Depends(verificar_sesion)]
+# Diagnóstico (SQL con parámetros, estado interno): siempre con sesión
+solo_con_sesion = [Depends(sesion_obligatoria)]
+
 app.include_router(auth_router)
-app.include_router(usuarios_router)
-app.include_router(casos_router)
-app.include_router(upp_router)
-app.include_router(propietarios_router)
-app.include_router(muestras_router)
-app.include_router(resultados_router)
-app.include_router(hoja_reporte_router)
+app.include_router(usuarios_router, dependencies=sesion_requerida)
+app.include_router(casos_router, dependencies=sesion_requerida)
+app.include_router(upp_router, dependencies=sesion_requerida)
+app.include_router(propietarios_router, dependencies=sesion_requerida)
+app.include_router(muestras_router, dependencies=sesion_requerida)
+app.include_router(resultados_router, dependencies=sesion_requerida)
+app.include_router(hoja_reporte_router, dependencies=sesion_requerida)
+app.include_router(catalogos_router, dependencies=sesion_requerida)
+app.include_router(importacion_router, dependencies=sesion_requerida)
+app.include_router(busqueda_router, dependencies=sesion_requerida)
+
+
+# Tiempo en MySQL vs. tiempo en Python por petición (visible en devtools)
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    estadisticas = iniciar_estadisticas(request.scope)
+    inicio = time.perf_counter()
+    response = await call_next(request)
+    total_ms = (time.perf_counter() - inicio) * 1000
+    db_ms = estadisticas.tiempo_db * 1000
+    response.headers["Server-Timing"] = f"db;dur={db_ms:.1f}, app;dur={max(total_ms - db_ms, 0):.1f}"
+    response.headers["X-DB-Queries"] = str(estadisticas.consultas)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
 
 
 # CORS
@@ -33,6 +128,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Queries", "ETag", "X-Next-Cursor"],
 )
 
 @app.get("/")
@@ -54,4 +150,28 @@ def db_ping():
         test_db_connection()
         return {"db": "ok"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics/pool", dependencies=solo_con_sesion)
+async def metrics_pool():
+    # async para leer el limitador del threadpool desde el event loop
+    limitador = to_thread.current_default_thread_limiter()
+    return {
+        "db": estado_pool(),
+        "db_async": estado_pool(async_engine),
+        "db_replicas": [estado_pool(motor) for motor in replica_engines],
+        "passwords": estado_pool_passwords(),
+        "limitador_login": estado_limitadores(),
+        "threadpool": {
+            "total_tokens": limitador.total_tokens,
+            "borrowed_tokens": limitador.borrowed_tokens,
+        },
+    }
+
+
+@app.get("/debug/slow-queries", dependencies=solo_con_sesion)
+def slow_queries(limit: int = Query(50, ge=1, le=200)):
+    return {
+        "threshold_ms": settings.DB_SLOW_QUERY_MS,
+        "queries": consultas_recientes(limit),
+    }
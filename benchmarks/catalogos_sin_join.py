@@ -0,0 +1,217 @@
+# ==================== Benchmark: listados con y sin JOIN a catálogos ====================
+# Compara las consultas de listado con LEFT JOIN a los cat_* contra las de
+# CATALOGOS_SIN_JOIN (solo ids + nombres desde cache_catalogos al mapear),
+# sobre un conjunto sintético grande en SQLite en memoria. Cada medición
+# incluye ejecutar, leer las filas y completar los nombres.
+# SQLite no planea igual que MySQL: sirve para comparar ambas variantes
+# entre sí; en MySQL confirmar con EXPLAIN ANALYZE sobre datos reales.
+#
+# Uso: python -m benchmarks.catalogos_sin_join [--resultados 200000] [--repeticiones 50]
+# ==================== Benchmark: listados con y sin JOIN a catálogos ====================
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("JWT_CLAVES", "bench:secreto-de-benchmark")
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.api.muestras import (  # noqa: E402
+    CONSULTA_MUESTRAS,
+    CONSULTA_MUESTRAS_SIN_CATALOGOS,
+    _nombres_catalogo_muestra,
+)
+from app.api.resultados import (  # noqa: E402
+    CONSULTA_RESULTADOS,
+    CONSULTA_RESULTADOS_SIN_CATALOGOS,
+    EXPORTACION_RESULTADOS,
+    EXPORTACION_RESULTADOS_SIN_CATALOGOS,
+    _nombres_catalogo_resultado,
+)
+from app.api.upp import BUSQUEDA_UPP, BUSQUEDA_UPP_SIN_CATALOGOS, _nombres_catalogo_upp  # noqa: E402
+from app.db.catalogos import Catalogo, cache_catalogos  # noqa: E402
+
+ESQUEMA = [
+    "CREATE TABLE cat_estado (id_estado INTEGER PRIMARY KEY, nombre)",
+    "CREATE TABLE cat_municipio (id_municipio INTEGER PRIMARY KEY, nombre, id_estado)",
+    "CREATE TABLE cat_especie (id_especie INTEGER PRIMARY KEY, nombre)",
+    "CREATE TABLE cat_raza (id_raza INTEGER PRIMARY KEY, nombre)",
+    "CREATE TABLE cat_tipo_muestra (id_tipo_muestra INTEGER PRIMARY KEY, nombre, descripcion)",
+    "CREATE TABLE cat_estatus_muestra (id_estatus_muestra INTEGER PRIMARY KEY, nombre)",
+    "CREATE TABLE cat_prueba (id_prueba INTEGER PRIMARY KEY, nombre)",
+    "CREATE TABLE cat_resultado (id_resultado INTEGER PRIMARY KEY, nombre)",
+    "CREATE TABLE usuarios (id_usuario INTEGER PRIMARY KEY, nombre)",
+    "CREATE TABLE propietarios (id_propietario INTEGER PRIMARY KEY, nombre)",
+    """CREATE TABLE upp (
+        id_upp INTEGER PRIMARY KEY, clave_upp UNIQUE, id_propietario, id_municipio,
+        localidad, direccion, telefono_contacto, estatus, fecha_registro)""",
+    "CREATE TABLE casos (id_caso INTEGER PRIMARY KEY, numero_caso UNIQUE, id_upp)",
+    """CREATE TABLE muestras (
+        id_muestra INTEGER PRIMARY KEY, id_caso, id_tipo_muestra, id_estatus_muestra,
+        codigo_muestra, numero_arete, id_especie, id_raza, especie, sexo, edad,
+        fecha_toma, observaciones, created_at, updated_at)""",
+    """CREATE TABLE resultados (
+        id_resultado_lab INTEGER PRIMARY KEY, id_muestra, id_prueba, id_resultado, valor,
+        observaciones, fecha_resultado, id_usuario_valida, created_at)""",
+    # Los índices de las llaves foráneas que tiene MySQL
+    "CREATE INDEX ix_upp_propietario ON upp (id_propietario)",
+    "CREATE INDEX ix_casos_upp ON casos (id_upp)",
+    "CREATE INDEX ix_muestras_caso ON muestras (id_caso)",
+    "CREATE INDEX ix_muestras_estatus ON muestras (id_estatus_muestra)",
+    "CREATE INDEX ix_resultados_muestra ON resultados (id_muestra)",
+    "CREATE INDEX ix_resultados_resultado ON resultados (id_resultado)",
+]
+
+CATALOGOS = {
+    "cat_estado": [{"id_estado": i, "nombre": f"ESTADO {i}"} for i in range(1, 33)],
+    "cat_municipio": [{"id_municipio": i, "nombre": f"MUNICIPIO {i}", "id_estado": i % 32 + 1} for i in range(1, 2001)],
+    "cat_especie": [{"id_especie": i, "nombre": n} for i, n in enumerate(["BOVINO", "OVINO", "CAPRINO", "PORCINO"], 1)],
+    "cat_raza": [{"id_raza": i, "nombre": f"RAZA {i}"} for i in range(1, 61)],
+    "cat_tipo_muestra": [
+        {"id_tipo_muestra": i, "nombre": f"TIPO {i}", "descripcion": f"Tipo de muestra {i}"} for i in range(1, 11)
+    ],
+    "cat_estatus_muestra": [
+        {"id_estatus_muestra": i, "nombre": n}
+        for i, n in enumerate(["PENDIENTE", "EN PROCESO", "CONCLUIDA", "RECHAZADA"], 1)
+    ],
+    "cat_prueba": [{"id_prueba": i, "nombre": f"PRUEBA {i}"} for i in range(1, 31)],
+    "cat_resultado": [
+        {"id_resultado": i, "nombre": n} for i, n in enumerate(["NEGATIVO", "POSITIVO", "SOSPECHOSO", "NO APTA"], 1)
+    ],
+}
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Microsegundos por llamada (mejor de 3 corridas)"""
+    mejores = []
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejores.append((time.perf_counter() - inicio) / repeticiones * 1e6)
+    return min(mejores)
+
+
+def poblar(motor, num_resultados: int):
+    azar = random.Random(1)
+    num_muestras = max(num_resultados // 2, 1)
+    num_casos = max(num_muestras // 5, 1)
+    num_upp = max(num_casos // 5, 1)
+    num_propietarios = max(num_upp // 2, 1)
+
+    with motor.begin() as conn:
+        for sentencia in ESQUEMA:
+            conn.execute(text(sentencia))
+        for tabla, filas in CATALOGOS.items():
+            columnas = list(filas[0])
+            conn.execute(
+                text(f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join(':' + c for c in columnas)})"),
+                filas,
+            )
+        conn.execute(text("INSERT INTO usuarios (id_usuario, nombre) VALUES (:i, :n)"),
+                     [{"i": i, "n": f"USUARIO {i}"} for i in range(1, 21)])
+        conn.execute(text("INSERT INTO propietarios (id_propietario, nombre) VALUES (:i, :n)"),
+                     [{"i": i, "n": f"PROPIETARIO {i}"} for i in range(1, num_propietarios + 1)])
+        conn.execute(text(
+            "INSERT INTO upp (id_upp, clave_upp, id_propietario, id_municipio, localidad, estatus, fecha_registro) "
+            "VALUES (:i, :clave, :p, :m, 'LOCALIDAD', 1, '2024-01-01')"
+        ), [
+            {"i": i, "clave": f"UPP-{i:07d}", "p": azar.randint(1, num_propietarios), "m": azar.randint(1, 2000)}
+            for i in range(1, num_upp + 1)
+        ])
+        conn.execute(text("INSERT INTO casos (id_caso, numero_caso, id_upp) VALUES (:i, :n, :u)"), [
+            {"i": i, "n": f"CASO-{i:07d}", "u": azar.randint(1, num_upp)} for i in range(1, num_casos + 1)
+        ])
+        conn.execute(text(
+            "INSERT INTO muestras (id_muestra, id_caso, id_tipo_muestra, id_estatus_muestra, codigo_muestra, "
+            "numero_arete, id_especie, id_raza, fecha_toma, created_at) "
+            "VALUES (:i, :c, :t, :e, :codigo, :arete, :esp, :raza, '2024-01-01', '2024-01-01')"
+        ), [
+            {
+                "i": i, "c": azar.randint(1, num_casos), "t": azar.randint(1, 10), "e": azar.randint(1, 4),
+                "codigo": f"M-{i:08d}", "arete": f"{i:010d}", "esp": azar.randint(1, 4), "raza": azar.randint(1, 60),
+            }
+            for i in range(1, num_muestras + 1)
+        ])
+        conn.execute(text(
+            "INSERT INTO resultados (id_resultado_lab, id_muestra, id_prueba, id_resultado, valor, "
+            "fecha_resultado, id_usuario_valida, created_at) "
+            "VALUES (:i, :m, :p, :r, '1.0', '2024-02-01', :u, '2024-02-01')"
+        ), [
+            {
+                "i": i, "m": azar.randint(1, num_muestras), "p": azar.randint(1, 30),
+                "r": azar.randint(1, 4), "u": azar.randint(1, 20),
+            }
+            for i in range(1, num_resultados + 1)
+        ])
+        conn.execute(text("ANALYZE"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Listados con y sin JOIN a catálogos")
+    parser.add_argument("--resultados", type=int, default=200_000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    motor = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    inicio = time.perf_counter()
+    poblar(motor, args.resultados)
+    print(f"{args.resultados} resultados sintéticos en {time.perf_counter() - inicio:.1f} s")
+    cache_catalogos._catalogos = {tabla: Catalogo(tabla, filas) for tabla, filas in CATALOGOS.items()}
+
+    conn = motor.connect()
+
+    def listado(sentencia, params, nombres=None):
+        def consultar():
+            filas = conn.execute(sentencia, params).mappings().all()
+            return [nombres(fila) for fila in filas] if nombres else [dict(fila) for fila in filas]
+        return consultar
+
+    positivo = cache_catalogos.ids_coinciden("cat_resultado", "POSITIVO")
+    pendiente = cache_catalogos.ids_coinciden("cat_estatus_muestra", "PEND", contiene=True)
+    upp = {"s": "", "like": "%%", "limit": 50, "solo_activas": 1}
+    casos = {
+        "muestras (100 filas)": (
+            listado(CONSULTA_MUESTRAS.sentencia([]), {"limit": 100}),
+            listado(CONSULTA_MUESTRAS_SIN_CATALOGOS.sentencia([]), {"limit": 100}, _nombres_catalogo_muestra),
+        ),
+        "muestras por estatus": (
+            listado(CONSULTA_MUESTRAS.sentencia(["estatus"]), {"limit": 100, "estatus": "%PEND%"}),
+            listado(CONSULTA_MUESTRAS_SIN_CATALOGOS.sentencia(["estatus"]),
+                    {"limit": 100, "estatus": pendiente}, _nombres_catalogo_muestra),
+        ),
+        "resultados (100 filas)": (
+            listado(CONSULTA_RESULTADOS.sentencia([]), {"limit": 100}),
+            listado(CONSULTA_RESULTADOS_SIN_CATALOGOS.sentencia([]), {"limit": 100}, _nombres_catalogo_resultado),
+        ),
+        "resultados por resultado": (
+            listado(CONSULTA_RESULTADOS.sentencia(["resultado"]), {"limit": 100, "resultado": "POSITIVO"}),
+            listado(CONSULTA_RESULTADOS_SIN_CATALOGOS.sentencia(["resultado"]),
+                    {"limit": 100, "resultado": positivo}, _nombres_catalogo_resultado),
+        ),
+        "búsqueda de UPP (50 filas)": (
+            listado(BUSQUEDA_UPP, upp),
+            listado(BUSQUEDA_UPP_SIN_CATALOGOS, upp, _nombres_catalogo_upp),
+        ),
+    }
+
+    print(f"{'':30s} {'con JOIN':>12s} {'sin JOIN':>12s}")
+    for nombre, (con_join, sin_join) in casos.items():
+        assert len(con_join()) == len(sin_join())
+        print(f"{nombre:30s} {medir(con_join, args.repeticiones) / 1000:9.2f} ms "
+              f"{medir(sin_join, args.repeticiones) / 1000:9.2f} ms")
+
+    exportacion = (
+        listado(EXPORTACION_RESULTADOS.sentencia([]), {}),
+        listado(EXPORTACION_RESULTADOS_SIN_CATALOGOS.sentencia([]), {}, _nombres_catalogo_resultado),
+    )
+    print(f"{'exportación (todas las filas)':30s} {medir(exportacion[0], 1) / 1000:9.2f} ms "
+          f"{medir(exportacion[1], 1) / 1000:9.2f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
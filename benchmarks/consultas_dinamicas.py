@@ -0,0 +1,81 @@
+# ==================== Microbenchmark: consultas con filtros dinámicos ====================
+# Costo por petición de armar la sentencia del listado: antes se concatenaba
+# el WHERE y se llamaba text() en cada petición; ConsultaDinamica.sentencia()
+# la arma una vez por combinación de filtros. Se mide solo armar la sentencia
+# y también ejecutarla sobre tablas vacías en SQLite (incluye la búsqueda en
+# la caché de compilación de SQLAlchemy, sin costo de lectura de filas).
+#
+# Uso: python -m benchmarks.consultas_dinamicas [--repeticiones 5000]
+# ==================== Microbenchmark: consultas con filtros dinámicos ====================
+
+import argparse
+import os
+import time
+from datetime import date
+
+os.environ.setdefault("JWT_CLAVES", "bench:secreto-de-benchmark")
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.api.muestras import CONSULTA_MUESTRAS  # noqa: E402
+from app.api.resultados import CONSULTA_RESULTADOS  # noqa: E402
+from benchmarks.catalogos_sin_join import ESQUEMA  # noqa: E402
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Microsegundos por llamada (mejor de 3 corridas)"""
+    mejores = []
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejores.append((time.perf_counter() - inicio) / repeticiones * 1e6)
+    return min(mejores)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark de ConsultaDinamica")
+    parser.add_argument("--repeticiones", type=int, default=5_000)
+    args = parser.parse_args(argv)
+
+    motor = create_engine("sqlite://", poolclass=StaticPool)
+    with motor.begin() as conn:
+        for sentencia in ESQUEMA:
+            conn.execute(text(sentencia))
+    conn = motor.connect()
+
+    casos = {
+        "muestras (caso + fechas)": (
+            CONSULTA_MUESTRAS,
+            ["id_caso", "fecha_desde", "fecha_hasta"],
+            {"id_caso": 1, "fecha_desde": date(2024, 1, 1), "fecha_hasta": date(2024, 12, 31), "limit": 100},
+        ),
+        "resultados (prueba + caso)": (
+            CONSULTA_RESULTADOS,
+            ["id_prueba", "numero_caso"],
+            {"id_prueba": 1, "numero_caso": "%2024%", "limit": 100},
+        ),
+    }
+
+    print(f"{'':46s} {'antes':>10s} {'después':>10s}")
+    for nombre, (consulta, activos, params) in casos.items():
+        # Antes: armar el SQL y llamar text() en cada petición (_construir sin la caché)
+        antes = lambda: consulta._construir(tuple(f for f in consulta.filtros if f in activos))  # noqa: E731
+        despues = lambda: consulta.sentencia(activos)  # noqa: E731
+        assert str(antes()) == str(despues())
+
+        for etiqueta, (medir_antes, medir_despues) in {
+            "armar": (antes, despues),
+            "armar y ejecutar": (
+                lambda: conn.execute(antes(), params).all(),
+                lambda: conn.execute(despues(), params).all(),
+            ),
+        }.items():
+            print(f"{nombre + ', ' + etiqueta:46s} {medir(medir_antes, args.repeticiones):7.2f} µs "
+                  f"{medir(medir_despues, args.repeticiones):7.2f} µs")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
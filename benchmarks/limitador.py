@@ -0,0 +1,62 @@
+# ==================== Microbenchmark: limitador de login ====================
+# Costo por llamada de intentar() / fallo() y de un intento rechazado, con
+# muchas claves distintas en memoria (como durante un credential stuffing).
+# Ninguna de estas rutas toca MySQL ni el pool de contraseñas.
+#
+# Uso: python -m benchmarks.limitador [--claves 100000] [--repeticiones 200000]
+# ==================== Microbenchmark: limitador de login ====================
+
+import argparse
+import random
+import time
+
+from app.core.limitador import Limitador
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Microsegundos por llamada (mejor de 3 corridas)"""
+    mejores = []
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejores.append((time.perf_counter() - inicio) / repeticiones * 1e6)
+    return min(mejores)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark del limitador de login")
+    parser.add_argument("--claves", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    limitador = Limitador(
+        "usuario", capacidad=10, recarga=10 / 60, umbral_fallos=5,
+        bloqueo_base=30, bloqueo_max=3600, ventana_fallos=3600,
+    )
+    claves = [f"usuario{i}" for i in range(args.claves)]
+    for clave in claves:
+        limitador.intentar(clave)
+
+    elegir = random.Random(1).choice
+    bloqueada = "bloqueada"
+    for _ in range(10):
+        limitador.fallo(bloqueada)
+
+    # Costo de elegir la clave al azar, que se descuenta de las mediciones
+    azar = medir(lambda: elegir(claves), args.repeticiones)
+    vacio = medir(lambda: None, args.repeticiones)
+    resultados = {
+        "intentar (clave existente)": medir(lambda: limitador.intentar(elegir(claves)), args.repeticiones) - azar,
+        "fallo (clave existente)": medir(lambda: limitador.fallo(elegir(claves)), args.repeticiones) - azar,
+        "intentar (rechazado por bloqueo)": medir(lambda: limitador.intentar(bloqueada), args.repeticiones) - vacio,
+    }
+
+    print(f"{len(limitador)} claves en memoria")
+    for nombre, microsegundos in resultados.items():
+        print(f"{nombre:36s} {max(microsegundos, 0):10.2f} µs/llamada")
+    print(f"{'compactar (todas las claves)':36s} {medir(limitador.compactar, 3) / 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# ==================== Microbenchmark: verificación de access tokens ====================
+# Costo de verificar_acceso() (firma HS256 + claims) frente a la validación
+# de un token de sesión que no está en memoria (una consulta a MySQL, que
+# aquí no se mide). Solo CPU: no necesita base de datos.
+#
+# Uso: python -m benchmarks.tokens [--repeticiones 20000]
+# ==================== Microbenchmark: verificación de access tokens ====================
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("JWT_CLAVES", "bench:secreto-de-benchmark")
+
+from app.core.tokens import emitir_acceso, es_jwt, verificar_acceso  # noqa: E402
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Microsegundos por llamada (mejor de 3 corridas)"""
+    mejores = []
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejores.append((time.perf_counter() - inicio) / repeticiones * 1e6)
+    return min(mejores)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark de verificación de JWT")
+    parser.add_argument("--repeticiones", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    valido, _ = emitir_acceso(1, 1, "ADMIN")
+    alterado = valido[:-2] + ("AA" if not valido.endswith("AA") else "BB")
+    assert verificar_acceso(valido) is not None and verificar_acceso(alterado) is None
+
+    resultados = {
+        "es_jwt": medir(lambda: es_jwt(valido), args.repeticiones),
+        "verificar_acceso (válido)": medir(lambda: verificar_acceso(valido), args.repeticiones),
+        "verificar_acceso (firma alterada)": medir(lambda: verificar_acceso(alterado), args.repeticiones),
+        "emitir_acceso": medir(lambda: emitir_acceso(1, 1, "ADMIN"), args.repeticiones),
+    }
+    for nombre, microsegundos in resultados.items():
+        print(f"{nombre:36s} {microsegundos:10.2f} µs/llamada")
+
+
+if __name__ == "__main__":
+    main()
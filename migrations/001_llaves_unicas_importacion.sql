@@ -0,0 +1,10 @@
+-- Llaves únicas que usa la importación masiva (app/db/importacion.py)
+-- para INSERT ... ON DUPLICATE KEY UPDATE.
+-- Antes de aplicar, verificar que no haya duplicados:
+--   SELECT curp, COUNT(*) FROM propietarios WHERE curp IS NOT NULL GROUP BY curp HAVING COUNT(*) > 1;
+--   SELECT clave_upp, COUNT(*) FROM upp GROUP BY clave_upp HAVING COUNT(*) > 1;
+-- Omitir la sentencia correspondiente si la llave ya existe.
+
+ALTER TABLE propietarios ADD UNIQUE KEY uq_propietarios_curp (curp);
+
+ALTER TABLE upp ADD UNIQUE KEY uq_upp_clave_upp (clave_upp);
@@ -0,0 +1,24 @@
+-- Secuencias con reserva por bloques (app/db/secuencias.py).
+-- Cada proceso toma un bloque de valores con un solo UPDATE atómico y los
+-- entrega desde memoria; los huecos al reiniciar un proceso son esperados.
+-- La fila de cada secuencia (p. ej. numero_caso_2026) se crea en el primer uso.
+
+CREATE TABLE IF NOT EXISTS secuencias (
+    nombre VARCHAR(64) NOT NULL PRIMARY KEY,
+    valor BIGINT UNSIGNED NOT NULL
+) ENGINE=InnoDB;
+
+-- Para continuar la numeración actual del año en curso, sembrar con el último
+-- consecutivo emitido por sp_generar_numero_caso, por ejemplo:
+-- INSERT INTO secuencias (nombre, valor) VALUES ('numero_caso_2026', 1234);
+
+-- La secuencia garantiza unicidad solo dentro de un esquema de numeración; la
+-- llave única evita duplicados al cambiar CASOS_NUMERACION, al sembrar mal la
+-- secuencia o al mezclarla con sp_generar_numero_caso. crear_caso traduce el
+-- duplicado a 409. Antes de aplicarla, revisar duplicados existentes:
+--   SELECT numero_caso, COUNT(*) FROM casos GROUP BY numero_caso HAVING COUNT(*) > 1;
+SET @sql = IF((SELECT COUNT(*) FROM information_schema.STATISTICS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'casos'
+                 AND COLUMN_NAME = 'numero_caso' AND NON_UNIQUE = 0) = 0,
+    'ALTER TABLE casos ADD UNIQUE KEY uq_casos_numero_caso (numero_caso)', 'DO 0');
+PREPARE s FROM @sql; EXECUTE s; DEALLOCATE PREPARE s;
@@ -0,0 +1,47 @@
+-- Los endpoints de alta ya no hacen un SELECT previo de existencia/duplicado:
+-- la validación la hace el propio INSERT (app/db/inserciones.insertar_fila).
+-- Restricciones requeridas (además de las de 001_llaves_unicas_importacion.sql):
+--   usuarios.usuario único
+--   FK muestras.id_caso -> casos, resultados.id_muestra -> muestras,
+--   upp.id_propietario -> propietarios, casos.id_upp -> upp,
+--   hoja_reporte.id_usuario -> usuarios
+-- Cada sentencia se omite si la restricción ya existe (el script se puede
+-- correr de nuevo). Antes de agregar una FK, revisar huérfanos, por ejemplo:
+--   SELECT m.id_muestra FROM muestras m LEFT JOIN casos c ON c.id_caso = m.id_caso
+--   WHERE c.id_caso IS NULL;
+
+SET @sql = IF((SELECT COUNT(*) FROM information_schema.STATISTICS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'usuarios'
+                 AND COLUMN_NAME = 'usuario' AND NON_UNIQUE = 0) = 0,
+    'ALTER TABLE usuarios ADD UNIQUE KEY uq_usuarios_usuario (usuario)', 'DO 0');
+PREPARE s FROM @sql; EXECUTE s; DEALLOCATE PREPARE s;
+
+SET @sql = IF((SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'muestras'
+                 AND COLUMN_NAME = 'id_caso' AND REFERENCED_TABLE_NAME = 'casos') = 0,
+    'ALTER TABLE muestras ADD CONSTRAINT fk_muestras_caso FOREIGN KEY (id_caso) REFERENCES casos (id_caso)', 'DO 0');
+PREPARE s FROM @sql; EXECUTE s; DEALLOCATE PREPARE s;
+
+SET @sql = IF((SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'resultados'
+                 AND COLUMN_NAME = 'id_muestra' AND REFERENCED_TABLE_NAME = 'muestras') = 0,
+    'ALTER TABLE resultados ADD CONSTRAINT fk_resultados_muestra FOREIGN KEY (id_muestra) REFERENCES muestras (id_muestra)', 'DO 0');
+PREPARE s FROM @sql; EXECUTE s; DEALLOCATE PREPARE s;
+
+SET @sql = IF((SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'upp'
+                 AND COLUMN_NAME = 'id_propietario' AND REFERENCED_TABLE_NAME = 'propietarios') = 0,
+    'ALTER TABLE upp ADD CONSTRAINT fk_upp_propietario FOREIGN KEY (id_propietario) REFERENCES propietarios (id_propietario)', 'DO 0');
+PREPARE s FROM @sql; EXECUTE s; DEALLOCATE PREPARE s;
+
+SET @sql = IF((SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'casos'
+                 AND COLUMN_NAME = 'id_upp' AND REFERENCED_TABLE_NAME = 'upp') = 0,
+    'ALTER TABLE casos ADD CONSTRAINT fk_casos_upp FOREIGN KEY (id_upp) REFERENCES upp (id_upp)', 'DO 0');
+PREPARE s FROM @sql; EXECUTE s; DEALLOCATE PREPARE s;
+
+SET @sql = IF((SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'hoja_reporte'
+                 AND COLUMN_NAME = 'id_usuario' AND REFERENCED_TABLE_NAME = 'usuarios') = 0,
+    'ALTER TABLE hoja_reporte ADD CONSTRAINT fk_hoja_reporte_usuario FOREIGN KEY (id_usuario) REFERENCES usuarios (id_usuario)', 'DO 0');
+PREPARE s FROM @sql; EXECUTE s; DEALLOCATE PREPARE s;
@@ -0,0 +1,10 @@
+-- Control de concurrencia optimista (app/db/actualizaciones.py).
+-- Los GET por id devuelven ETag: "<version>"; los PUT aceptan If-Match y
+-- responden 412 si otro usuario modificó la fila mientras tanto.
+
+ALTER TABLE muestras ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE resultados ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE upp ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE propietarios ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE usuarios ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE hoja_reporte ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1;
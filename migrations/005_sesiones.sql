@@ -0,0 +1,15 @@
+-- Sesiones de autenticación (app/db/sesiones.py).
+-- Solo se guarda el SHA-256 del token; el token en claro nunca llega a la BD.
+-- El rol se toma de usuarios al validar, así un cambio de rol aplica sin
+-- cerrar la sesión. El índice por expira permite el barrido periódico de sesiones vencidas.
+
+CREATE TABLE IF NOT EXISTS sesiones (
+    token_hash CHAR(64) NOT NULL,
+    id_usuario INT NOT NULL,
+    creada DATETIME NOT NULL,
+    expira DATETIME NOT NULL,
+    PRIMARY KEY (token_hash),
+    KEY ix_sesiones_expira (expira),
+    KEY ix_sesiones_usuario (id_usuario),
+    CONSTRAINT fk_sesiones_usuario FOREIGN KEY (id_usuario) REFERENCES usuarios (id_usuario) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
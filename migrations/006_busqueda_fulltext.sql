@@ -0,0 +1,13 @@
+-- Índices FULLTEXT con parser ngram para /api/search (app/api/busqueda.py).
+-- El parser ngram indexa subcadenas de ngram_token_size caracteres (2 por
+-- defecto, variable de servidor de solo lectura), así que "PER" encuentra
+-- "LOPEZ PEREZ" sin LIKE '%...%'. Las columnas de cada MATCH deben coincidir
+-- exactamente con las del índice.
+-- En tablas grandes crear los índices fuera de horario: InnoDB reconstruye
+-- la tabla la primera vez que se agrega un índice FULLTEXT.
+
+ALTER TABLE propietarios
+    ADD FULLTEXT KEY ft_propietarios_busqueda (nombre, curp, rfc) WITH PARSER ngram;
+
+ALTER TABLE upp
+    ADD FULLTEXT KEY ft_upp_busqueda (clave_upp, localidad, direccion) WITH PARSER ngram;
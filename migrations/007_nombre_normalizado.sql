@@ -0,0 +1,13 @@
+-- Nombre de propietario normalizado (app/core/texto.nombre_canonico): sin
+-- acentos, minúsculas, sin signos y con las palabras en orden alfabético.
+-- El índice FULLTEXT ngram sobre esta columna da los candidatos para la
+-- búsqueda por similitud y el filtro por nombre de GET /api/propietarios.
+-- Después de aplicar, llenar la columna para los registros existentes:
+--   python -m app.db.nombres
+-- La API la mantiene al crear, editar e importar propietarios.
+
+ALTER TABLE propietarios
+    ADD COLUMN nombre_normalizado VARCHAR(255) NULL AFTER nombre;
+
+ALTER TABLE propietarios
+    ADD FULLTEXT KEY ft_propietarios_nombre_normalizado (nombre_normalizado) WITH PARSER ngram;
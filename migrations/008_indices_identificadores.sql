@@ -0,0 +1,14 @@
+-- Índices para los filtros por identificador con match_mode exact/prefix
+-- (app/db/consultas_dinamicas.filtro_identificador). propietarios.curp y
+-- upp.clave_upp ya son únicos (001) y casos.numero_caso también (002), así que
+-- esos filtros ya usan su llave única. Omitir la sentencia si el índice ya existe.
+--
+-- Verificación del plan (type=ref/const con el índice vs. type=ALL):
+--   EXPLAIN SELECT id_muestra FROM muestras WHERE numero_arete = '0123456789';
+--   EXPLAIN SELECT id_muestra FROM muestras WHERE numero_arete LIKE '0123456789%';   -- range
+--   EXPLAIN SELECT id_muestra FROM muestras WHERE numero_arete LIKE '%0123456789%';  -- ALL
+--   EXPLAIN SELECT id_propietario FROM propietarios WHERE curp = 'GOMA800101HDFRRL09';
+
+ALTER TABLE muestras ADD KEY ix_muestras_codigo_muestra (codigo_muestra);
+
+ALTER TABLE muestras ADD KEY ix_muestras_numero_arete (numero_arete);
@@ -0,0 +1,155 @@
+# ==================== Fixtures de pruebas ====================
+# Las pruebas corren contra SQLite en memoria: no hace falta MySQL para medir
+# cuántas sentencias y commits hace cada endpoint. El esquema solo tiene las
+# columnas que usan los INSERT de alta.
+
+import os
+import re
+
+# Antes de importar la app: sin llaves de JWT no arranca
+os.environ.setdefault("JWT_CLAVES", "pruebas:secreto-solo-para-pruebas")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.db.catalogos import Catalogo, cache_catalogos
+from app.db.database import get_db
+from app.main import app
+
+ESQUEMA = [
+    "CREATE TABLE cat_municipio (id_municipio INTEGER PRIMARY KEY, nombre)",
+    """CREATE TABLE propietarios (
+        id_propietario INTEGER PRIMARY KEY, nombre, nombre_normalizado, curp UNIQUE,
+        rfc, telefono, email, estatus, fecha_registro, fecha_actualizacion,
+        version INTEGER NOT NULL DEFAULT 1)""",
+    """CREATE TABLE upp (
+        id_upp INTEGER PRIMARY KEY, clave_upp UNIQUE,
+        id_propietario REFERENCES propietarios (id_propietario), id_municipio,
+        localidad, direccion, telefono_contacto, estatus, fecha_registro,
+        version INTEGER NOT NULL DEFAULT 1)""",
+    """CREATE TABLE usuarios (
+        id_usuario INTEGER PRIMARY KEY, usuario UNIQUE, password_hash, nombre,
+        id_rol, email, activo, fecha_creacion)""",
+    """CREATE TABLE casos (
+        id_caso INTEGER PRIMARY KEY, numero_caso UNIQUE, id_upp REFERENCES upp (id_upp),
+        id_mvz, id_usuario_recepciona, id_estatus_caso, fecha_recepcion,
+        semana_epidemiologica, anio_epidemiologico, observaciones, created_at)""",
+    """CREATE TABLE muestras (
+        id_muestra INTEGER PRIMARY KEY, id_caso REFERENCES casos (id_caso),
+        id_tipo_muestra, id_estatus_muestra, codigo_muestra, numero_arete, id_especie,
+        id_raza, especie, sexo, edad, fecha_toma, observaciones, created_at)""",
+    """CREATE TABLE resultados (
+        id_resultado_lab INTEGER PRIMARY KEY, id_muestra REFERENCES muestras (id_muestra),
+        id_prueba, id_resultado, valor, observaciones, fecha_resultado,
+        id_usuario_valida, created_at)""",
+    """CREATE TABLE hoja_reporte (
+        id_reporte INTEGER PRIMARY KEY, folio, periodo_inicio, periodo_fin, contenido,
+        archivo, fecha, id_usuario REFERENCES usuarios (id_usuario))""",
+]
+
+FILAS_CATALOGOS = {
+    "cat_rol": [{"id_rol": 1, "nombre": "ADMIN"}],
+    "cat_estatus_caso": [{"id_estatus_caso": 1, "nombre": "ABIERTO"}],
+    "cat_estatus_muestra": [{"id_estatus_muestra": 1, "nombre": "PENDIENTE"}],
+    "cat_tipo_muestra": [{"id_tipo_muestra": 1, "nombre": "SUERO", "descripcion": "Suero sanguíneo"}],
+    "cat_resultado": [{"id_resultado": 1, "nombre": "NEGATIVO"}],
+    "cat_prueba": [{"id_prueba": 1, "nombre": "ELISA"}],
+    "cat_municipio": [{"id_municipio": 1, "nombre": "CENTRO"}],
+}
+
+
+def _sql_para_sqlite(sentencia: str) -> str:
+    """Traduce lo específico de MySQL que usan los helpers de app/db"""
+    sentencia = sentencia.replace("SELECT @@auto_increment_increment", "SELECT 1")
+    # LAST_INSERT_ID(expr) solo sirve para leer expr como lastrowid; aquí queda expr
+    sentencia = re.sub(r"LAST_INSERT_ID\((version \+ 1)\)", r"\1", sentencia)
+    if " ON DUPLICATE KEY UPDATE " in sentencia:
+        sentencia = sentencia.replace(" ON DUPLICATE KEY UPDATE ", " ON CONFLICT DO UPDATE SET ")
+        sentencia = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sentencia)
+    # Sin FULLTEXT: MATCH ... AGAINST acepta toda fila con la columna llena
+    # (conserva el marcador del parámetro para no alterar los bindings)
+    sentencia = re.sub(
+        r"MATCH \(([\w.]+)\) AGAINST \((\?) IN (?:NATURAL LANGUAGE|BOOLEAN) MODE\)",
+        r"(\1 IS NOT NULL AND \2 IS NOT NULL)",
+        sentencia,
+    )
+    return sentencia
+
+
+class ContadorSentencias:
+    """Sentencias y commits que llegan al driver"""
+
+    def __init__(self):
+        self.sentencias: list[str] = []
+        self.commits = 0
+
+    def reiniciar(self):
+        self.sentencias.clear()
+        self.commits = 0
+
+    def de_tipo(self, verbo: str) -> list[str]:
+        return [s for s in self.sentencias if s.lstrip().upper().startswith(verbo)]
+
+
+@pytest.fixture
+def motor():
+    motor = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(motor, "connect")
+    def _funciones_mysql(dbapi_connection, connection_record):
+        dbapi_connection.create_function("NOW", 0, lambda: "2026-01-01 00:00:00")
+        dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+    @event.listens_for(motor, "before_cursor_execute", retval=True)
+    def _dialecto_mysql(conn, cursor, statement, parameters, context, executemany):
+        return _sql_para_sqlite(statement), parameters
+
+    with motor.begin() as conn:
+        for sentencia in ESQUEMA:
+            conn.execute(text(sentencia))
+    yield motor
+    motor.dispose()
+
+
+@pytest.fixture
+def contador(motor):
+    contador = ContadorSentencias()
+
+    @event.listens_for(motor, "before_cursor_execute")
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        contador.sentencias.append(statement)
+
+    @event.listens_for(motor, "commit")
+    def _commit(conn):
+        contador.commits += 1
+
+    return contador
+
+
+@pytest.fixture
+def cliente(motor, monkeypatch):
+    # Sin lifespan: nada se precarga desde MySQL
+    Sesion = sessionmaker(bind=motor, autoflush=False)
+
+    def _get_db():
+        db = Sesion()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(cache_catalogos, "_catalogos", {
+        tabla: Catalogo(tabla, filas) for tabla, filas in FILAS_CATALOGOS.items()
+    })
+    app.dependency_overrides[get_db] = _get_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -0,0 +1,80 @@
+import asyncio
+
+import anyio
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.catalogos import Catalogo, cache_catalogos
+from app.db.database import get_async_db
+from app.main import app
+
+
+class SesionAsincrona:
+    """Lo único de AsyncSession que usan los listados, sobre la sesión sync de SQLite"""
+
+    def __init__(self, db):
+        self._db = db
+
+    async def execute(self, sentencia, params=None):
+        return self._db.execute(sentencia, params)
+
+
+@pytest.fixture
+def cargas(monkeypatch):
+    """Sustituye cargar(): registra las tablas y si corrió dentro del event loop"""
+    registro = []
+
+    def cargar(tablas=None):
+        try:
+            asyncio.get_running_loop()
+            en_event_loop = True
+        except RuntimeError:
+            en_event_loop = False
+        registro.append((tuple(tablas), en_event_loop))
+        cache_catalogos._catalogos.update({
+            tabla: Catalogo(tabla, [{"id_municipio": 1, "nombre": "CENTRO", "id_estado": 7}]
+                            if tabla == "cat_municipio" else [{"id_estado": 7, "nombre": "TABASCO"}])
+            for tabla in tablas
+        })
+
+    monkeypatch.setattr(cache_catalogos, "cargar", cargar)
+    return registro
+
+
+def test_asegurar_carga_faltantes_fuera_del_event_loop(cliente, cargas):
+    cache_catalogos._catalogos.pop("cat_municipio")
+    cache_catalogos._catalogos.pop("cat_estado", None)
+
+    anyio.run(cache_catalogos.asegurar, ["cat_municipio", "cat_estado"])
+    assert cargas == [(("cat_municipio", "cat_estado"), False)]
+
+    # Ya cargados: no vuelve a consultar
+    anyio.run(cache_catalogos.asegurar, ["cat_municipio", "cat_estado"])
+    assert len(cargas) == 1
+
+
+def test_listado_sin_join_con_catalogo_sin_cargar(cliente, motor, cargas, monkeypatch):
+    monkeypatch.setattr(settings, "CATALOGOS_SIN_JOIN", True)
+    cache_catalogos._catalogos.pop("cat_municipio")
+    with motor.begin() as conn:
+        conn.execute(text("INSERT INTO propietarios (id_propietario, nombre) VALUES (1, 'JUAN PEREZ')"))
+        conn.execute(text(
+            "INSERT INTO upp (id_upp, clave_upp, id_propietario, id_municipio, estatus) "
+            "VALUES (1, 'UPP-1', 1, 1, 1)"
+        ))
+
+    Sesion = sessionmaker(bind=motor)
+
+    async def _get_async_db():
+        with Sesion() as db:
+            yield SesionAsincrona(db)
+
+    app.dependency_overrides[get_async_db] = _get_async_db
+    respuesta = cliente.get("/api/upp", params={"search": "UPP"})
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()[0]["municipio"] == "CENTRO"
+    assert respuesta.json()[0]["estado"] == "TABASCO"
+    assert cargas == [(("cat_municipio", "cat_estado"), False)]
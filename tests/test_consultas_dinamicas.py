@@ -0,0 +1,53 @@
+from sqlalchemy import text
+
+from app.db.consultas_dinamicas import ConsultaDinamica, filtro_identificador
+
+
+def _consulta():
+    return ConsultaDinamica(
+        base="SELECT id_muestra, codigo_muestra FROM muestras WHERE 1=1",
+        filtros={
+            "id_caso": "id_caso = :id_caso",
+            "codigo_muestra": "codigo_muestra LIKE :codigo_muestra",
+            "estatus": "id_estatus_muestra IN :estatus",
+        },
+        final="ORDER BY id_muestra LIMIT :limit",
+        expandibles=("estatus",),
+    )
+
+
+def test_misma_combinacion_misma_sentencia():
+    consulta = _consulta()
+    primera = consulta.sentencia(["codigo_muestra", "id_caso"])
+
+    # Mismo objeto sin importar el orden: SQLAlchemy reutiliza su compilación
+    assert consulta.sentencia(["id_caso", "codigo_muestra"]) is primera
+    assert consulta.sentencia(("codigo_muestra", "id_caso", "id_caso")) is primera
+    assert consulta.estadisticas_cache().misses == 1
+    assert consulta.estadisticas_cache().hits == 2
+
+    # Las condiciones siguen el orden declarado en filtros
+    sql = str(primera)
+    assert sql.index("id_caso = :id_caso") < sql.index("codigo_muestra LIKE")
+    assert consulta.sentencia(["id_caso"]) is not primera
+
+
+def test_filtro_in_con_lista(motor):
+    consulta = _consulta()
+    with motor.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO muestras (id_muestra, codigo_muestra, id_estatus_muestra) "
+            "VALUES (1, 'M-1', 1), (2, 'M-2', 2), (3, 'M-3', 3)"
+        ))
+        filas = conn.execute(consulta.sentencia(["estatus"]), {"estatus": [1, 3], "limit": 10}).all()
+        assert [fila.id_muestra for fila in filas] == [1, 3]
+
+        # Sin el filtro IN activo no se declara el parámetro expandible
+        filas = conn.execute(consulta.sentencia([]), {"limit": 10}).all()
+        assert len(filas) == 3
+
+
+def test_filtro_identificador():
+    assert filtro_identificador("codigo_muestra", "M-1", "exact") == ("codigo_muestra_exacto", "M-1")
+    assert filtro_identificador("codigo_muestra", "M_1", "prefix") == ("codigo_muestra", "M\\_1%")
+    assert filtro_identificador("codigo_muestra", "M-1") == ("codigo_muestra", "%M-1%")
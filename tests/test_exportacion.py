@@ -0,0 +1,70 @@
+import anyio
+import pytest
+from sqlalchemy import event, text
+
+from app.api import resultados
+from app.core.config import settings
+
+
+@pytest.fixture
+def exportacion(cliente, motor, monkeypatch):
+    """Tres resultados, un lote por fila; registra cuándo vuelve la conexión al pool"""
+    with motor.begin() as conn:
+        conn.execute(text("INSERT INTO propietarios (id_propietario, nombre) VALUES (1, 'JUAN PEREZ')"))
+        conn.execute(text("INSERT INTO upp (id_upp, clave_upp, id_propietario) VALUES (1, 'UPP-1', 1)"))
+        conn.execute(text("INSERT INTO casos (id_caso, numero_caso, id_upp) VALUES (1, 'C-1', 1)"))
+        conn.execute(text("INSERT INTO muestras (id_muestra, id_caso, codigo_muestra) VALUES (1, 1, 'M-1')"))
+        conn.execute(text(
+            "INSERT INTO resultados (id_resultado_lab, id_muestra, id_prueba, id_resultado) "
+            "VALUES (1, 1, 1, 1), (2, 1, 1, 1), (3, 1, 1, 1)"
+        ))
+    monkeypatch.setattr(settings, "CATALOGOS_SIN_JOIN", True)
+    monkeypatch.setattr(resultados, "_FILAS_POR_LOTE", 1)
+    monkeypatch.setattr(resultados, "motor_para", lambda request: motor)
+
+    devueltas = []
+    event.listen(motor, "checkin", lambda *args: devueltas.append(True))
+    return devueltas
+
+
+def _descargar(devueltas: list, cortar_tras_bloques: int) -> tuple[list[bytes], int]:
+    """
+    Corre la respuesta ASGI; el cliente se desconecta después de recibir N bloques.
+    Devuelve los bloques y cuántas conexiones se devolvieron al terminar la
+    respuesta, mientras el generador sigue vivo (sin ayuda del GC)
+    """
+    respuesta = resultados.exportar_resultados(
+        None, "ndjson", None, None, None, None, None, None, None, None, None,
+    )
+    recibidos = []
+    cortar = anyio.Event()
+
+    async def receive():
+        await cortar.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(mensaje):
+        if mensaje["type"] != "http.response.body":
+            return
+        recibidos.append(mensaje["body"])
+        if len(recibidos) == cortar_tras_bloques:
+            cortar.set()
+            await anyio.sleep_forever()
+
+    async def correr():
+        await respuesta({"type": "http"}, receive, send)
+        return len(devueltas)
+
+    return recibidos, anyio.run(correr)
+
+
+def test_desconexion_a_media_descarga_libera_la_conexion(exportacion):
+    recibidos, devueltas = _descargar(exportacion, cortar_tras_bloques=1)
+    assert len(recibidos) == 1
+    assert devueltas == 1
+
+
+def test_descarga_completa(exportacion):
+    recibidos, devueltas = _descargar(exportacion, cortar_tras_bloques=0)
+    assert b"".join(recibidos).count(b"\n") == 3
+    assert devueltas == 1
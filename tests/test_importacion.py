@@ -0,0 +1,54 @@
+from sqlalchemy import text
+
+from app.db.indice_upp import indice_upp
+
+
+CSV = (
+    "clave_upp,propietario,curp,id_municipio,localidad\n"
+    "UPP-1,JUAN PEREZ,PEGJ800101HDFRRN01,1,NUEVA LOCALIDAD\n"
+)
+
+
+def _importar(cliente, contenido: str):
+    respuesta = cliente.post("/api/importacion/upp", files={"archivo": ("upp.csv", contenido, "text/csv")})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+def test_importacion_invalida_el_if_match_previo(cliente, motor):
+    with motor.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO propietarios (id_propietario, nombre, curp) VALUES (1, 'JUAN PEREZ', 'PEGJ800101HDFRRN01')"
+        ))
+        conn.execute(text("INSERT INTO upp (id_upp, clave_upp, id_propietario, localidad) VALUES (1, 'UPP-1', 1, 'VIEJA')"))
+
+    # El cliente leyó ambas filas en la versión 1 antes de la importación
+    resumen = _importar(cliente, CSV)
+    assert resumen["upp_actualizadas"] == 1
+    assert resumen["propietarios_actualizados"] == 1
+
+    with motor.connect() as conn:
+        assert conn.execute(text("SELECT localidad, version FROM upp WHERE id_upp = 1")).one() == ("NUEVA LOCALIDAD", 2)
+        assert conn.execute(text("SELECT version FROM propietarios WHERE id_propietario = 1")).scalar() == 2
+
+    respuesta = cliente.put("/api/upp/1", json={"localidad": "EDITADA"}, headers={"If-Match": '"1"'})
+    assert respuesta.status_code == 412, respuesta.text
+    respuesta = cliente.put("/api/propietarios/1", json={"telefono": "5550000"}, headers={"If-Match": '"1"'})
+    assert respuesta.status_code == 412, respuesta.text
+
+    with motor.connect() as conn:
+        assert conn.execute(text("SELECT localidad FROM upp WHERE id_upp = 1")).scalar() == "NUEVA LOCALIDAD"
+
+
+def test_error_al_recargar_el_indice_no_falla_la_importacion(cliente, motor, monkeypatch):
+    def falla():
+        raise RuntimeError("MySQL no responde")
+
+    # Índice ya cargado cuya recarga falla después del commit
+    monkeypatch.setattr(indice_upp, "cargado_en", 1.0)
+    monkeypatch.setattr(indice_upp, "cargar", falla)
+
+    resumen = _importar(cliente, CSV)
+    assert resumen["upp_nuevas"] == 1
+    with motor.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM upp")).scalar() == 1
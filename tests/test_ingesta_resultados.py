@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def muestras(motor):
+    with motor.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO muestras (id_muestra, codigo_muestra) "
+            "VALUES (1, 'M-1'), (2, 'DUP-1'), (3, 'dup-1')"
+        ))
+
+
+def _ingestar(cliente, *codigos):
+    respuesta = cliente.post("/api/resultados/ingesta", json={"resultados": [
+        {"codigo_muestra": codigo, "prueba": "elisa", "resultado": "negativo", "fecha_resultado": "2024-05-01"}
+        for codigo in codigos
+    ]})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()["filas"]
+
+
+def test_codigo_sin_distinguir_mayusculas(cliente, motor, muestras):
+    filas = _ingestar(cliente, "M-1", " m-1 ")
+
+    assert [f["estado"] for f in filas] == ["aceptado", "aceptado"]
+    with motor.connect() as conn:
+        assert conn.execute(text("SELECT id_muestra FROM resultados")).scalars().all() == [1, 1]
+
+
+def test_codigo_duplicado_se_rechaza(cliente, motor, muestras):
+    filas = _ingestar(cliente, "DUP-1", "dup-1", "NO-EXISTE")
+
+    assert [f["estado"] for f in filas] == ["rechazado"] * 3
+    assert filas[0]["motivo"] == filas[1]["motivo"] == "codigo_muestra duplicado en muestras; usar id_muestra"
+    assert filas[2]["motivo"] == "La muestra especificada no existe"
+    with motor.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM resultados")).scalar() == 0
@@ -0,0 +1,93 @@
+# Cada alta debe llegar a la BD como un solo INSERT + COMMIT: la existencia de
+# los padres y los duplicados los valida el propio INSERT (FK / llave única).
+
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from app.api.casos import asignador_casos
+from app.core.config import settings
+
+
+@pytest.fixture
+def padres(motor):
+    """Un registro de cada tabla padre, insertado antes de empezar a contar"""
+    with motor.begin() as conn:
+        conn.execute(text("INSERT INTO propietarios (id_propietario, nombre) VALUES (1, 'JUAN PEREZ')"))
+        conn.execute(text("INSERT INTO upp (id_upp, clave_upp, id_propietario) VALUES (1, 'UPP-1', 1)"))
+        conn.execute(text("INSERT INTO usuarios (id_usuario, usuario) VALUES (1, 'admin')"))
+        conn.execute(text("INSERT INTO casos (id_caso, numero_caso, id_upp) VALUES (1, 'C-1', 1)"))
+        conn.execute(text("INSERT INTO muestras (id_muestra, id_caso, codigo_muestra) VALUES (1, 1, 'M-1')"))
+
+
+def _un_insert_y_commit(contador, tabla: str):
+    assert contador.sentencias == contador.de_tipo(f"INSERT INTO {tabla.upper()}"), contador.sentencias
+    assert len(contador.sentencias) == 1
+    assert contador.commits == 1
+
+
+def test_crear_propietario_con_curp(cliente, contador):
+    respuesta = cliente.post("/api/propietarios", json={"nombre": "MARIA LOPEZ", "curp": "lopm800101mdfrrl09"})
+    assert respuesta.status_code == 200, respuesta.text
+    _un_insert_y_commit(contador, "propietarios")
+
+
+def test_crear_upp(cliente, contador, padres):
+    contador.reiniciar()
+    respuesta = cliente.post("/api/upp", json={"clave_upp": "upp-2", "id_propietario": 1, "id_municipio": 1})
+    assert respuesta.status_code == 200, respuesta.text
+    _un_insert_y_commit(contador, "upp")
+
+
+def test_crear_caso(cliente, contador, padres, monkeypatch):
+    anio = date.today().year
+    monkeypatch.setattr(settings, "CASOS_NUMERACION", "secuencia")
+    # Bloque ya reservado: el número sale de memoria
+    monkeypatch.setitem(asignador_casos._bloques, f"numero_caso_{anio}", [10, 19])
+    contador.reiniciar()
+    respuesta = cliente.post("/api/casos", json={
+        "id_upp": 1, "fecha_recepcion": str(date.today()), "id_usuario_crea": 1,
+    })
+    assert respuesta.status_code == 200, respuesta.text
+    _un_insert_y_commit(contador, "casos")
+
+
+def test_crear_muestra(cliente, contador, padres):
+    contador.reiniciar()
+    respuesta = cliente.post("/api/muestras", json={"id_caso": 1, "codigo_muestra": "M-2", "tipo_muestra": "suero"})
+    assert respuesta.status_code == 200, respuesta.text
+    _un_insert_y_commit(contador, "muestras")
+
+
+def test_crear_resultado(cliente, contador, padres):
+    contador.reiniciar()
+    respuesta = cliente.post("/api/resultados", json={
+        "id_muestra": 1, "id_prueba": 1, "resultado": "negativo", "fecha_resultado": str(date.today()),
+    })
+    assert respuesta.status_code == 200, respuesta.text
+    _un_insert_y_commit(contador, "resultados")
+
+
+def test_crear_hoja_reporte(cliente, contador, padres):
+    contador.reiniciar()
+    respuesta = cliente.post("/api/hoja-reporte", json={"folio": "HR-1", "contenido": {"a": 1}, "id_usuario": 1})
+    assert respuesta.status_code == 200, respuesta.text
+    _un_insert_y_commit(contador, "hoja_reporte")
+
+
+def test_crear_usuario(cliente, contador):
+    respuesta = cliente.post("/api/usuarios", json={
+        "nombre": "Ana", "nombre_usuario": "ana", "password": "secreta123", "tipo_usuario": 1,
+    })
+    assert respuesta.status_code == 200, respuesta.text
+    _un_insert_y_commit(contador, "usuarios")
+
+
+def test_padre_inexistente_sin_consulta_previa(cliente, contador):
+    # La FK rechaza el INSERT en el mismo round trip; no hay SELECT de existencia.
+    # SQLite no trae el código 1452 de MySQL, así que aquí no se traduce a 404
+    respuesta = cliente.post("/api/muestras", json={"id_caso": 999, "codigo_muestra": "M-3"})
+    assert respuesta.status_code != 200
+    assert len(contador.sentencias) == 1
+    assert contador.commits == 0
@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+from app.core import limitador as modulo
+from app.core.limitador import Limitador
+
+
+class Reloj:
+    def __init__(self, ahora: float = 1_000_000.0):
+        self.ahora = ahora
+
+    def __call__(self) -> float:
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo.time, "time", reloj)
+    return reloj
+
+
+def _limitador() -> Limitador:
+    return Limitador(
+        "usuario", capacidad=10, recarga=10 / 60, umbral_fallos=5,
+        bloqueo_base=30, bloqueo_max=3600, ventana_fallos=3600,
+    )
+
+
+def test_compactar_no_reinicia_fallos_bajo_el_umbral(reloj):
+    limitador = _limitador()
+    # Un atacante que falla 4 veces por intervalo de compactación (umbral 5)
+    for _ in range(4):
+        assert limitador.intentar("ana") is None
+        limitador.fallo("ana")
+    reloj.ahora += 120  # la cubeta se vuelve a llenar
+    limitador.compactar()
+    assert len(limitador) == 1
+
+    # El siguiente intervalo no empieza de cero: el quinto fallo ya bloquea
+    assert limitador.intentar("ana") is None
+    limitador.fallo("ana")
+    assert limitador.intentar("ana") == pytest.approx(30)
+
+
+def test_compactar_olvida_claves_sin_fallos_en_la_ventana(reloj):
+    limitador = _limitador()
+    limitador.intentar("ana")
+    limitador.fallo("ana")
+    limitador.intentar("luis")
+    reloj.ahora += 120
+    limitador.compactar()
+    # luis no tuvo fallos; ana falló hace menos que la ventana
+    assert len(limitador) == 1
+
+    reloj.ahora += 3600
+    limitador.compactar()
+    assert len(limitador) == 0
+
+
+def test_fallos_fuera_de_la_ventana_no_se_acumulan(reloj):
+    limitador = _limitador()
+    for _ in range(4):
+        limitador.fallo("ana")
+    reloj.ahora += 3601
+    limitador.fallo("ana")
+    assert limitador.intentar("ana") is None
+
+
+def test_persistencia_conserva_ultimo_fallo(reloj, tmp_path, monkeypatch):
+    ruta = tmp_path / "limitador.sqlite"
+    # Archivo guardado antes de existir la columna ultimo_fallo
+    with sqlite3.connect(ruta) as conn:
+        conn.execute("""
+            CREATE TABLE cubetas (
+                limitador TEXT NOT NULL, clave TEXT NOT NULL, tokens REAL NOT NULL,
+                actualizada REAL NOT NULL, fallos INTEGER NOT NULL, bloqueada_hasta REAL NOT NULL,
+                PRIMARY KEY (limitador, clave)
+            )
+        """)
+    monkeypatch.setattr(modulo.settings, "LIMITADOR_SQLITE", str(ruta))
+    usuario = _limitador()
+    monkeypatch.setattr(modulo, "_limitadores", {"usuario": usuario})
+
+    for _ in range(4):
+        usuario.fallo("ana")
+    modulo.compactar_limitadores()
+
+    restaurado = _limitador()
+    monkeypatch.setattr(modulo, "_limitadores", {"usuario": restaurado})
+    modulo.cargar_limitadores()
+    restaurado.fallo("ana")
+    assert restaurado.intentar("ana") > 0
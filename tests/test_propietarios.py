@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.texto import nombre_canonico
+from app.db import nombres
+
+
+@pytest.fixture
+def juan(motor):
+    with motor.begin() as conn:
+        conn.execute(
+            text("INSERT INTO propietarios (id_propietario, nombre, nombre_normalizado) VALUES (1, :nombre, :normalizado)"),
+            {"nombre": "Juan Pérez Gómez", "normalizado": nombre_canonico("Juan Pérez Gómez")},
+        )
+
+
+@pytest.fixture
+def sin_pendientes(monkeypatch):
+    monkeypatch.setitem(nombres._pendientes, "hay", None)
+
+
+def _propietarios(motor) -> int:
+    with motor.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM propietarios")).scalar()
+
+
+def test_alta_sin_curp_es_un_solo_insert(cliente, contador, juan):
+    contador.reiniciar()
+    respuesta = cliente.post("/api/propietarios", json={"nombre": "JUAN PEREZ GOMEZ"})
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["posibles_duplicados"] == []
+    assert len(contador.sentencias) == 1
+    assert contador.commits == 1
+
+
+def test_verificar_duplicados_avisa_y_crea(cliente, motor, juan):
+    respuesta = cliente.post("/api/propietarios", json={"nombre": "GOMEZ PEREZ JUAN", "verificar_duplicados": True})
+    assert respuesta.status_code == 200, respuesta.text
+    similares = respuesta.json()["posibles_duplicados"]
+    assert [s["id_propietario"] for s in similares] == [1]
+    assert _propietarios(motor) == 2
+
+
+def test_bloquear_duplicados_responde_409_sin_insertar(cliente, motor, juan):
+    respuesta = cliente.post("/api/propietarios", json={"nombre": "juan perez gomez", "bloquear_duplicados": True})
+    assert respuesta.status_code == 409, respuesta.text
+    assert [s["id_propietario"] for s in respuesta.json()["detail"]["similares"]] == [1]
+    assert _propietarios(motor) == 1
+
+
+def test_verificar_duplicados_sin_parecidos(cliente, motor, juan):
+    respuesta = cliente.post("/api/propietarios", json={"nombre": "MARIA LOPEZ", "bloquear_duplicados": True})
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["posibles_duplicados"] == []
+    assert _propietarios(motor) == 2
+
+
+def test_busqueda_por_nombre_incluye_filas_sin_normalizar(cliente, motor, sin_pendientes):
+    # Registro anterior a migrations/007 que aún no pasa por el llenado
+    with motor.begin() as conn:
+        conn.execute(text("INSERT INTO propietarios (id_propietario, nombre) VALUES (7, 'PEDRO RAMIREZ')"))
+    respuesta = cliente.get("/api/propietarios", params={"nombre": "pedro"})
+    assert respuesta.status_code == 200, respuesta.text
+    assert 7 in [p["id_propietario"] for p in respuesta.json()]
+
+
+def test_busqueda_deja_de_revisar_pendientes_tras_el_llenado(cliente, motor, contador, sin_pendientes):
+    with motor.begin() as conn:
+        conn.execute(text("INSERT INTO propietarios (id_propietario, nombre) VALUES (7, 'PEDRO RAMIREZ')"))
+    with Session(motor) as db:
+        assert nombres.rellenar(db) == 1
+
+    contador.reiniciar()
+    respuesta = cliente.get("/api/propietarios", params={"nombre": "pedro"})
+    assert respuesta.status_code == 200, respuesta.text
+    # Solo el listado: la revisión de pendientes ya no se repite
+    assert len(contador.sentencias) == 1
+    assert "IS NULL AND p.nombre LIKE" not in contador.sentencias[0]
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from app.db.secuencias import AsignadorSecuencias
+
+
+class AsignadorSinBD(AsignadorSecuencias):
+    """_reservar contra un contador en memoria, como el UPDATE atómico de la BD"""
+
+    def __init__(self, tamano_bloque: int):
+        super().__init__(motor=None, tamano_bloque=tamano_bloque)
+        self.maximos: dict[str, int] = {}
+        self.reservas = 0
+
+    def _reservar(self, nombre: str) -> list[int]:
+        # La pausa fuerza que otros hilos lleguen mientras se reserva
+        time.sleep(0.001)
+        self.reservas += 1
+        maximo = self.maximos.get(nombre, 0) + self.tamano_bloque
+        self.maximos[nombre] = maximo
+        return [maximo - self.tamano_bloque + 1, maximo]
+
+
+def test_siguiente_no_repite_valores_entre_hilos():
+    asignador = AsignadorSinBD(tamano_bloque=7)
+    hilos, por_hilo = 16, 50
+    valores: list[int] = []
+    inicio = threading.Barrier(hilos)
+
+    def tomar():
+        inicio.wait()
+        propios = [asignador.siguiente("numero_caso_2026") for _ in range(por_hilo)]
+        valores.extend(propios)
+
+    trabajadores = [threading.Thread(target=tomar) for _ in range(hilos)]
+    for hilo in trabajadores:
+        hilo.start()
+    for hilo in trabajadores:
+        hilo.join()
+
+    total = hilos * por_hilo
+    assert len(valores) == total
+    assert len(set(valores)) == total
+    # Sin huecos dentro del proceso: se entregan los bloques completos
+    assert sorted(valores) == list(range(1, total + 1))
+    assert asignador.reservas == -(-total // 7)
+
+
+def test_secuencias_con_nombre_distinto_son_independientes():
+    asignador = AsignadorSinBD(tamano_bloque=3)
+    assert [asignador.siguiente("a") for _ in range(4)] == [1, 2, 3, 4]
+    assert asignador.siguiente("b") == 1
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.api import auth
+from app.db.sesiones import REQUIERE_BD, AlmacenSesiones
+
+
+@pytest.fixture
+def almacen(motor, monkeypatch):
+    with motor.begin() as conn:
+        conn.execute(text("CREATE TABLE sesiones (token_hash PRIMARY KEY, id_usuario, creada, expira)"))
+        conn.execute(text("INSERT INTO usuarios (id_usuario, usuario, id_rol, activo) VALUES (1, 'admin', 1, 1)"))
+    almacen = AlmacenSesiones(motor, duracion=timedelta(minutes=60), maximo=100, ttl_cache=300)
+    monkeypatch.setattr(auth, "almacen_sesiones", almacen)
+    return almacen
+
+
+def _crear(motor, almacen) -> str:
+    with Session(motor) as db:
+        token, _ = almacen.crear(db, 1, 1)
+        db.commit()
+    return token
+
+
+def _peticion(token: str):
+    return SimpleNamespace(
+        headers={"Authorization": f"Bearer {token}"}, query_params={}, state=SimpleNamespace()
+    )
+
+
+def test_acierto_del_lru_no_va_a_la_bd(motor, almacen, contador):
+    token = _crear(motor, almacen)
+    contador.reiniciar()
+    assert almacen.validar_en_memoria(token).id_usuario == 1
+    assert contador.sentencias == []
+
+
+def test_sin_entrada_en_lru_requiere_bd(motor, almacen):
+    token = _crear(motor, almacen)
+    otro_proceso = AlmacenSesiones(motor, duracion=almacen.duracion, maximo=100, ttl_cache=300)
+    assert otro_proceso.validar_en_memoria(token) is REQUIERE_BD
+    assert otro_proceso.validar(token).id_usuario == 1
+    # Ya quedó en el LRU
+    assert otro_proceso.validar_en_memoria(token).id_usuario == 1
+
+
+def test_verificar_sesion_resuelve_aciertos_sin_threadpool(motor, almacen, monkeypatch):
+    token = _crear(motor, almacen)
+
+    async def sin_hilos(*args, **kwargs):
+        raise AssertionError("un acierto del LRU no debe usar el threadpool")
+
+    monkeypatch.setattr(auth.to_thread, "run_sync", sin_hilos)
+    peticion = _peticion(token)
+    sesion = asyncio.run(auth.verificar_sesion(peticion))
+    assert sesion.id_usuario == 1
+    assert peticion.state.sesion is sesion
+
+
+def test_verificar_sesion_va_a_la_bd_en_un_hilo(motor, almacen, monkeypatch):
+    token = _crear(motor, almacen)
+    almacen._lru.clear()
+    llamadas = []
+    original = auth.to_thread.run_sync
+
+    async def contar(funcion, *args, **kwargs):
+        llamadas.append(funcion)
+        return await original(funcion, *args, **kwargs)
+
+    monkeypatch.setattr(auth.to_thread, "run_sync", contar)
+    sesion = asyncio.run(auth.verificar_sesion(_peticion(token)))
+    assert sesion.id_usuario == 1
+    assert llamadas == [almacen.validar]
+
+
+@pytest.fixture
+def almacen_negativo(motor, almacen):
+    almacen.ttl_negativo = 30
+    return almacen
+
+
+def test_token_desconocido_solo_consulta_la_bd_una_vez(almacen_negativo, contador):
+    contador.reiniciar()
+    assert almacen_negativo.validar("token-inventado") is None
+    consultas = len(contador.sentencias)
+    assert consultas == 1
+    for _ in range(5):
+        assert almacen_negativo.validar_en_memoria("token-inventado") is None
+        assert almacen_negativo.validar("token-inventado") is None
+    assert len(contador.sentencias) == consultas
+
+
+def test_token_desconocido_se_vuelve_a_consultar_al_vencer(almacen_negativo, contador):
+    almacen_negativo.validar("token-inventado")
+    hash_invalido = next(iter(almacen_negativo._invalidos))
+    almacen_negativo._invalidos[hash_invalido] = 0.0
+    contador.reiniciar()
+    assert almacen_negativo.validar_en_memoria("token-inventado") is REQUIERE_BD
+    assert almacen_negativo.validar("token-inventado") is None
+    assert len(contador.sentencias) == 1
+
+
+def test_token_revocado_se_rechaza_sin_bd(motor, almacen_negativo, contador):
+    token = _crear(motor, almacen_negativo)
+    assert almacen_negativo.revocar(token)
+    contador.reiniciar()
+    assert almacen_negativo.validar(token) is None
+    assert contador.sentencias == []
+
+
+def test_login_limpia_el_rechazo_en_memoria(motor, almacen_negativo, monkeypatch):
+    # El mismo hash rechazado antes del alta (p. ej. validado en otro proceso antes del commit)
+    token = "token-fijo"
+    almacen_negativo.validar(token)
+    monkeypatch.setattr("app.db.sesiones.secrets.token_urlsafe", lambda n: token)
+    assert _crear(motor, almacen_negativo) == token
+    assert almacen_negativo.validar_en_memoria(token).id_usuario == 1
+
+
+def test_cache_negativo_acotado(almacen_negativo):
+    almacen_negativo.maximo = 3
+    for i in range(10):
+        almacen_negativo.validar(f"basura-{i}")
+    assert len(almacen_negativo._invalidos) == 3
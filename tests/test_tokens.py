@@ -0,0 +1,34 @@
+import pytest
+
+from app.core import tokens
+
+
+def test_sin_llaves_no_arranca(monkeypatch):
+    monkeypatch.setattr(tokens.settings, "JWT_CLAVES", "")
+    monkeypatch.setattr(tokens.settings, "JWT_LLAVE_TEMPORAL", False)
+    with pytest.raises(RuntimeError, match="JWT_CLAVES"):
+        tokens._cargar_claves()
+
+
+def test_llave_temporal_solo_si_se_pide(monkeypatch):
+    monkeypatch.setattr(tokens.settings, "JWT_CLAVES", "")
+    monkeypatch.setattr(tokens.settings, "JWT_LLAVE_TEMPORAL", True)
+    assert list(tokens._cargar_claves()) == ["local"]
+
+
+def test_token_de_otro_worker_con_las_mismas_llaves(monkeypatch):
+    monkeypatch.setattr(tokens.settings, "JWT_CLAVES", "k2:nuevo,k1:viejo")
+    claves = tokens._cargar_claves()
+    assert list(claves) == ["k2", "k1"]
+
+    # Firmado con la llave vieja (antes de rotar): se sigue aceptando
+    monkeypatch.setattr(tokens, "_claves", {"k1": "viejo"})
+    monkeypatch.setattr(tokens, "_kid_firma", "k1")
+    token, _ = tokens.emitir_acceso(7, 1, "ADMIN")
+
+    monkeypatch.setattr(tokens, "_claves", claves)
+    acceso = tokens.verificar_acceso(token)
+    assert (acceso.id_usuario, acceso.id_rol, acceso.rol) == (7, 1, "ADMIN")
+
+    monkeypatch.setattr(tokens, "_claves", {"k2": "nuevo"})
+    assert tokens.verificar_acceso(token) is None